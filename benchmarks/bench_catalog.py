@@ -0,0 +1,102 @@
+"""Compares the compact columnar catalog with the historical list of tuples.
+
+Usage:
+    python benchmarks/bench_catalog.py                 # synthetic 50k-game catalog
+    python benchmarks/bench_catalog.py /config/games   # every catalog of a real install
+
+Reports heap usage (tracemalloc) of both representations, the cost of
+building them and of random access, and JSON parsing versus opening the
+memory-mapped binary catalog.
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from rgsx.catalog import CompactCatalog, normalize_games  # noqa: E402
+
+
+def synthetic_catalog(count=50000):
+    regions = ["USA", "Europe", "Japan", "World", "USA, Europe", "France"]
+    games = []
+    for i in range(count):
+        name = f"Synthetic Game {i:05d} ({random.choice(regions)}){' (Rev 1)' if i % 7 == 0 else ''}.zip"
+        games.append({
+            "name": name,
+            "url": "https://myrient.erista.me/files/No-Intro/Nintendo%20-%20Game%20Boy/" + name.replace(" ", "%20"),
+            "size": f"{random.randint(1, 9999) / 10:.1f} {random.choice(['KB', 'MB', 'Mo'])}",
+        })
+    return [("synthetic", games)]
+
+
+def real_catalogs(folder):
+    for fname in sorted(os.listdir(folder)):
+        if fname.lower().endswith(".json"):
+            with open(os.path.join(folder, fname), "r", encoding="utf-8") as f:
+                yield fname, json.load(f)
+
+
+def measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - started
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, elapsed
+
+
+def main():
+    sources = list(real_catalogs(sys.argv[1]) if len(sys.argv) > 1 else synthetic_catalog())
+    records = [normalize_games(data) for _, data in sources]
+    total = sum(len(r) for r in records)
+
+    # Fresh copies so the tuple measurement owns its strings
+    tuples, tuple_bytes, tuple_time = measure(
+        lambda: [[(str(n), u and str(u), s and str(s)) for n, u, s, _ in games] for games in json.loads(json.dumps(records))])
+    compact, compact_bytes, compact_time = measure(
+        lambda: [CompactCatalog.from_records(games) for games in records])
+
+    print(f"{len(sources)} catalog(s), {total} games")
+    print(f"{'':12}{'heap':>12}{'bytes/game':>12}{'build':>10}")
+    print(f"{'tuples':12}{tuple_bytes / 1024 ** 2:>10.1f}MB{tuple_bytes / max(total, 1):>12.0f}{tuple_time:>9.2f}s")
+    print(f"{'compact':12}{compact_bytes / 1024 ** 2:>10.1f}MB{compact_bytes / max(total, 1):>12.0f}{compact_time:>9.2f}s")
+    print(f"compact nbytes estimate: {sum(c.nbytes for c in compact) / 1024 ** 2:.1f}MB")
+
+    lookups = [(k, random.randrange(len(c))) for k, c in enumerate(compact) if len(c) for _ in range(100000 // len(compact))]
+    started = time.perf_counter()
+    for k, i in lookups:
+        tuples[k][i]
+    tuple_access = time.perf_counter() - started
+    started = time.perf_counter()
+    for k, i in lookups:
+        compact[k][i]
+    compact_access = time.perf_counter() - started
+    print(f"random access x{len(lookups)}: tuples {tuple_access * 1000:.1f}ms, compact {compact_access * 1000:.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parse_time = open_time = 0.0
+        for (name, data), games in zip(sources, compact):
+            json_path = os.path.join(tmp, f"{name}.json")
+            bin_path = json_path + ".bin"
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            with open(bin_path, "wb") as f:
+                games.write_binary(f, 0.0, 0)
+            started = time.perf_counter()
+            with open(json_path, "r", encoding="utf-8") as f:
+                CompactCatalog.from_records(normalize_games(json.load(f)))
+            parse_time += time.perf_counter() - started
+            started = time.perf_counter()
+            CompactCatalog.open_binary(bin_path, 0.0, 0)
+            open_time += time.perf_counter() - started
+        print(f"load: JSON parse {parse_time * 1000:.1f}ms, binary open {open_time * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Download queue: job-start latency and CPU used while waiting.
+
+Usage:
+    python benchmarks/bench_download_queue.py [jobs]
+
+"polling" reproduces the former pipeline: a worker checking the queue every
+second, and a coroutine draining a progress queue.Queue every 0.1 s for as long
+as the download thread runs. "scheduler" is rgsx.scheduler woken by a
+condition variable, with progress handed to a callback and the coroutine
+simply waiting for the thread. Downloads are stubs that sleep, so the numbers
+are the overhead of the pipeline itself.
+"""
+import os
+import sys
+import time
+import queue
+import asyncio
+import threading
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from rgsx.scheduler import DownloadScheduler  # noqa: E402
+
+DOWNLOAD_SECONDS = 0.5
+
+
+def fake_download(report):
+    for i in range(5):
+        time.sleep(DOWNLOAD_SECONDS / 5)
+        report(i, 5)
+
+
+async def polling_job():
+    progress = queue.Queue()
+    thread = threading.Thread(target=fake_download, args=(lambda d, t: progress.put((d, t)),))
+    thread.start()
+    while thread.is_alive():
+        while not progress.empty():
+            progress.get()
+        await asyncio.sleep(0.1)
+    thread.join()
+
+
+async def callback_job():
+    thread = threading.Thread(target=fake_download, args=(lambda d, t: None,))
+    thread.start()
+    await asyncio.to_thread(thread.join)
+
+
+def run_polling(jobs, starts):
+    pending = list(jobs)
+    active = [False]
+
+    def worker():
+        while pending or active[0]:
+            if not active[0] and pending:
+                job = pending.pop(0)
+                active[0] = True
+                starts.append(time.perf_counter() - job["submitted"])
+
+                def run():
+                    asyncio.run(polling_job())
+                    active[0] = False
+                threading.Thread(target=run).start()
+            time.sleep(1)
+
+    worker()
+
+
+def run_scheduler(jobs, starts):
+    done = threading.Semaphore(0)
+
+    def runner(job):
+        starts.append(time.perf_counter() - job["submitted"])
+        asyncio.run(callback_job())
+        done.release()
+
+    scheduler = DownloadScheduler(runner, max_concurrent=1)
+    scheduler.start()
+    for job in jobs:
+        scheduler.submit(job)
+    for _ in jobs:
+        done.acquire()
+    scheduler.stop()
+
+
+def idle_cpu(seconds=3.0):
+    """CPU time of the process over `seconds` with an empty scheduler started."""
+    scheduler = DownloadScheduler(lambda job: None)
+    scheduler.start()
+    cpu = time.process_time()
+    time.sleep(seconds)
+    used = time.process_time() - cpu
+    scheduler.stop()
+    return used / seconds * 100
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{count} sequential jobs of {DOWNLOAD_SECONDS}s, one slot")
+    print(f"{'':12}{'start p50':>12}{'start max':>12}{'wall':>10}{'cpu':>10}")
+    for name, run in (("polling", run_polling), ("scheduler", run_scheduler)):
+        starts = []
+        now = time.perf_counter()
+        jobs = [{"task_id": str(i), "url": f"https://example.org/{i}", "platform": "NES", "submitted": now}
+                for i in range(count)]
+        cpu = time.process_time()
+        started = time.perf_counter()
+        run(jobs, starts)
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu
+        # Latency beyond the time spent waiting for earlier jobs to finish
+        overhead = [s - i * DOWNLOAD_SECONDS for i, s in enumerate(sorted(starts))]
+        print(f"{name:12}{statistics.median(overhead) * 1000:>10.1f}ms{max(overhead) * 1000:>10.1f}ms"
+              f"{wall:>9.2f}s{cpu * 1000:>8.0f}ms")
+    print(f"idle scheduler: {idle_cpu():.3f}% CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Serialization cost of API listings: FastAPI's default path versus fastjson.
+
+Usage:
+    python benchmarks/bench_json.py [games]
+
+"default" is what FastAPI does with a returned dict (jsonable_encoder, then
+JSONResponse.render); "fastjson" is the FAST_JSON=1 encoder (orjson when
+installed); "cached" is a hit in the encoded-body cache for unchanged data.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import fastjson  # noqa: E402
+
+
+def payloads(count):
+    store_page = {
+        "games": [{"name": f"Synthetic Game {i:05d} (USA, Europe).zip",
+                   "url": f"https://myrient.erista.me/files/No-Intro/Nintendo/Synthetic%20Game%20{i:05d}.zip",
+                   "size": f"{i % 900 + 1}.5 MB", "region": "USA"} for i in range(count)],
+        "total": count, "offset": 0, "limit": None,
+    }
+    library_page = {
+        "games": [{"name": f"Game {i:05d} (Europe).sfc", "path": f"SNES/Game {i:05d} (Europe).sfc"} for i in range(count)],
+        "total": count, "offset": 0, "limit": None, "next_cursor": None,
+    }
+    systems = {"systems": [f"System {i}" for i in range(60)]}
+    return {"store page": store_page, "library page": library_page, "systems": systems}
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    cache = fastjson.EncodedCache(64 * 1024 * 1024)
+    print(f"encoder: {cache.stats()['encoder']}, {count} games per listing")
+    print(f"{'':14}{'default':>12}{'fastjson':>12}{'cached':>12}{'size':>10}")
+    for name, payload in payloads(count).items():
+        repeat = 5 if len(payload.get("games", ())) > 1000 else 200
+        default = timed(lambda: JSONResponse(jsonable_encoder(payload)).body, repeat)
+        fast = timed(lambda: fastjson.FastJSONResponse(payload).body, repeat)
+        cache.encode(name, lambda: payload)
+        cached = timed(lambda: fastjson.FastJSONResponse(cache.encode(name, lambda: payload)).body, repeat)
+        size = len(fastjson.dumps(payload))
+        print(f"{name:14}{default:>10.3f}ms{fast:>10.3f}ms{cached:>10.3f}ms{size / 1024:>8.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""ROM streaming throughput: Starlette's FileResponse versus romstream.
+
+Usage:
+    python benchmarks/bench_rom_stream.py                  # sparse 4 GB image in a temp dir
+    python benchmarks/bench_rom_stream.py /roms/psx/x.chd  # a real multi-GB image
+
+Drives both responses as ASGI apps with a sink that only counts bytes, so the
+numbers are the server-side cost of reading and handing out the body: a full
+transfer, random 1 MB range reads (what an emulator seeking in a CHD does) and
+several concurrent full transfers under the stream limit. A sparse file reads
+from the page cache without touching the disk; use a real image (and drop the
+caches between runs) to see the effect of read-ahead.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from starlette.responses import FileResponse  # noqa: E402
+
+from romstream import RomStreamer  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def scope(headers=()):
+    return {"type": "http", "method": "GET", "path": "/", "headers": [(k.encode(), v.encode()) for k, v in headers],
+            "asgi": {"spec_version": "2.4"}, "extensions": {}}
+
+
+async def receive():
+    await asyncio.Event().wait()
+
+
+async def transfer(app, headers=()):
+    received = 0
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+
+    await app(scope(headers), receive, send)
+    return received
+
+
+async def run(path, streams):
+    size = os.path.getsize(path)
+    streamers = {
+        "romstream": RomStreamer(max_streams=streams, chunk_size=MB, read_ahead=8 * MB),
+        "romstream 4M": RomStreamer(max_streams=streams, chunk_size=4 * MB, read_ahead=32 * MB),
+    }
+    builders = {"FileResponse": lambda: FileResponse(path)}
+    for name, streamer in streamers.items():
+        builders[name] = lambda streamer=streamer: streamer.response(path)
+
+    ranges = [random.randrange(0, max(size - MB, 1)) for _ in range(200)]
+    print(f"{path}: {size / 1024 ** 3:.2f} GB, {streams} concurrent streams")
+    print(f"{'':14}{'full':>12}{'ranges x200':>14}{'concurrent':>14}")
+    for name, build in builders.items():
+        started = time.perf_counter()
+        await transfer(build())
+        full = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for offset in ranges:
+            await transfer(build(), [("range", f"bytes={offset}-{offset + MB - 1}")])
+        seeks = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await asyncio.gather(*(transfer(build()) for _ in range(streams)))
+        concurrent = time.perf_counter() - started
+        print(f"{name:14}{size / MB / full:>8.0f}MB/s{seeks * 1000 / len(ranges):>10.2f}ms/op"
+              f"{size * streams / MB / concurrent:>10.0f}MB/s")
+
+
+def main():
+    streams = int(os.getenv("STREAMS", 4))
+    if len(sys.argv) > 1:
+        asyncio.run(run(sys.argv[1], streams))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "image.iso")
+        with open(path, "wb") as f:
+            f.truncate(4 * 1024 ** 3)
+        asyncio.run(run(path, streams))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Segmented download: single stream vs N parallel byte ranges.
+
+Usage:
+    python benchmarks/bench_segmented.py [size_mb] [per_connection_mb_s]
+
+A local HTTP server throttles every connection to the given rate, the way
+myrient or archive.org do, and serves a random file with Range support. The
+same file is fetched once over a single connection (the former 4 KiB
+iter_content loop) and then with rgsx.segmented for several segment counts.
+"""
+import os
+import re
+import sys
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+
+from rgsx.partial import PartialDownload  # noqa: E402
+from rgsx.segmented import SegmentedDownload  # noqa: E402
+
+PAYLOAD = b""
+RATE = 0
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        size = len(PAYLOAD)
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, size - 1
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        # Token bucket: RATE bytes per second for this connection
+        block = 64 * 1024
+        began = time.perf_counter()
+        sent = 0
+        try:
+            for pos in range(start, end + 1, block):
+                chunk = PAYLOAD[pos:min(pos + block, end + 1)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                ahead = sent / RATE - (time.perf_counter() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def single_stream(url, dest):
+    with requests.get(url, stream=True, timeout=30) as response, open(dest, "wb") as f:
+        for chunk in response.iter_content(chunk_size=4096):
+            f.write(chunk)
+
+
+def segmented(url, dest, segments):
+    partial = PartialDownload(dest, url)
+    partial.prepare(len(PAYLOAD))
+    SegmentedDownload(requests.Session(), url, partial, segments=segments).run()
+    partial.complete()
+
+
+def main():
+    global PAYLOAD, RATE
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    RATE = float(sys.argv[2] if len(sys.argv) > 2 else 16) * 1024 * 1024
+    PAYLOAD = os.urandom(size_mb * 1024 * 1024)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/rom.bin"
+
+    print(f"{size_mb} MB, {RATE / 1024 ** 2:.0f} MB/s per connection")
+    print(f"{'':14}{'time':>9}{'MB/s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        dest = os.path.join(tmp, "rom.bin")
+        runs = [("single", lambda: single_stream(url, dest))]
+        for segments in (2, 4, 8):
+            runs.append((f"segments={segments}", lambda n=segments: segmented(url, dest, n)))
+        for name, run in runs:
+            started = time.perf_counter()
+            run()
+            took = time.perf_counter() - started
+            with open(dest, "rb") as f:
+                assert f.read() == PAYLOAD, name
+            print(f"{name:14}{took:>8.2f}s{len(PAYLOAD) / took / 1024 ** 2:>9.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
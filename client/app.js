@@ -1,12 +1,17 @@
 const API_BASE = '/api';
+const LIBRARY_PAGE_SIZE = 120;
+const STORE_PAGE_SIZE = 100;
 
 // State
 let appState = {
     currentView: 'library-all',
     systems: [],
     libraryGames: [],
+    libraryNextCursor: null,
+    favoriteGames: [],
     storePlatforms: [],
     storeGames: [],
+    storeTotal: 0,
     favorites: new Set(),
     activeDownloads: {}, // task_id -> data
     currentSystemFilter: null
@@ -134,10 +139,7 @@ function switchView(viewName) {
     if (viewName.startsWith('library')) {
         document.getElementById('view-library').classList.add('active');
         if (viewName === 'library-favorites') {
-             // Filter current library for favorites or re-fetch all favorites?
-             // Simplified: just re-render current grid with filter
-             renderLibraryGrid(appState.libraryGames.filter(g => appState.favorites.has(`${appState.currentSystemFilter}|${g.name}`)));
-             document.getElementById('library-title').textContent = "FAVORITES";
+             loadFavorites();
         } else if (viewName === 'library-recents') {
              loadRecents();
         } else {
@@ -156,9 +158,9 @@ async function loadLibraryGames(system) {
     document.getElementById('library-title').textContent = `LOADING ${system.toUpperCase()}...`;
 
     try {
-        const res = await fetch(`${API_BASE}/games/${encodeURIComponent(system)}`);
-        const data = await res.json();
+        const data = await fetchLibraryPage(system, null);
         appState.libraryGames = data.games || [];
+        appState.libraryNextCursor = data.next_cursor || null;
         renderLibraryGrid(appState.libraryGames);
         document.getElementById('library-title').textContent = system.toUpperCase();
     } catch (e) {
@@ -166,6 +168,41 @@ async function loadLibraryGames(system) {
     }
 }
 
+async function fetchLibraryPage(system, cursor) {
+    let url = `${API_BASE}/games/${encodeURIComponent(system)}?limit=${LIBRARY_PAGE_SIZE}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    const res = await fetch(url);
+    return res.json();
+}
+
+async function loadMoreLibraryGames() {
+    const system = appState.currentSystemFilter;
+    if (!system || !appState.libraryNextCursor) return;
+    try {
+        const data = await fetchLibraryPage(system, appState.libraryNextCursor);
+        appState.libraryGames = appState.libraryGames.concat(data.games || []);
+        appState.libraryNextCursor = data.next_cursor || null;
+        renderLibraryGrid(appState.libraryGames);
+    } catch (e) {
+        console.error("Load More Error:", e);
+    }
+}
+
+async function loadFavorites() {
+    // Favorites are "system|name" ids: list them directly rather than from the loaded library pages
+    document.getElementById('library-title').textContent = "FAVORITES";
+    try {
+        const res = await fetch(`${API_BASE}/favorites`);
+        const data = await res.json();
+        appState.favorites = new Set(data.favorites || []);
+        const system = appState.currentSystemFilter;
+        appState.favoriteGames = [...appState.favorites]
+            .map(id => { const i = id.indexOf('|'); return { system: id.slice(0, i), name: id.slice(i + 1) }; })
+            .filter(g => !system || g.system === system);
+        renderLibraryGrid(appState.favoriteGames);
+    } catch(e) { console.error(e); }
+}
+
 async function loadRecents() {
     document.getElementById('library-title').textContent = "RECENTS";
     try {
@@ -217,6 +254,16 @@ function renderLibraryGrid(games) {
 
         grid.appendChild(card);
     });
+
+    // Only the library listing is paged; favorites/recents pass their own arrays
+    if (games === appState.libraryGames && appState.libraryNextCursor) {
+        const more = document.createElement('button');
+        more.className = 'download-btn';
+        more.style.gridColumn = '1/-1';
+        more.textContent = 'LOAD MORE';
+        more.onclick = () => loadMoreLibraryGames();
+        grid.appendChild(more);
+    }
 }
 
 async function launchNativeGame(game) {
@@ -236,25 +283,56 @@ async function launchNativeGame(game) {
 }
 
 function filterGrid(query) {
-    if (appState.currentView.startsWith('library')) {
-        const filtered = appState.libraryGames.filter(g => g.name.toLowerCase().includes(query));
-        renderLibraryGrid(filtered);
+    if (appState.currentView === 'library-favorites') {
+        // The favorites list is complete, filter it in place
+        renderLibraryGrid(appState.favoriteGames.filter(g => g.name.toLowerCase().includes(query)));
+    } else if (appState.currentView.startsWith('library')) {
+        // Only some library pages are loaded: search the whole system server-side
+        clearTimeout(librarySearchTimer);
+        if (!query) {
+            renderLibraryGrid(appState.libraryGames);
+            return;
+        }
+        librarySearchTimer = setTimeout(() => searchLibrary(query), 250);
     } else if (appState.currentView === 'store-browse') {
-        const filtered = appState.storeGames.filter(g => g.name.toLowerCase().includes(query));
-        renderStoreGrid(filtered);
+        // Store catalogs are searched server-side; debounce keystrokes
+        const platform = document.getElementById('store-platform-select').value;
+        if (!platform) return;
+        clearTimeout(storeSearchTimer);
+        storeSearchTimer = setTimeout(() => loadStoreGames(platform, query), 250);
+    }
+}
+
+let storeSearchTimer = null;
+let librarySearchTimer = null;
+
+async function searchLibrary(query) {
+    let url = `${API_BASE}/library/search?q=${encodeURIComponent(query)}&limit=200`;
+    if (appState.currentSystemFilter) url += `&system=${encodeURIComponent(appState.currentSystemFilter)}`;
+    try {
+        const res = await fetch(url);
+        const data = await res.json();
+        // Ignore answers to queries the user has already typed past
+        if (document.getElementById('global-search').value.toLowerCase() !== query) return;
+        renderLibraryGrid((data.results || []).map(r => ({ name: r.name, system: r.system })));
+    } catch (e) {
+        console.error("Library Search Error:", e);
     }
 }
 
 // --- Store Logic ---
 
-async function loadStoreGames(platform) {
+async function loadStoreGames(platform, query = '') {
     const grid = document.getElementById('store-grid');
     grid.innerHTML = '<div style="color: var(--md-sys-color-primary); grid-column: 1/-1; text-align: center;">ACCESSING NEURAL NET...</div>';
 
     try {
-        const res = await fetch(`${API_BASE}/store/games/${encodeURIComponent(platform)}`);
+        let url = `${API_BASE}/store/games/${encodeURIComponent(platform)}?limit=${STORE_PAGE_SIZE}`;
+        if (query) url += `&q=${encodeURIComponent(query)}`;
+        const res = await fetch(url);
         const data = await res.json();
         appState.storeGames = data.games || [];
+        appState.storeTotal = data.total || appState.storeGames.length;
         renderStoreGrid(appState.storeGames);
     } catch (e) {
         grid.innerHTML = `<div style="color: red; grid-column: 1/-1; text-align: center;">CONNECTION FAILED: ${e.message}</div>`;
@@ -270,8 +348,8 @@ function renderStoreGrid(games) {
         return;
     }
 
-    // Limit to first 100 to avoid DOM overload
-    games.slice(0, 100).forEach(game => {
+    // The server only sends the first page (STORE_PAGE_SIZE entries)
+    games.forEach(game => {
         const card = document.createElement('div');
         card.className = 'store-card';
 
@@ -294,6 +372,13 @@ function renderStoreGrid(games) {
         card.appendChild(btn);
         grid.appendChild(card);
     });
+
+    if (appState.storeTotal > games.length) {
+        const note = document.createElement('div');
+        note.style.cssText = 'color: #666; grid-column: 1/-1; text-align: center;';
+        note.textContent = `SHOWING ${games.length} OF ${appState.storeTotal} - REFINE SEARCH`;
+        grid.appendChild(note);
+    }
 }
 
 async function triggerDownload(game, btnElement) {
@@ -0,0 +1,249 @@
+"""Response compression and precompressed static client files.
+
+CompressionMiddleware compresses text-like responses (JSON, NDJSON, HTML,
+JS, CSS...) above a size threshold, with brotli when the client accepts it and
+the brotli module is installed, otherwise gzip. Streamed responses are
+compressed chunk by chunk and flushed after each one so they keep streaming.
+ROM downloads and other binary responses are never touched.
+
+Static files are precompressed into .br/.gz siblings, at image build time
+(`python server/compression.py client`) or at startup, and served by
+PrecompressedStaticFiles with the matching Content-Encoding.
+"""
+import os
+import sys
+import gzip
+import zlib
+import logging
+from mimetypes import guess_type
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("retro-api")
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+)
+PRECOMPRESS_EXTS = (".html", ".js", ".css", ".svg", ".json", ".txt", ".xml")
+SKIP_STATUSES = (204, 206, 304)
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    codings: Dict[str, float] = {}
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def accepted_encodings(value: str) -> List[str]:
+    """Encodings usable for a request, best first ("br", "gzip")."""
+    codings = parse_accept_encoding(value)
+    wildcard = codings.get("*", 0.0)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return [c for c in supported if codings.get(c, wildcard) > 0]
+
+
+class Encoder:
+    """Incremental br/gzip compressor."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 5):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if not encodings:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingSender(send, encodings[0], self)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingSender:
+    def __init__(self, send, encoding: str, options: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.options = options
+        self.start_message = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if (message["status"] in SKIP_STATUSES or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                # Held back until the first body chunk tells whether it is worth compressing
+                self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.options.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.encoder = Encoder(self.encoding, self.options.gzip_level, self.options.brotli_quality)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            # The encoded bytes differ, so a strong validator no longer applies
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            if more_body:
+                del headers["content-length"]
+                await self.send(start)
+            else:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+        if more_body:
+            await self.send({"type": "http.response.body", "body": self.encoder.compress(body, flush=True),
+                             "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.encoder.compress(body) + self.encoder.finish()})
+
+
+# --- Precompressed static files ---
+
+def _compressors():
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+def precompress_directory(directory: str, minimum_size: int = 256) -> int:
+    """Writes .gz (and .br) siblings for the text assets of `directory` that are
+    missing or older than their source. Returns the number of files written."""
+    written = 0
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if not name.lower().endswith(PRECOMPRESS_EXTS):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                if st.st_size < minimum_size:
+                    continue
+                data = None
+                for suffix, compress in _compressors():
+                    target = path + suffix
+                    try:
+                        if os.stat(target).st_mtime == st.st_mtime:
+                            continue
+                    except FileNotFoundError:
+                        pass
+                    if data is None:
+                        with open(path, "rb") as f:
+                            data = f.read()
+                    tmp = target + ".tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(compress(data))
+                    # Same mtime as the source marks the variant as current
+                    os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+                    os.replace(tmp, target)
+                    written += 1
+            except OSError as e:
+                logger.warning(f"Precompression: cannot write variants of {path}: {e}")
+                continue
+    return written
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving a current .br/.gz sibling when the client accepts it."""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        name = str(full_path)
+        if not name.lower().endswith(PRECOMPRESS_EXTS):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        request_headers = Headers(scope=scope)
+        variant = self._variant(name, stat_result, accepted_encodings(request_headers.get("accept-encoding", "")))
+        if variant is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.add_vary_header("Accept-Encoding")
+            return response
+        encoding, variant_path, variant_stat = variant
+        response = FileResponse(variant_path, status_code=status_code, stat_result=variant_stat,
+                                media_type=guess_type(name)[0] or "text/plain",
+                                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _variant(path: str, stat_result: os.stat_result, encodings: List[str]) -> Optional[Tuple[str, str, os.stat_result]]:
+        for encoding in encodings:
+            candidate = path + (".br" if encoding == "br" else ".gz")
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            if st.st_mtime == stat_result.st_mtime:
+                return encoding, candidate, st
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for folder in sys.argv[1:] or ["client"]:
+        print(f"{folder}: {precompress_directory(folder)} precompressed files written")
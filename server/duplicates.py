@@ -0,0 +1,178 @@
+"""Duplicate ROM detection across the library.
+
+The same image often sits under both BASE_PATH/<system> and
+BASE_PATH/Emulators/<system>/roms. Files are compared in three passes so that
+a large volume is mostly never read:
+
+1. every ROM is bucketed by size (a stat, no read);
+2. files sharing a size get a partial hash of their head and tail;
+3. files sharing a partial hash get a full hash, taken from the HashStore when
+   it already holds a current one, and stored there otherwise.
+
+Hard links to the same inode are one file, not duplicates.
+"""
+import os
+import time
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from library import LibraryIndex
+from hashing import HashStore, hash_file
+
+logger = logging.getLogger("retro-api")
+
+
+def partial_hash(path: str, size: int, sample_size: int) -> str:
+    """SHA1 of the first and last `sample_size` bytes of a file."""
+    sha1 = hashlib.sha1(usedforsecurity=False)
+    with open(path, "rb") as f:
+        sha1.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(sample_size, size - sample_size))
+            sha1.update(f.read(sample_size))
+    return sha1.hexdigest()
+
+
+class DuplicateFinder:
+    def __init__(self, library: LibraryIndex, hashes: Optional[HashStore] = None,
+                 sample_size: int = 64 * 1024, buffer_size: int = 1024 * 1024):
+        self.library = library
+        self.hashes = hashes
+        self.sample_size = sample_size
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._status: Dict[str, Any] = {"state": "idle"}
+        self._report: Optional[Dict[str, Any]] = None
+
+    def start(self) -> bool:
+        """Runs find() in a background thread unless one is already running."""
+        if self._run_lock.locked():
+            return False
+        threading.Thread(target=self.find, name="duplicates", daemon=True).start()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._report
+
+    def _update(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+
+    def _files(self) -> List[Tuple[str, str, os.stat_result]]:
+        """(system, path, stat) of every ROM file, one per inode."""
+        files, inodes = [], set()
+        for rom_dir in sorted(self.library.paths()):
+            system = self.library.system_of(rom_dir)
+            entry = self.library.cached(rom_dir)
+            if system is None or entry is None:
+                continue
+            for game in entry.games:
+                path = os.path.join(rom_dir, game["name"])
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if not os.path.isfile(path) or (st.st_dev, st.st_ino) in inodes:
+                    continue
+                inodes.add((st.st_dev, st.st_ino))
+                files.append((system, path, st))
+        return files
+
+    def _full_hash(self, path: str, st: os.stat_result) -> Tuple[Optional[str], bool]:
+        """SHA1 of `path` and whether it came from the hash store."""
+        if self.hashes is not None:
+            record = self.hashes.record(path)
+            current = record is not None and record[0] == st.st_size and record[1] == st.st_mtime_ns
+            hashes = self.hashes.hash_path(path)
+            return (hashes["sha1"] if hashes is not None else None), current
+        return hash_file(path, self.buffer_size)["sha1"], False
+
+    def find(self) -> Dict[str, Any]:
+        with self._run_lock:
+            started = time.time()
+            self._update(state="listing", started_at=started, finished_at=None, error=None,
+                         files=0, size_collisions=0, partial_hashed=0, full_hashed=0, reused_hashes=0)
+            try:
+                report = self._find(started)
+            except Exception as e:
+                self._update(state="error", error=str(e), finished_at=time.time())
+                raise
+            with self._lock:
+                self._report = report
+                self._status.update(state="done", finished_at=time.time())
+            logger.info(f"Duplicates: {len(report['groups'])} groups, {report['wasted_bytes'] / 1024 ** 3:.2f} GB "
+                        f"reclaimable, found in {report['took_s']:.1f}s")
+            return report
+
+    def _find(self, started: float) -> Dict[str, Any]:
+        files = self._files()
+        by_size: Dict[int, List[Tuple[str, str, os.stat_result]]] = {}
+        for item in files:
+            if item[2].st_size > 0:
+                by_size.setdefault(item[2].st_size, []).append(item)
+        candidates = [bucket for bucket in by_size.values() if len(bucket) > 1]
+        self._update(state="hashing", files=len(files), size_collisions=sum(len(b) for b in candidates))
+
+        partial_hashed = full_hashed = reused = 0
+        groups = []
+        for bucket in candidates:
+            size = bucket[0][2].st_size
+            # Below two samples the partial hash would read the whole file anyway
+            if size > 2 * self.sample_size:
+                by_partial: Dict[str, list] = {}
+                for item in bucket:
+                    try:
+                        by_partial.setdefault(partial_hash(item[1], size, self.sample_size), []).append(item)
+                    except OSError:
+                        continue
+                    partial_hashed += 1
+                sub_buckets = [b for b in by_partial.values() if len(b) > 1]
+            else:
+                sub_buckets = [bucket]
+            self._update(partial_hashed=partial_hashed)
+
+            for sub_bucket in sub_buckets:
+                by_full: Dict[str, list] = {}
+                for item in sub_bucket:
+                    try:
+                        sha1, from_store = self._full_hash(item[1], item[2])
+                    except OSError:
+                        continue
+                    if sha1 is None:
+                        continue
+                    if from_store:
+                        reused += 1
+                    else:
+                        full_hashed += 1
+                    by_full.setdefault(sha1, []).append(item)
+                self._update(full_hashed=full_hashed, reused_hashes=reused)
+                for sha1, same in by_full.items():
+                    if len(same) > 1:
+                        groups.append({
+                            "size": size,
+                            "sha1": sha1,
+                            "wasted_bytes": size * (len(same) - 1),
+                            "files": [{"system": system, "name": os.path.basename(path),
+                                       "path": os.path.relpath(path, self.library.base_path)}
+                                      for system, path, _ in same],
+                        })
+
+        groups.sort(key=lambda g: g["wasted_bytes"], reverse=True)
+        return {
+            "groups": groups,
+            "wasted_bytes": sum(g["wasted_bytes"] for g in groups),
+            "files": len(files),
+            "size_collisions": sum(len(b) for b in candidates),
+            "partial_hashed": partial_hashed,
+            "full_hashed": full_hashed,
+            "reused_hashes": reused,
+            "took_s": round(time.time() - started, 3),
+        }
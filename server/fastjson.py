@@ -0,0 +1,48 @@
+"""Fast JSON encoding for the hot read endpoints (opt-in with FAST_JSON=1).
+
+Bodies are encoded with orjson when it is installed, otherwise with the
+standard json module using the same compact settings. Encoded bodies can be
+kept in an EncodedCache keyed by the version of the data they were built from,
+so an unchanged listing is sent again without rebuilding or re-encoding it.
+"""
+import json
+from typing import Any, Callable, Dict, Hashable
+
+from fastapi.responses import JSONResponse
+
+from lrucache import ByteLRU
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with dumps(); also accepts an already encoded body."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class EncodedCache(ByteLRU):
+    """LRU of encoded response bodies bounded by their total size."""
+
+    def encode(self, key: Hashable, build: Callable[[], Any]) -> bytes:
+        """Cached body for `key`, calling build() and encoding its result on a miss."""
+        body = self.get(key)
+        if body is None:
+            body = dumps(build())
+            self.put(key, body)
+        return body
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(super().stats(), encoder="orjson" if orjson is not None else "json")
@@ -0,0 +1,300 @@
+"""Background CRC32/MD5/SHA1 hashing of library ROMs.
+
+Hashes identify ROMs for duplicate detection and metadata matching. They are
+computed by a background worker with large buffered reads, fed by the change
+events of the library index, and persisted under CONFIG_PATH keyed by path,
+size and mtime, so an unchanged file is never hashed twice, across restarts
+included.
+
+For .zip files the CRC32 and size of every inner file are also read from the
+central directory, which identifies the ROM inside (as listed by No-Intro and
+Redump DATs) without decompressing anything.
+"""
+import os
+import json
+import time
+import zlib
+import hashlib
+import zipfile
+import threading
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from library import LibraryIndex, DirEntry
+
+logger = logging.getLogger("retro-api")
+
+HASHES_FORMAT_VERSION = 1
+
+
+def hash_file(path: str, buffer_size: int = 1024 * 1024) -> Dict[str, str]:
+    """CRC32, MD5 and SHA1 of the file at `path`, read once."""
+    crc = 0
+    md5 = hashlib.md5(usedforsecurity=False)
+    sha1 = hashlib.sha1(usedforsecurity=False)
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            crc = zlib.crc32(chunk, crc)
+            md5.update(chunk)
+            sha1.update(chunk)
+    return {"crc32": f"{crc:08x}", "md5": md5.hexdigest(), "sha1": sha1.hexdigest()}
+
+
+def zip_entries(path: str) -> Optional[List[Dict[str, Any]]]:
+    """Name, size and CRC32 of the files of a zip, from its central directory."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return [{"name": i.filename, "size": i.file_size, "crc32": f"{i.CRC:08x}"}
+                    for i in zf.infolist() if not i.is_dir()]
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+class HashStore:
+    """Persistent ROM hashes, kept current by a background worker."""
+
+    def __init__(self, library: LibraryIndex, hashes_file: str, buffer_size: int = 1024 * 1024,
+                 save_interval: float = 30.0):
+        self.library = library
+        self.hashes_file = hashes_file
+        self.buffer_size = buffer_size
+        self.save_interval = save_interval
+        # path -> [size, mtime_ns, crc32, md5, sha1, zip entries or None]
+        self._records: Dict[str, list] = {}
+        self._queue: Deque[str] = deque()
+        self._queued: Set[str] = set()
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._last_save = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self.current: Optional[str] = None
+        self.hashed = 0
+        self.hashed_bytes = 0
+        self.errors = 0
+        library.add_listener(self._on_library_change)
+
+    # --- Persistence ---
+
+    def load(self):
+        if not os.path.exists(self.hashes_file):
+            return
+        try:
+            with open(self.hashes_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != HASHES_FORMAT_VERSION:
+                logger.info("ROM hashes: stale format, ignoring persisted hashes")
+                return
+            with self._cond:
+                self._records = data.get("files", {})
+            logger.info(f"ROM hashes: loaded {len(self._records)} records from {self.hashes_file}")
+        except Exception as e:
+            logger.error(f"ROM hashes: failed to load {self.hashes_file}: {e}")
+
+    def save(self):
+        with self._cond:
+            if not self._dirty:
+                return
+            payload = {"version": HASHES_FORMAT_VERSION, "files": dict(self._records)}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp_path = self.hashes_file + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.hashes_file)
+        except Exception as e:
+            logger.error(f"ROM hashes: failed to save {self.hashes_file}: {e}")
+            with self._cond:
+                self._dirty = True
+                self._last_save = time.monotonic()
+
+    # --- Queue ---
+
+    def _on_library_change(self, path: str, entry: Optional[DirEntry]):
+        if self.library.system_of(path) is None:
+            return
+        if entry is None:
+            self.forget(path)
+            return
+        files = set(entry.files)
+        with self._cond:
+            prefix = path + os.sep
+            for stale in [p for p in self._records if p.startswith(prefix) and os.path.basename(p) not in files]:
+                del self._records[stale]
+                self._dirty = True
+        self.enqueue(os.path.join(path, g["name"]) for g in entry.games)
+
+    def forget(self, directory: str):
+        prefix = directory + os.sep
+        with self._cond:
+            for path in [p for p in self._records if p.startswith(prefix)]:
+                del self._records[path]
+                self._dirty = True
+
+    def enqueue(self, paths, front: bool = False):
+        """Queues files to be hashed; those already current are skipped by the worker."""
+        with self._cond:
+            for path in paths:
+                if path in self._queued:
+                    if front:
+                        self._queue.remove(path)
+                        self._queue.appendleft(path)
+                    continue
+                self._queued.add(path)
+                if front:
+                    self._queue.appendleft(path)
+                else:
+                    self._queue.append(path)
+            self._cond.notify()
+
+    def enqueue_library(self):
+        """Queues every ROM of the library, e.g. after the startup scan."""
+        for path in self.library.paths():
+            if self.library.system_of(path) is None:
+                continue
+            entry = self.library.cached(path)
+            if entry is not None:
+                self.enqueue(os.path.join(path, g["name"]) for g in entry.games)
+
+    # --- Worker ---
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="rom-hashing", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread = None
+        self.save()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    if not self._dirty:
+                        self._cond.wait()
+                        continue
+                    # At most one save per save_interval, so a failing save is not retried in a loop
+                    remaining = self.save_interval - (time.monotonic() - self._last_save)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stop:
+                    return
+                path = self._queue.popleft() if self._queue else None
+            if path is None:
+                # Queue drained: persist what was hashed
+                self.save()
+                continue
+            try:
+                self.hash_path(path)
+            finally:
+                with self._cond:
+                    self._queued.discard(path)
+            if time.monotonic() - self._last_save >= self.save_interval:
+                self.save()
+
+    def hash_path(self, path: str) -> Optional[Dict[str, Any]]:
+        """Hashes `path` unless its persisted record matches its size and mtime."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._cond:
+                if self._records.pop(path, None) is not None:
+                    self._dirty = True
+            return None
+        if not os.path.isfile(path):
+            return None
+        with self._cond:
+            record = self._records.get(path)
+        if record is not None and record[0] == st.st_size and record[1] == st.st_mtime_ns:
+            return self._to_dict(record)
+
+        self.current = path
+        started = time.monotonic()
+        try:
+            hashes = hash_file(path, self.buffer_size)
+        except OSError as e:
+            self.errors += 1
+            logger.error(f"ROM hashes: cannot hash {path}: {e}")
+            return None
+        finally:
+            self.current = None
+        entries = zip_entries(path) if path.lower().endswith(".zip") else None
+        record = [st.st_size, st.st_mtime_ns, hashes["crc32"], hashes["md5"], hashes["sha1"], entries]
+        with self._cond:
+            self._records[path] = record
+            self._dirty = True
+            self.hashed += 1
+            self.hashed_bytes += st.st_size
+        logger.debug(f"ROM hashes: {path} ({st.st_size / 1024 ** 2:.1f} MB) in {time.monotonic() - started:.2f}s")
+        return self._to_dict(record)
+
+    # --- Queries ---
+
+    @staticmethod
+    def _to_dict(record: list) -> Dict[str, Any]:
+        size, _mtime_ns, crc32, md5, sha1, entries = record
+        result = {"size": size, "crc32": crc32, "md5": md5, "sha1": sha1}
+        if entries is not None:
+            result["entries"] = entries
+        return result
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Current hashes of `path`, or None (queueing it first in line) when they
+        are missing or the file changed since it was hashed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._cond:
+            record = self._records.get(path)
+        if record is not None and record[0] == st.st_size and record[1] == st.st_mtime_ns:
+            return self._to_dict(record)
+        self.enqueue([path], front=True)
+        return None
+
+    def record(self, path: str) -> Optional[list]:
+        """Raw persisted record of `path` without checking the file (size, mtime_ns, crc32, md5, sha1, entries)."""
+        with self._cond:
+            return self._records.get(path)
+
+    def system_hashes(self, system: str) -> Dict[str, Dict[str, Any]]:
+        """Current hashes of the ROMs of `system`, by game name. Records of files
+        changed since they were hashed are left out and the files queued again."""
+        result: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for rom_dir in self.library.system_dirs(system):
+            prefix = rom_dir + os.sep
+            with self._cond:
+                records = [(p, r) for p, r in self._records.items() if p.startswith(prefix)]
+            for path, record in records:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if record[0] != st.st_size or record[1] != st.st_mtime_ns:
+                    stale.append(path)
+                    continue
+                result.setdefault(path[len(prefix):], self._to_dict(record))
+        if stale:
+            self.enqueue(stale)
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"records": len(self._records), "queued": len(self._queue), "current": self.current,
+                    "hashed": self.hashed, "hashed_bytes": self.hashed_bytes, "errors": self.errors}
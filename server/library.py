@@ -0,0 +1,549 @@
+"""Persistent index of the local ROM library.
+
+Listing a large ROM mount on every request is slow, so directory contents are
+kept in memory and persisted under CONFIG_PATH between runs. Every directory is
+stored with its mtime and only re-listed when that mtime changes, which is what
+happens when an entry inside it is added, removed or renamed.
+"""
+import os
+import json
+import time
+import base64
+import bisect
+import threading
+import logging
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from search import GroupedSearchIndex
+
+logger = logging.getLogger("retro-api")
+
+VALID_EXTS = ('.zip', '.nes', '.sfc', '.smc', '.gba', '.gb', '.gbc', '.bin', '.gen',
+              '.n64', '.z64', '.v64', '.md', '.iso', '.pbp', '.cue', '.chd', '.gcz', '.rvz', '.dsk', '.dim')
+
+INDEX_FORMAT_VERSION = 1
+
+
+def _ext_of(name: str) -> str:
+    return os.path.splitext(name)[1].lower()
+
+
+# Ascending sort keys for the game listing; "-<key>" reverses the order
+SORT_KEYS: Dict[str, Callable[[Dict[str, str]], Any]] = {
+    "name": lambda g: g["name"],
+    "ext": lambda g: (_ext_of(g["name"]), g["name"]),
+}
+
+
+def encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+
+
+@dataclass
+class DirEntry:
+    """Snapshot of one directory listing. Treated as immutable once stored."""
+    mtime: float
+    files: List[str]
+    subdirs: List[str]
+    _games: Optional[List[Dict[str, str]]] = field(default=None, repr=False, compare=False)
+    _by_base: Optional[Dict[str, str]] = field(default=None, repr=False, compare=False)
+    _names: Optional[Set[str]] = field(default=None, repr=False, compare=False)
+    _orders: Dict[str, List[Dict[str, str]]] = field(default_factory=dict, repr=False, compare=False)
+    _by_ext: Optional[Dict[str, List[Dict[str, str]]]] = field(default=None, repr=False, compare=False)
+    _lower: Optional[List[str]] = field(default=None, repr=False, compare=False)
+    _lower_order: Optional[List[Dict[str, str]]] = field(default=None, repr=False, compare=False)
+
+    @property
+    def games(self) -> List[Dict[str, str]]:
+        if self._games is None:
+            self._games = sorted(
+                ({"name": f, "description": f, "path": f} for f in self.files if f.lower().endswith(VALID_EXTS)),
+                key=lambda x: x['name'],
+            )
+        return self._games
+
+    def sorted_games(self, key: str) -> List[Dict[str, str]]:
+        """Games in ascending `key` order, computed once per listing."""
+        if key == "name":
+            return self.games
+        order = self._orders.get(key)
+        if order is None:
+            order = sorted(self.games, key=SORT_KEYS[key])
+            self._orders[key] = order
+        return order
+
+    def games_with_exts(self, exts: Set[str]) -> List[Dict[str, str]]:
+        """Games having one of `exts` (lowercase, with dot), in name order."""
+        if self._by_ext is None:
+            by_ext: Dict[str, List[Dict[str, str]]] = {}
+            for g in self.games:
+                by_ext.setdefault(_ext_of(g["name"]), []).append(g)
+            self._by_ext = by_ext
+        buckets = [self._by_ext[e] for e in exts if e in self._by_ext]
+        if len(buckets) == 1:
+            return buckets[0]
+        return sorted((g for b in buckets for g in b), key=SORT_KEYS["name"])
+
+    def games_with_prefix(self, prefix: str) -> List[Dict[str, str]]:
+        """Games whose name starts with `prefix`, case-insensitively, in name order."""
+        if self._lower is None:
+            order = sorted(self.games, key=lambda g: g["name"].lower())
+            self._lower = [g["name"].lower() for g in order]
+            self._lower_order = order
+        prefix = prefix.lower()
+        lo = bisect.bisect_left(self._lower, prefix)
+        hi = bisect.bisect_left(self._lower, prefix + "\U0010ffff", lo)
+        return sorted(self._lower_order[lo:hi], key=SORT_KEYS["name"])
+
+    def lookup(self, game_name: str) -> Optional[str]:
+        """Resolves a ROM by exact entry name, then by name without extension."""
+        if self._by_base is None:
+            by_base: Dict[str, str] = {}
+            for name in self.files + self.subdirs:
+                by_base.setdefault(os.path.splitext(name)[0], name)
+            self._names = set(self.files) | set(self.subdirs)
+            self._by_base = by_base
+        if game_name in self._names:
+            return game_name
+        return self._by_base.get(os.path.splitext(game_name)[0])
+
+
+class LibraryIndex:
+    """In-memory view of BASE_PATH, revalidated from directory mtimes."""
+
+    def __init__(self, base_path: str, index_file: str, revalidate_interval: float = 10.0,
+                 save_interval: float = 30.0, scan_workers: int = 8):
+        self.base_path = base_path
+        self.index_file = index_file
+        self.revalidate_interval = revalidate_interval
+        self.save_interval = save_interval
+        self._dirs: Dict[str, DirEntry] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._listeners: List[Callable[[str, Optional[DirEntry]], None]] = []
+        self.scan_workers = max(1, scan_workers)
+        self._refresh_lock = threading.Lock()
+        self._scan_status: Dict[str, Any] = {"state": "idle", "total": 0, "done": 0, "listed": 0}
+        # Incremented on every listing change; identifies a state of the index for response caches
+        self.version = 0
+
+    # --- Paths ---
+
+    def system_dirs(self, system: str) -> List[str]:
+        """Candidate ROM directories for a system, in lookup order."""
+        return [
+            os.path.join(self.base_path, system),
+            os.path.join(self.base_path, "Emulators", system, "roms"),
+        ]
+
+    def is_rom_path(self, path: str) -> bool:
+        """True for directories the index tracks: BASE_PATH/<x>, Emulators/<x> and Emulators/<x>/roms."""
+        rel = os.path.relpath(path, self.base_path)
+        if rel.startswith(os.pardir) or rel == os.curdir:
+            return False
+        parts = rel.split(os.sep)
+        if len(parts) == 1:
+            return True
+        return parts[0] == "Emulators" and (len(parts) == 2 or (len(parts) == 3 and parts[2] == "roms"))
+
+    def system_of(self, path: str) -> Optional[str]:
+        """System name of a ROM directory (BASE_PATH/<x> or Emulators/<x>/roms), else None."""
+        parts = os.path.relpath(path, self.base_path).split(os.sep)
+        if len(parts) == 1 and parts[0] not in (os.curdir, os.pardir, "Emulators") and not parts[0].startswith('.'):
+            return parts[0]
+        if len(parts) == 3 and parts[0] == "Emulators" and parts[2] == "roms":
+            return parts[1]
+        return None
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._dirs)
+
+    def cached(self, path: str) -> Optional[DirEntry]:
+        """Cached listing of `path` without revalidation."""
+        with self._lock:
+            return self._dirs.get(path)
+
+    # --- Change events ---
+
+    def add_listener(self, callback: Callable[[str, Optional[DirEntry]], None]):
+        """Registers `callback(path, entry)`, called whenever a directory listing changes.
+        `entry` is None when the directory disappeared."""
+        self._listeners.append(callback)
+
+    def _notify(self, path: str, entry: Optional[DirEntry]):
+        with self._lock:
+            self.version += 1
+        for callback in list(self._listeners):
+            try:
+                callback(path, entry)
+            except Exception as e:
+                logger.error(f"Library index: change listener failed for {path}: {e}")
+
+    # --- Persistence ---
+
+    def load(self):
+        """Loads the persisted index. Entries are revalidated lazily on first use."""
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_FORMAT_VERSION or data.get("base_path") != self.base_path:
+                logger.info("Library index: stale format or base path, ignoring cached index")
+                return
+            dirs = {path: DirEntry(mtime, files, subdirs) for path, (mtime, files, subdirs) in data.get("dirs", {}).items()}
+            with self._lock:
+                self._dirs = dirs
+                self._checked.clear()
+                self.version += 1
+            logger.info(f"Library index: loaded {len(dirs)} directories from {self.index_file}")
+        except Exception as e:
+            logger.error(f"Library index: failed to load {self.index_file}: {e}")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {
+                "version": INDEX_FORMAT_VERSION,
+                "base_path": self.base_path,
+                "dirs": {path: [e.mtime, e.files, e.subdirs] for path, e in self._dirs.items()},
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp_path = self.index_file + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            logger.error(f"Library index: failed to save {self.index_file}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def _maybe_save(self):
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    # --- Scanning ---
+
+    @staticmethod
+    def _stat_mtime(path: str) -> Optional[float]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime
+
+    @staticmethod
+    def _scan(path: str, mtime: float) -> DirEntry:
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+        files.sort()
+        subdirs.sort()
+        return DirEntry(mtime, files, subdirs)
+
+    def _get(self, path: str, force: bool = False) -> Optional[DirEntry]:
+        """Returns the listing of `path`, re-listing it only if its mtime changed."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._dirs.get(path)
+            checked = self._checked.get(path, 0.0)
+        if entry is not None and not force and now - checked < self.revalidate_interval:
+            return entry
+
+        mtime = self._stat_mtime(path)
+        if mtime is None:
+            self._drop(path)
+            return None
+
+        changed = False
+        if entry is None or entry.mtime != mtime:
+            try:
+                entry = self._scan(path, mtime)
+            except OSError as e:
+                logger.error(f"Library index: failed to list {path}: {e}")
+                return None
+            with self._lock:
+                self._dirs[path] = entry
+                self._dirty = True
+            changed = True
+        with self._lock:
+            self._checked[path] = now
+        if changed:
+            self._notify(path, entry)
+        self._maybe_save()
+        return entry
+
+    def _drop(self, path: str):
+        with self._lock:
+            removed = self._dirs.pop(path, None) is not None
+            self._checked.pop(path, None)
+            if removed:
+                self._dirty = True
+        if removed:
+            self._notify(path, None)
+
+    def invalidate(self, path: str):
+        """Re-lists `path` if its mtime changed and indexes any new ROM folders below it."""
+        entry = self._get(path, force=True)
+        if entry is None:
+            return
+        for d in entry.subdirs:
+            child = os.path.join(path, d)
+            if child not in self._dirs and self.is_rom_path(child):
+                self.invalidate(child)
+
+    def _scan_status_update(self, **changes):
+        with self._lock:
+            self._scan_status.update(changes)
+
+    def scan_status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self._scan_status)
+        if status.get("state") == "scanning":
+            status["elapsed"] = round(time.time() - status["started_at"], 3)
+        return status
+
+    def _refresh_dir(self, path: str) -> Optional[DirEntry]:
+        with self._lock:
+            before = self._dirs.get(path)
+            self._scan_status["current"] = path
+        entry = self._get(path, force=True)
+        with self._lock:
+            self._scan_status["done"] += 1
+            if entry is not None and entry is not before:
+                self._scan_status["listed"] += 1
+        return entry
+
+    def _refresh_emulator(self, path: str) -> List[str]:
+        """Emulators/<system> and its roms folder, scanned back to back by one worker."""
+        entry = self._refresh_dir(path)
+        if entry is None:
+            return []
+        if "roms" not in entry.subdirs:
+            return [path]
+        with self._lock:
+            self._scan_status["total"] += 1
+        roms = os.path.join(path, "roms")
+        if self._refresh_dir(roms) is not None:
+            return [path, roms]
+        return [path]
+
+    def start_refresh(self) -> bool:
+        """Runs refresh() in a background thread unless a scan is already running."""
+        if self._refresh_lock.locked():
+            return False
+        threading.Thread(target=self.refresh, name="library-scan", daemon=True).start()
+        return True
+
+    def refresh(self):
+        """Walks BASE_PATH and every ROM folder below it, re-listing changed directories only.
+
+        System folders are listed concurrently by `scan_workers` threads, so a cold
+        scan of a slow disk or SMB share is bound by I/O parallelism. Progress is
+        exposed through scan_status().
+        """
+        with self._refresh_lock:
+            started = time.time()
+            self._scan_status_update(state="scanning", started_at=started, finished_at=None,
+                                     total=1, done=0, listed=0, current=self.base_path, error=None)
+            try:
+                seen = set()
+                root = self._refresh_dir(self.base_path)
+                if root is not None:
+                    seen.add(self.base_path)
+                    with ThreadPoolExecutor(max_workers=self.scan_workers, thread_name_prefix="library-scan") as pool:
+                        paths = [os.path.join(self.base_path, d) for d in root.subdirs]
+                        with self._lock:
+                            self._scan_status["total"] += len(paths)
+                        for path, entry in zip(paths, pool.map(self._refresh_dir, paths)):
+                            if entry is not None:
+                                seen.add(path)
+
+                        emulators = self._dirs.get(os.path.join(self.base_path, "Emulators"))
+                        if emulators is not None:
+                            paths = [os.path.join(self.base_path, "Emulators", d) for d in emulators.subdirs]
+                            with self._lock:
+                                self._scan_status["total"] += len(paths)
+                            for found in pool.map(self._refresh_emulator, paths):
+                                seen.update(found)
+
+                for path in self.paths():
+                    if path not in seen:
+                        self._drop(path)
+                self.save()
+            except Exception as e:
+                self._scan_status_update(state="error", error=str(e), finished_at=time.time(), current=None)
+                raise
+            finished = time.time()
+            with self._lock:
+                self._scan_status.update(state="done", finished_at=finished, current=None,
+                                         total=self._scan_status["done"])
+            logger.info(f"Library index: refreshed {len(seen)} directories in {finished - started:.2f}s "
+                        f"({self._scan_status['listed']} re-listed, {self.scan_workers} workers)")
+
+    # --- Queries ---
+
+    def revalidate(self, system: Optional[str] = None) -> int:
+        """Revalidates the directories a listing depends on (one system, or the system
+        list when None) and returns the resulting index version."""
+        if system is None:
+            self.systems()
+        else:
+            for rom_dir in self.system_dirs(system):
+                if self._get(rom_dir) is not None:
+                    break
+        return self.version
+
+    def systems(self) -> List[str]:
+        root = self._get(self.base_path)
+        if root is None:
+            return []
+        systems = []
+        for d in root.subdirs:
+            if d.startswith('.'):
+                continue
+            entry = self._get(os.path.join(self.base_path, d))
+            if entry is not None and entry.files:
+                systems.append(d)
+        return sorted(systems)
+
+    def games(self, system: str) -> List[Dict[str, str]]:
+        for rom_dir in self.system_dirs(system):
+            entry = self._get(rom_dir)
+            if entry is not None:
+                return entry.games
+        return []
+
+    def resolve(self, system: str, game_name: str) -> Optional[str]:
+        """Returns the full path of a ROM of `system`, or None if it is not in the library."""
+        for rom_dir in self.system_dirs(system):
+            entry = self._get(rom_dir)
+            if entry is None:
+                continue
+            name = entry.lookup(game_name)
+            if name is not None:
+                return os.path.join(rom_dir, name)
+        return None
+
+    def query_games(self, system: str, offset: int = 0, limit: Optional[int] = None,
+                    cursor: Optional[str] = None, sort: str = "name",
+                    exts: Optional[Set[str]] = None, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Returns one page of a system's games.
+
+        Filters and sort orders are evaluated against orderings precomputed per
+        listing. `cursor` is the opaque `next_cursor` of a previous page and takes
+        precedence over `offset`. Raises ValueError for an unknown sort or bad cursor.
+        """
+        reverse = sort.startswith("-")
+        key = sort[1:] if reverse else sort
+        if key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort '{sort}' (expected one of: {', '.join(SORT_KEYS)}, optionally prefixed with '-')")
+        keyfunc = SORT_KEYS[key]
+
+        entry = None
+        for rom_dir in self.system_dirs(system):
+            entry = self._get(rom_dir)
+            if entry is not None:
+                break
+        if entry is None:
+            return {"games": [], "total": 0, "offset": 0, "limit": limit, "next_cursor": None}
+
+        if prefix:
+            items = entry.games_with_prefix(prefix)
+            if exts:
+                items = [g for g in items if _ext_of(g["name"]) in exts]
+        elif exts:
+            items = entry.games_with_exts(exts)
+        else:
+            items = entry.games
+        # Filtered subsets come back in name order; other orders are precomputed for the full listing
+        if key != "name":
+            items = entry.sorted_games(key) if not (prefix or exts) else sorted(items, key=keyfunc)
+        total = len(items)
+
+        # Work on the ascending list, reading it backwards for descending sorts
+        if cursor is not None:
+            try:
+                after = keyfunc({"name": decode_cursor(cursor)})
+            except Exception:
+                raise ValueError("Invalid cursor")
+            if reverse:
+                remaining = bisect.bisect_left(items, after, key=keyfunc)
+                start = total - remaining
+            else:
+                start = bisect.bisect_right(items, after, key=keyfunc)
+        else:
+            start = max(0, offset)
+
+        end = total if limit is None else min(total, start + max(0, limit))
+        if reverse:
+            page = items[total - end:total - start][::-1]
+        else:
+            page = items[start:end]
+        next_cursor = encode_cursor(page[-1]["name"]) if limit is not None and page and end < total else None
+        return {"games": page, "total": total, "offset": start, "limit": limit, "next_cursor": next_cursor}
+
+
+class LibrarySearch:
+    """Search index over ROM names of every system, kept in sync with a LibraryIndex.
+
+    Each ROM directory is its own index group, rebuilt from the change events of
+    the library, so searching never touches the filesystem.
+    """
+
+    def __init__(self, library: LibraryIndex):
+        self.library = library
+        self.index = GroupedSearchIndex()
+        library.add_listener(self._on_library_change)
+
+    def _index_dir(self, path: str, entry: Optional[DirEntry]):
+        system = self.library.system_of(path)
+        if system is None:
+            return
+        if entry is None:
+            self.index.remove_group(path)
+        else:
+            self.index.replace_group(path, ((g["name"], (system, g["name"])) for g in entry.games))
+
+    def _on_library_change(self, path: str, entry: Optional[DirEntry]):
+        self._index_dir(path, entry)
+
+    def rebuild(self):
+        started = time.monotonic()
+        paths = set(self.library.paths())
+        for path in paths:
+            self._index_dir(path, self.library.cached(path))
+        for group in self.index.groups():
+            if group not in paths:
+                self.index.remove_group(group)
+        logger.info(f"Library search: indexed {len(self.index)} games in {time.monotonic() - started:.2f}s")
+
+    def search(self, q: str, limit: int = 20, system: Optional[str] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        groups = set(self.library.system_dirs(system)) if system else None
+        hits, total = self.index.search(q, limit=limit, groups=groups)
+        return {
+            "results": [{"system": sys_name, "name": name, "score": score} for score, _, (sys_name, name) in hits],
+            "total": total,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
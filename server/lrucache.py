@@ -0,0 +1,51 @@
+"""Size-bounded LRU of byte strings, shared by the response and zip chunk caches."""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ByteLRU:
+    """LRU of byte strings bounded by their total size.
+
+    A value larger than the whole budget is not stored."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= len(old)
+            self._entries[key] = value
+            self._total += len(value)
+            while self._total > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
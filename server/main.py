@@ -1,15 +1,16 @@
 import os
 import sys
 import json
+import uuid
 import asyncio
+import hashlib
 import subprocess
 import threading
 import logging
 from typing import List, Dict, Optional, Set, Any
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
 import xmltodict
 
@@ -34,11 +35,19 @@ except ImportError as e:
         GAMES_FOLDER = "/config/games"
         SAVE_FOLDER = "/config"
         OTA_data_ZIP = ""
-        download_queue = []
         download_progress = {}
         history = []
     rgsx_config = MockConfig()
 
+from library import LibraryIndex, LibrarySearch
+from watcher import LibraryWatcher
+from hashing import HashStore
+from duplicates import DuplicateFinder
+import store
+import fastjson
+from compression import CompressionMiddleware, PrecompressedStaticFiles, precompress_directory
+from romstream import RomStreamer
+
 app = FastAPI(title="Cyberpunk Retro API")
 
 # --- Configuration & Paths ---
@@ -50,21 +59,70 @@ PORT = int(os.getenv("PORT", 8000))
 
 FAVORITES_FILE = os.path.join(CONFIG_PATH, "favorites.json")
 RECENTS_FILE = os.path.join(CONFIG_PATH, "recents.json")
+LIBRARY_INDEX_FILE = os.path.join(CONFIG_PATH, "library_index.json")
+LIBRARY_REVALIDATE_SECONDS = float(os.getenv("LIBRARY_REVALIDATE_SECONDS", 10))
+LIBRARY_SCAN_WORKERS = int(os.getenv("LIBRARY_SCAN_WORKERS", 8))
+LIBRARY_WATCH = os.getenv("LIBRARY_WATCH", "auto")  # auto | inotify | poll | off
+LIBRARY_POLL_SECONDS = float(os.getenv("LIBRARY_POLL_SECONDS", 30))
+LIBRARY_HASHING = os.getenv("LIBRARY_HASHING", "1").lower() in ("1", "true", "yes", "on")
+LIBRARY_HASHES_FILE = os.path.join(CONFIG_PATH, "library_hashes.json")
+HASH_BUFFER_KB = int(os.getenv("HASH_BUFFER_KB", 1024))
+DUPLICATE_SAMPLE_KB = int(os.getenv("DUPLICATE_SAMPLE_KB", 64))
+FAST_JSON = os.getenv("FAST_JSON", "0").lower() in ("1", "true", "yes", "on")
+FAST_JSON_CACHE_MB = int(os.getenv("FAST_JSON_CACHE_MB", 32))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+ROM_MAX_STREAMS = int(os.getenv("ROM_MAX_STREAMS", 8))
+ROM_STREAM_CHUNK_KB = int(os.getenv("ROM_STREAM_CHUNK_KB", 1024))
+ROM_READ_AHEAD_MB = int(os.getenv("ROM_READ_AHEAD_MB", 8))
+ROM_STREAM_QUEUE_SECONDS = float(os.getenv("ROM_STREAM_QUEUE_SECONDS", 10))
+# Hands ROM files to servers advertising the ASGI zerocopysend/pathsend extensions (not uvicorn)
+ROM_ZERO_COPY = os.getenv("ROM_ZERO_COPY", "1").lower() in ("1", "true", "yes", "on")
+ROM_ZIP_CHUNK_KB = int(os.getenv("ROM_ZIP_CHUNK_KB", 256))
+ROM_ZIP_CACHE_MB = int(os.getenv("ROM_ZIP_CACHE_MB", 32))
 
 # Ensure config directories exist
 os.makedirs(CONFIG_PATH, exist_ok=True)
 os.makedirs(BASE_PATH, exist_ok=True)
 
+library = LibraryIndex(BASE_PATH, LIBRARY_INDEX_FILE, revalidate_interval=LIBRARY_REVALIDATE_SECONDS,
+                       scan_workers=LIBRARY_SCAN_WORKERS)
+library_search = LibrarySearch(library)
+library_watcher = LibraryWatcher(library, mode=LIBRARY_WATCH, poll_interval=LIBRARY_POLL_SECONDS) if LIBRARY_WATCH != "off" else None
+rom_hashes = HashStore(library, LIBRARY_HASHES_FILE, buffer_size=HASH_BUFFER_KB * 1024) if LIBRARY_HASHING else None
+duplicate_finder = DuplicateFinder(library, rom_hashes, sample_size=DUPLICATE_SAMPLE_KB * 1024,
+                                   buffer_size=HASH_BUFFER_KB * 1024)
+response_cache = fastjson.EncodedCache(FAST_JSON_CACHE_MB * 1024 * 1024)
+rom_streamer = RomStreamer(max_streams=ROM_MAX_STREAMS, chunk_size=ROM_STREAM_CHUNK_KB * 1024,
+                           read_ahead=ROM_READ_AHEAD_MB * 1024 * 1024, queue_timeout=ROM_STREAM_QUEUE_SECONDS,
+                           zero_copy=ROM_ZERO_COPY, zip_chunk_size=ROM_ZIP_CHUNK_KB * 1024,
+                           zip_cache_bytes=ROM_ZIP_CACHE_MB * 1024 * 1024)
+
 # --- Models ---
 class DownloadRequest(BaseModel):
     url: str
     game_name: str
     platform: str
+    # Higher starts first; equal priorities are shared fairly between platforms
+    priority: int = 0
+
+store_search = store.StoreSearch(getattr(rgsx_config, 'GAMES_FOLDER', '/config/games'))
 
 # --- RGSX Startup Logic ---
 @app.on_event("startup")
 async def startup_event():
     """Initializes RGSX data (downloads games.zip if needed) on server startup."""
+    logger.info("Server Startup: Loading library index...")
+    library.load()
+    if rom_hashes is not None:
+        rom_hashes.load()
+        rom_hashes.start()
+    threading.Thread(target=init_library, daemon=True).start()
+
+    # Normally done at image build time; refreshes variants of edited client files
+    written = await asyncio.to_thread(precompress_directory, CLIENT_DIR)
+    if written:
+        logger.info(f"Precompressed {written} client files")
+
     logger.info("Server Startup: Initializing RGSX...")
 
     # 1. Check if we need to download game lists
@@ -75,12 +133,37 @@ async def startup_event():
             asyncio.create_task(update_rgsx_data())
         else:
             logger.info("RGSX: Game lists found.")
+            store_search.start_refresh()
     except Exception as e:
         logger.error(f"Error checking game lists: {e}")
 
-    # Start the download queue worker
-    if hasattr(rgsx_network, 'download_queue_worker'):
-        threading.Thread(target=rgsx_network.download_queue_worker, daemon=True).start()
+    # Requeue the jobs left by the previous run, then start the download scheduler
+    if hasattr(rgsx_network, 'download_scheduler'):
+        await asyncio.to_thread(rgsx_network.restore_download_queue)
+        rgsx_network.download_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if hasattr(rgsx_network, 'download_scheduler'):
+        rgsx_network.download_scheduler.stop()
+    if library_watcher is not None:
+        library_watcher.stop()
+    if rom_hashes is not None:
+        rom_hashes.stop()
+    library.save()
+
+def init_library():
+    """Brings the persisted index up to date, then hands over to the watcher."""
+    try:
+        library.refresh()
+    except Exception as e:
+        logger.error(f"Library refresh failed: {e}")
+    # Directories unchanged since the persisted index emit no change events
+    library_search.rebuild()
+    if rom_hashes is not None:
+        rom_hashes.enqueue_library()
+    if library_watcher is not None:
+        library_watcher.start()
 
 async def update_rgsx_data():
     """Downloads and extracts the RGSX game database."""
@@ -106,6 +189,7 @@ async def update_rgsx_data():
         success, msg = extract_data(zip_path, rgsx_config.SAVE_FOLDER, zip_url)
         if success:
             logger.info(f"RGSX Data Updated: {msg}")
+            await asyncio.to_thread(store_search.refresh)
             if os.path.exists(zip_path):
                 os.remove(zip_path)
         else:
@@ -115,6 +199,105 @@ async def update_rgsx_data():
         logger.error(f"Failed to update RGSX data: {e}")
 
 # --- Helper Functions ---
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 256
+
+# Distinguishes ETags built from in-memory counters across server restarts
+ETAG_EPOCH = uuid.uuid4().hex[:8]
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the versions a response was built from."""
+    digest = hashlib.sha1(repr((ETAG_EPOCH,) + parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+def file_version(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match uses the weak comparison
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def conditional(request: Request, etag, build):
+    """Answers 304 when the client already holds the current `etag` (a string, or a
+    callable re-evaluated after build() for responses that update their own sources);
+    otherwise returns build() with the ETag attached."""
+    current = etag() if callable(etag) else etag
+    headers = {"ETag": current, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), current):
+        return Response(status_code=304, headers=headers)
+    result = build()
+    if not isinstance(result, Response):
+        result = JSONResponse(result)
+    if callable(etag):
+        headers["ETag"] = etag()
+    result.headers.update(headers)
+    return result
+
+def fast_json(build, key=None):
+    """Returns build() for FastAPI to encode, or with FAST_JSON a response encoded by
+    fastjson. When `key` is given (it must include the version of the data), the
+    encoded body is reused until the key changes."""
+    if not FAST_JSON:
+        return build()
+    if key is None:
+        return fastjson.FastJSONResponse(build())
+    return fastjson.FastJSONResponse(response_cache.encode(key, build))
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def stream_page(page: Dict[str, Any], ndjson: bool = False) -> StreamingResponse:
+    """Streams a paged listing whose "games" may be a lazy iterator.
+
+    JSON mode sends the usual object with the games array written in batches;
+    NDJSON mode sends the other fields on the first line, then one game per line.
+    """
+    games = page.pop("games")
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    def batches():
+        batch = []
+        for game in games:
+            batch.append(dumps(game))
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def ndjson_chunks():
+        yield dumps(page) + "\n"
+        for batch in batches():
+            yield "\n".join(batch) + "\n"
+
+    def json_chunks():
+        yield dumps(page)[:-1] + (',"games":[' if page else '"games":[')
+        first = True
+        for batch in batches():
+            yield ("" if first else ",") + ",".join(batch)
+            first = False
+        yield "]}"
+
+    if ndjson:
+        return StreamingResponse(ndjson_chunks(), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(json_chunks(), media_type="application/json")
+
 def load_favorites() -> Set[str]:
     if os.path.exists(FAVORITES_FILE):
         try:
@@ -124,9 +307,13 @@ def load_favorites() -> Set[str]:
             return set()
     return set()
 
+favorites_version = 0
+
 def save_favorites(favorites: Set[str]):
+    global favorites_version
     with open(FAVORITES_FILE, "w") as f:
         json.dump(list(favorites), f)
+    favorites_version += 1
 
 def load_recents() -> List[str]:
     if os.path.exists(RECENTS_FILE):
@@ -148,76 +335,147 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+class SecurityHeadersMiddleware:
+    """Adds the cross-origin isolation headers. A plain ASGI middleware rather than
+    @app.middleware("http"), which re-queues every body chunk and cannot pass
+    zero-copy ROM transfers through."""
+
+    def __init__(self, app):
+        self.app = app
 
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
-    response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
-    response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
-    return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message["headers"]) + [
+                    (b"cross-origin-opener-policy", b"same-origin"),
+                    (b"cross-origin-embedder-policy", b"require-corp"),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+app.add_middleware(SecurityHeadersMiddleware)
 
 # --- API Endpoints: Library ---
 
 @app.get("/api/systems")
-async def get_systems():
+async def get_systems(request: Request):
     try:
-        # Scan /roms directory
-        systems = []
-        if os.path.exists(BASE_PATH):
-            for d in os.listdir(BASE_PATH):
-                full_path = os.path.join(BASE_PATH, d)
-                if os.path.isdir(full_path) and not d.startswith('.'):
-                    if any(os.path.isfile(os.path.join(full_path, f)) for f in os.listdir(full_path)):
-                         systems.append(d)
-        return {"systems": sorted(systems)}
+        version = library.revalidate()
+        return conditional(request, make_etag("systems", version),
+                           lambda: fast_json(lambda: {"systems": library.systems()}, key=("systems", version)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/games/{system}")
-async def get_games(system: str):
-    rom_dir = os.path.join(BASE_PATH, system)
-    if not os.path.exists(rom_dir):
-        rom_dir = os.path.join(BASE_PATH, "Emulators", system, "roms")
-        if not os.path.exists(rom_dir):
-             return {"games": []}
-
-    games = []
+async def get_games(request: Request, system: str, offset: int = 0, limit: Optional[int] = None,
+                    cursor: Optional[str] = None, sort: str = "name", ext: Optional[str] = None,
+                    prefix: Optional[str] = None, stream: bool = False):
+    """Lists a system's games, optionally paged (offset/limit or cursor), sorted and filtered.
+
+    `sort` is name|ext, prefixed with '-' for descending order. `ext` is a
+    comma separated list of extensions and `prefix` a case-insensitive name prefix.
+    With `stream` or `Accept: application/x-ndjson` the listing is streamed.
+    """
+    exts = None
+    if ext:
+        exts = {("." + e.strip().lstrip(".")).lower() for e in ext.split(",") if e.strip()}
     try:
-        valid_exts = ('.zip', '.nes', '.sfc', '.smc', '.gba', '.gb', '.gbc', '.bin', '.gen',
-                      '.n64', '.z64', '.v64', '.md', '.iso', '.pbp', '.cue', '.chd', '.gcz', '.rvz', '.dsk', '.dim')
-        
-        for f in os.listdir(rom_dir):
-            if f.lower().endswith(valid_exts):
-                games.append({
-                    "name": f,
-                    "description": f,
-                    "path": f
-                })
-        return {"games": sorted(games, key=lambda x: x['name'])}
+        def query():
+            return library.query_games(system, offset=offset, limit=limit, cursor=cursor, sort=sort,
+                                       exts=exts, prefix=prefix)
+
+        if stream or wants_ndjson(request):
+            return stream_page(query(), ndjson=wants_ndjson(request))
+        key = None
+        if FAST_JSON:
+            key = ("games", system, library.revalidate(system), offset, limit, cursor, sort,
+                   tuple(sorted(exts)) if exts else None, prefix)
+        return fast_json(query, key=key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing games for {system}: {e}")
         return {"games": []}
 
-@app.get("/api/rom/{system}/{game_name}")
-async def get_rom(system: str, game_name: str):
-    search_dirs = [
-        os.path.join(BASE_PATH, system),
-        os.path.join(BASE_PATH, "Emulators", system, "roms")
-    ]
-    
-    base_name = os.path.splitext(game_name)[0]
-    
-    for d in search_dirs:
-        if not os.path.exists(d): continue
-        for f in os.listdir(d):
-            if f == game_name or os.path.splitext(f)[0] == base_name:
-                return FileResponse(os.path.join(d, f))
+@app.get("/api/library/scan")
+async def get_library_scan_status():
+    """Progress of the current (or last) library scan."""
+    return library.scan_status()
+
+@app.post("/api/library/scan")
+async def start_library_scan():
+    """Starts a background rescan of the library unless one is already running."""
+    started = library.start_refresh()
+    return {"status": "started" if started else "already_running", "scan": library.scan_status()}
+
+@app.get("/api/library/hashes")
+async def library_hashes(system: Optional[str] = None):
+    """Hashing progress, plus the known hashes of `system`'s ROMs when given."""
+    if rom_hashes is None:
+        raise HTTPException(status_code=404, detail="ROM hashing is disabled")
+    result: Dict[str, Any] = {"status": rom_hashes.status()}
+    if system is not None:
+        result["hashes"] = await asyncio.to_thread(rom_hashes.system_hashes, system)
+    return result
+
+@app.get("/api/library/hashes/{system}/{game_name}")
+async def rom_hash(system: str, game_name: str):
+    """CRC32/MD5/SHA1 of a ROM; 202 while it waits to be hashed (it is moved to the front of the queue)."""
+    if rom_hashes is None:
+        raise HTTPException(status_code=404, detail="ROM hashing is disabled")
+    rom_path = library.resolve(system, game_name)
+    if not rom_path or not os.path.isfile(rom_path):
+        raise HTTPException(status_code=404, detail="ROM not found")
+    hashes = await asyncio.to_thread(rom_hashes.get, rom_path)
+    if hashes is None:
+        return JSONResponse({"status": "pending", "queued": rom_hashes.status()["queued"]}, status_code=202)
+    return {"system": system, "name": os.path.basename(rom_path), **hashes}
+
+@app.get("/api/library/duplicates")
+async def library_duplicates():
+    """Progress and result of the last duplicate search."""
+    return {"status": duplicate_finder.status(), "report": duplicate_finder.report()}
+
+@app.post("/api/library/duplicates")
+async def start_duplicate_search():
+    """Starts a background duplicate search (size, then partial hash, then full hash)."""
+    started = duplicate_finder.start()
+    return {"status": "started" if started else "already_running", "search": duplicate_finder.status()}
+
+@app.get("/api/library/search")
+async def search_library(q: str, limit: int = 20, system: Optional[str] = None):
+    """Type-ahead search over ROM names of every system (or one `system`)."""
+    return library_search.search(q, limit=max(1, min(limit, 200)), system=system)
+
+@app.api_route("/api/rom/{system}/{game_name}", methods=["GET", "HEAD"])
+async def get_rom(system: str, game_name: str, unzip: bool = False):
+    """Streams a ROM with Range/If-Range support (see romstream). With `unzip`,
+    a single-file .zip is sent as its decompressed content."""
+    rom_path = library.resolve(system, game_name)
+    if rom_path:
+        try:
+            return await asyncio.to_thread(rom_streamer.response, rom_path, unzip=unzip)
+        except OSError:
+            pass
 
     raise HTTPException(status_code=404, detail="ROM not found")
 
+@app.get("/api/rom-streams")
+async def rom_stream_stats():
+    return rom_streamer.stats()
+
 @app.get("/api/favorites")
-async def get_favorites_list():
-    return {"favorites": list(load_favorites())}
+async def get_favorites_list(request: Request):
+    # Counter for our own writes, file version for edits made outside the server
+    etag = make_etag("favorites", favorites_version, file_version(FAVORITES_FILE))
+    return conditional(request, etag, lambda: {"favorites": sorted(load_favorites())})
 
 @app.post("/api/favorites/toggle/{system}/{game_name}")
 async def toggle_favorite(system: str, game_name: str):
@@ -260,19 +518,7 @@ async def launch_game(system: str, game_name: str):
     # Try local launch logic
     try:
         # Resolve ROM path
-        rom_path = None
-        search_dirs = [
-            os.path.join(BASE_PATH, system),
-            os.path.join(BASE_PATH, "Emulators", system, "roms")
-        ]
-        base_name = os.path.splitext(game_name)[0]
-        for d in search_dirs:
-            if not os.path.exists(d): continue
-            for f in os.listdir(d):
-                if f == game_name or os.path.splitext(f)[0] == base_name:
-                    rom_path = os.path.join(d, f)
-                    break
-            if rom_path: break
+        rom_path = library.resolve(system, game_name)
 
         if not rom_path:
             raise HTTPException(status_code=404, detail="ROM not found")
@@ -302,10 +548,15 @@ import shutil
 
 # --- API Endpoints: Store (RGSX) ---
 
+def store_platforms_etag() -> str:
+    # load_sources() merges systems_list.json with the catalog file names of GAMES_FOLDER
+    return make_etag("platforms", file_version(getattr(rgsx_config, 'SOURCES_FILE', '/config/systems_list.json')),
+                     file_version(getattr(rgsx_config, 'GAMES_FOLDER', '/config/games')))
+
 @app.get("/api/store/platforms")
-async def get_store_platforms():
+async def get_store_platforms(request: Request):
     """Returns the list of systems available in RGSX."""
-    try:
+    def build():
         sources = load_sources()
         platforms = []
         for s in sources:
@@ -314,50 +565,80 @@ async def get_store_platforms():
                 "name": s.get("platform_name"),
                 "folder": s.get("folder") or s.get("dossier")
             })
-        return {"platforms": platforms}
+        return fast_json(lambda: {"platforms": platforms})
+
+    try:
+        return conditional(request, store_platforms_etag, build)
     except Exception as e:
         logger.error(f"Error loading store platforms: {e}")
         return {"platforms": [], "error": str(e)}
 
 @app.get("/api/store/games/{platform_name}")
-async def get_store_games(platform_name: str):
-    """Returns the game list for a specific RGSX platform."""
+async def get_store_games(request: Request, platform_name: str, offset: int = 0, limit: Optional[int] = None,
+                          q: Optional[str] = None, region: Optional[str] = None,
+                          min_size: Optional[str] = None, max_size: Optional[str] = None,
+                          sort: Optional[str] = None, stream: bool = False):
+    """Returns the game list for a specific RGSX platform.
+
+    Optional paging (offset/limit), name substring search (q), region filter,
+    size range (bytes or "700 MB" style) and sort (name|size, '-' for descending).
+    With `stream` or `Accept: application/x-ndjson` the list is streamed as it is read.
+    """
+    size_bounds = []
+    for label, raw in (("min_size", min_size), ("max_size", max_size)):
+        value = store.parse_size(raw) if raw else None
+        if raw and value is None:
+            raise HTTPException(status_code=400, detail=f"Invalid {label}: {raw}")
+        size_bounds.append(value)
     try:
         json_path = os.path.join(rgsx_config.GAMES_FOLDER, f"{platform_name}.json")
         if not os.path.exists(json_path):
             return {"games": [], "error": "Game list not found"}
-            
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            games = []
-            raw_list = data.get("game_list", []) if isinstance(data, dict) else data
-
-            for g in raw_list:
-                games.append({
-                    "name": g.get("name"),
-                    "url": g.get("url"),
-                    "size": g.get("size", "Unknown"),
-                    "region": g.get("region", "")
-                })
-            return {"games": games}
+
+        catalog = store.get_catalog(json_path)
+        streamed = stream or wants_ndjson(request)
+
+        def query():
+            return catalog.query(offset=offset, limit=limit, q=q, region=region,
+                                 min_size=size_bounds[0], max_size=size_bounds[1], sort=sort, lazy=streamed)
+
+        if streamed:
+            return stream_page(query(), ndjson=wants_ndjson(request))
+        key = ("store_games", json_path, catalog.version, offset, limit, q, region, *size_bounds, sort)
+        return fast_json(query, key=key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error loading store games for {platform_name}: {e}")
         return {"games": [], "error": str(e)}
 
+@app.get("/api/store/search")
+async def search_store(q: str, limit: int = 20, platform: Optional[str] = None):
+    """Ranked search across all RGSX platform catalogs."""
+    if not store_search.ready:
+        # First query waits for the initial build (or joins the one in progress)
+        await asyncio.to_thread(store_search.refresh)
+    elif store_search.is_stale() and not store_search.indexing:
+        store_search.start_refresh()
+    return fast_json(lambda: store_search.search(q, limit=max(1, min(limit, 200)), platform=platform))
+
 @app.post("/api/store/download")
 async def download_game(request: DownloadRequest, background_tasks: BackgroundTasks):
-    """Initiates a download task."""
+    """Queues a download; it starts as soon as the scheduler has a free slot.
+    Queued jobs are journaled under SAVE_FOLDER and survive a restart."""
     try:
         import time
-        task_id = str(int(time.time() * 1000))
+        task_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}"
         job = {
             "url": request.url,
             "game_name": request.game_name,
             "platform": request.platform,
             "task_id": task_id,
-            "is_zip_non_supported": False
+            "is_zip_non_supported": False,
+            "priority": request.priority,
         }
-        rgsx_config.download_queue.append(job)
+        # The submission is journaled with an fsync: keep it off the event loop
+        await asyncio.to_thread(rgsx_network.download_scheduler.submit, job)
         return {"status": "queued", "task_id": task_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -365,23 +646,27 @@ async def download_game(request: DownloadRequest, background_tasks: BackgroundTa
 @app.get("/api/store/tasks")
 async def get_tasks():
     try:
+        scheduler = rgsx_network.download_scheduler
         tasks = []
-        for url, data in rgsx_config.download_progress.items():
+        for job in scheduler.running():
+            data = rgsx_config.download_progress.get(job["url"], {})
             tasks.append({
-                "task_id": "active",
-                "game_name": data.get("game_name", "Unknown"),
-                "platform": data.get("platform", ""),
+                "task_id": job.get("task_id"),
+                "game_name": data.get("game_name", job.get("game_name", "Unknown")),
+                "platform": data.get("platform", job.get("platform", "")),
                 "status": data.get("status", "Downloading"),
                 "progress": data.get("progress_percent", 0),
                 "speed": data.get("speed", 0),
             })
-        for i, job in enumerate(rgsx_config.download_queue):
+        for job in scheduler.pending():
             tasks.append({
                 "task_id": job.get("task_id"),
                 "game_name": job.get("game_name"),
+                "platform": job.get("platform", ""),
+                "priority": job.get("priority", 0),
                 "status": "Queued"
             })
-        return {"tasks": tasks}
+        return {"tasks": tasks, "queue": scheduler.stats()}
     except Exception as e:
         return {"tasks": [], "error": str(e)}
 
@@ -389,14 +674,13 @@ async def get_tasks():
 async def cancel_task(task_id: str):
     try:
         from rgsx.network import request_cancel
-        success = request_cancel(task_id)
-        rgsx_config.download_queue = [j for j in rgsx_config.download_queue if j.get("task_id") != task_id]
+        success = await asyncio.to_thread(rgsx_network.download_scheduler.cancel, task_id) or request_cancel(task_id)
         return {"status": "cancelled", "success": success}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Serve client files (SPA catch-all could be better but static mount is fine for this structure)
-app.mount("/", StaticFiles(directory=CLIENT_DIR, html=True), name="static")
+app.mount("/", PrecompressedStaticFiles(directory=CLIENT_DIR, html=True), name="static")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,571 @@
+import os
+import re
+import sys
+import json
+import mmap
+import bisect
+import struct
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Entrée normalisée d'un catalogue: (name, url, size, region)
+GameRecord = Tuple[str, Optional[str], Optional[str], str]
+
+META_FORMAT_VERSION = 1
+META_SUFFIX = ".meta.json"
+
+# Format binaire: en-tête, pools JSON, colonnes à largeur fixe puis tas de chaînes (noms, fins d'URL)
+BINARY_MAGIC = b"RGSXCAT\0"
+BINARY_FORMAT_VERSION = 1
+BINARY_SUFFIX = ".catalog.bin"
+BINARY_HEADER = struct.Struct("<8sHHIdQQ")  # magic, version, boutisme, nombre de jeux, mtime/taille source, taille pools
+
+SIZE_UNITS = {
+    "": 1, "b": 1, "o": 1,
+    "k": 1024, "kb": 1024, "ko": 1024, "kib": 1024,
+    "m": 1024 ** 2, "mb": 1024 ** 2, "mo": 1024 ** 2, "mib": 1024 ** 2,
+    "g": 1024 ** 3, "gb": 1024 ** 3, "go": 1024 ** 3, "gib": 1024 ** 3,
+    "t": 1024 ** 4, "tb": 1024 ** 4, "to": 1024 ** 4, "tib": 1024 ** 4,
+}
+SIZE_RE = re.compile(r"^\s*([0-9]+(?:[.,][0-9]+)?)\s*([a-zA-Z]*)\s*$")
+FIRST_TAG_RE = re.compile(r"\(([^)]*)\)")
+
+
+def parse_size(value: Any) -> Optional[int]:
+    """Convertit les tailles des catalogues ("1.2 GB", "700 Mo", 1048576) en octets."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    m = SIZE_RE.match(value)
+    if not m:
+        return None
+    unit = SIZE_UNITS.get(m.group(2).lower())
+    if unit is None:
+        return None
+    return int(float(m.group(1).replace(",", ".")) * unit)
+
+
+class CompactCatalog(Sequence):
+    """Catalogue stocké en colonnes plutôt qu'en tuples de chaînes Python.
+
+    - noms et fins d'URL: un blob UTF-8 chacun + tableau d'offsets (array 'I');
+    - préfixes d'URL (tout jusqu'au dernier '/'), libellés de taille et régions:
+      pools de chaînes internées, référencées par identifiant;
+    - taille en octets pré-calculée (array 'q', -1 si inconnue).
+
+    Coût typique: ~100 octets par jeu contre ~400 pour un tuple (name, url, size, region).
+    Les éléments sont reconstruits à la demande; `catalog[i]` retourne le tuple habituel.
+    Les colonnes peuvent aussi être des vues sur un fichier binaire projeté (open_binary).
+    """
+
+    NO_ID = 0xFFFFFFFF
+
+    __slots__ = ("names", "name_offsets", "url_prefixes", "url_prefix_ids", "url_suffixes", "url_offsets",
+                 "size_labels", "size_ids", "sizes", "region_labels", "region_ids", "_prefix_index", "_suffix_source")
+
+    def __init__(self, names, name_offsets, url_prefixes, url_prefix_ids, url_suffixes, url_offsets,
+                 size_labels, size_ids, sizes, region_labels, region_ids, suffix_source=None):
+        self.names = memoryview(names)
+        self.name_offsets = name_offsets
+        self.url_prefixes = url_prefixes
+        self.url_prefix_ids = url_prefix_ids
+        self.url_suffixes = memoryview(url_suffixes)
+        self.url_offsets = url_offsets
+        self.size_labels = size_labels
+        self.size_ids = size_ids
+        self.sizes = sizes
+        self.region_labels = region_labels
+        self.region_ids = region_ids
+        self._prefix_index: Optional[Dict[str, int]] = None
+        # (objet supportant find(), position des fins d'URL dans cet objet)
+        self._suffix_source = suffix_source or (url_suffixes, 0)
+
+    @classmethod
+    def from_records(cls, records: Iterable[GameRecord]) -> "CompactCatalog":
+        names, name_offsets = bytearray(), array("I", [0])
+        suffixes, url_offsets = bytearray(), array("I", [0])
+        url_prefix_ids, size_ids, sizes, region_ids = array("I"), array("I"), array("q"), array("I")
+        prefix_pool: Dict[str, int] = {}
+        size_pool: Dict[str, int] = {}
+        region_pool: Dict[str, int] = {"": 0}
+        for name, url, size, region in records:
+            names += name.encode("utf-8")
+            name_offsets.append(len(names))
+            if url is None:
+                url_prefix_ids.append(cls.NO_ID)
+            else:
+                cut = url.rfind("/") + 1
+                url_prefix_ids.append(prefix_pool.setdefault(url[:cut], len(prefix_pool)))
+                suffixes += url[cut:].encode("utf-8")
+            url_offsets.append(len(suffixes))
+            if size is None:
+                size_ids.append(cls.NO_ID)
+                sizes.append(-1)
+            else:
+                size_ids.append(size_pool.setdefault(size, len(size_pool)))
+                parsed = parse_size(size)
+                sizes.append(-1 if parsed is None else parsed)
+            region_ids.append(region_pool.setdefault(region, len(region_pool)))
+        return cls(bytes(names), name_offsets, list(prefix_pool), url_prefix_ids, bytes(suffixes), url_offsets,
+                   list(size_pool), size_ids, sizes, list(region_pool), region_ids)
+
+    def __len__(self):
+        return len(self.name_offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("index hors du catalogue")
+        return (self.name(i), self.url(i), self.size_label(i), self.region_labels[self.region_ids[i]])
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def name(self, i: int) -> str:
+        return str(self.names[self.name_offsets[i]:self.name_offsets[i + 1]], "utf-8")
+
+    def iter_names(self) -> Iterator[str]:
+        offsets, names = self.name_offsets, self.names
+        for i in range(len(self)):
+            yield str(names[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def url(self, i: int) -> Optional[str]:
+        prefix_id = self.url_prefix_ids[i]
+        if prefix_id == self.NO_ID:
+            return None
+        return self.url_prefixes[prefix_id] + str(self.url_suffixes[self.url_offsets[i]:self.url_offsets[i + 1]], "utf-8")
+
+    def size_label(self, i: int) -> Optional[str]:
+        size_id = self.size_ids[i]
+        return None if size_id == self.NO_ID else self.size_labels[size_id]
+
+    def region(self, i: int) -> str:
+        return self.region_labels[self.region_ids[i]]
+
+    def find_url(self, url: str) -> Optional[int]:
+        """Index du jeu ayant cette URL (recherche dans le blob, sans construire d'index), ou None."""
+        if self._prefix_index is None:
+            self._prefix_index = {p: n for n, p in enumerate(self.url_prefixes)}
+        cut = url.rfind("/") + 1
+        prefix_id = self._prefix_index.get(url[:cut])
+        if prefix_id is None:
+            return None
+        needle = url[cut:].encode("utf-8")
+        offsets = self.url_offsets
+        # bytes.find/mmap.find sur la zone des fins d'URL, sans copie
+        blob, base = self._suffix_source
+        end = base + self.url_suffixes.nbytes
+        start = 0
+        while True:
+            pos = blob.find(needle, base + start, end)
+            if pos < 0:
+                return None
+            pos -= base
+            i = bisect.bisect_right(offsets, pos) - 1
+            # Si plusieurs fins d'URL sont vides, offsets contient des doublons: prendre la première
+            while i > 0 and offsets[i - 1] == pos:
+                i -= 1
+            while i < len(self) and offsets[i] == pos:
+                if offsets[i + 1] == pos + len(needle) and self.url_prefix_ids[i] == prefix_id:
+                    return i
+                i += 1
+            start = pos + 1
+
+    def _columns(self):
+        return (self.name_offsets, self.url_prefix_ids, self.url_offsets, self.size_ids, self.region_ids, self.sizes)
+
+    def write_binary(self, f, source_mtime: float, source_size: int):
+        """Écrit le catalogue au format binaire (voir open_binary)."""
+        pools = json.dumps([self.url_prefixes, self.size_labels, self.region_labels], ensure_ascii=False).encode("utf-8")
+        order = 0 if sys.byteorder == "little" else 1
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_FORMAT_VERSION, order, len(self), source_mtime, source_size, len(pools)))
+        f.write(pools)
+        written = BINARY_HEADER.size + len(pools)
+        for column in self._columns():
+            # Colonnes alignées sur 8 octets pour pouvoir les projeter directement
+            pad = -written % 8
+            f.write(b"\0" * pad)
+            data = column.tobytes() if isinstance(column, array) else bytes(column)
+            f.write(data)
+            written += pad + len(data)
+        f.write(self.names)
+        f.write(self.url_suffixes)
+
+    @classmethod
+    def open_binary(cls, path: str, source_mtime: float, source_size: int) -> Optional["CompactCatalog"]:
+        """Projette un catalogue binaire en mémoire (mmap) sans le copier; None s'il est absent,
+        invalide ou ne correspond plus au JSON source (mtime/taille)."""
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        views: List[memoryview] = []
+        try:
+            magic, version, order, count, mtime, size, pools_len = BINARY_HEADER.unpack_from(mm, 0)
+            if (magic != BINARY_MAGIC or version != BINARY_FORMAT_VERSION
+                    or order != (0 if sys.byteorder == "little" else 1)
+                    or mtime != source_mtime or size != source_size):
+                mm.close()
+                return None
+            view = memoryview(mm)
+            views.append(view)
+            pos = BINARY_HEADER.size
+            prefixes, size_labels, region_labels = json.loads(str(view[pos:pos + pools_len], "utf-8"))
+            pos += pools_len
+            columns = []
+            for fmt, length in (("I", count + 1), ("I", count), ("I", count + 1), ("I", count), ("I", count), ("q", count)):
+                pos += -pos % 8
+                end = pos + length * struct.calcsize(fmt)
+                columns.append(view[pos:end].cast(fmt))
+                views.append(columns[-1])
+                pos = end
+            name_offsets, url_prefix_ids, url_offsets, size_ids, region_ids, sizes = columns
+            names = view[pos:pos + name_offsets[count]]
+            views.append(names)
+            pos += name_offsets[count]
+            suffix_pos = pos
+            url_suffixes = view[pos:pos + url_offsets[count]]
+            views.append(url_suffixes)
+            if pos + url_offsets[count] != len(mm):
+                raise ValueError("taille de fichier incohérente")
+        except Exception as e:
+            # Libérer les vues puis la projection tout de suite, sans attendre le GC
+            for v in reversed(views):
+                v.release()
+            mm.close()
+            if isinstance(e, (struct.error, ValueError, TypeError, IndexError)):
+                logger.warning(f"Catalogue binaire invalide {os.path.basename(path)}: {e}")
+                return None
+            raise
+        return cls(names, name_offsets, prefixes, url_prefix_ids, url_suffixes, url_offsets,
+                   size_labels, size_ids, sizes, region_labels, region_ids, suffix_source=(mm, suffix_pos))
+
+    @property
+    def nbytes(self) -> int:
+        """Empreinte mémoire approximative (blobs, tableaux et pools)."""
+        pools = (self.url_prefixes, self.size_labels, self.region_labels)
+        return (self.names.nbytes + self.url_suffixes.nbytes
+                + sum(a.itemsize * len(a) for a in self._columns())
+                + sum(sys.getsizeof(v) for pool in pools for v in pool))
+
+
+class GameTuples(Sequence):
+    """Vue (name, url, size) d'un CompactCatalog, au format historique de load_games."""
+
+    __slots__ = ("games",)
+
+    def __init__(self, games: CompactCatalog):
+        self.games = games
+
+    def __len__(self):
+        return len(self.games)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self.games):
+            raise IndexError("index hors du catalogue")
+        return (self.games.name(i), self.games.url(i), self.games.size_label(i))
+
+
+class Catalog:
+    """Liste de jeux d'une plateforme, parsée et normalisée une seule fois.
+    `derived` permet aux appelants de mémoriser des structures calculées (tris, index)
+    qui disparaissent avec le catalogue lorsqu'il est évincé ou rechargé."""
+
+    __slots__ = ("path", "mtime", "size", "games", "derived")
+
+    def __init__(self, path: str, mtime: float, size: int, games: CompactCatalog):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.games = games
+        self.derived: Dict[str, Any] = {}
+
+    def __len__(self):
+        return len(self.games)
+
+    @property
+    def nbytes(self) -> int:
+        return self.games.nbytes
+
+
+def normalize_games(data: Any) -> List[GameRecord]:
+    """Normalise les différents formats de listes de jeux RGSX en tuples (name, url, size, region).
+
+    Diffère de l'ancien analyseur de load_games, dont les `#else:` commentés
+    changeaient le résultat : une entrée chaîne n'est plus comptée deux fois,
+    une entrée d'un autre type (nombre...) est gardée au lieu d'être ignorée, et
+    la clé 'game_list' (déjà lue par l'API du store) est aussi acceptée ici.
+    games_count et les listes du store peuvent donc différer d'avant."""
+    # Si dict avec clé 'games' (ou 'game_list' pour les anciens catalogues)
+    if isinstance(data, dict):
+        if 'games' in data:
+            data = data['games']
+        elif 'game_list' in data:
+            data = data['game_list']
+
+    normalized: List[GameRecord] = []
+
+    def extract_from_dict(d):
+        name = d.get('game_name') or d.get('name') or d.get('title') or d.get('game')
+        url = d.get('url') or d.get('download') or d.get('link') or d.get('href')
+        size = d.get('size') or d.get('filesize') or d.get('length')
+        region = d.get('region') or ""
+        if name:
+            normalized.append((str(name), url if isinstance(url, str) and url.strip() else None, str(size) if size else None, str(region)))
+
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, (list, tuple)):
+                if len(item) == 0:
+                    continue
+                name = str(item[0])
+                url = item[1] if len(item) > 1 and isinstance(item[1], str) and item[1].strip() else None
+                size = item[2] if len(item) > 2 and isinstance(item[2], str) and item[2].strip() else None
+                normalized.append((name, url, size, ""))
+            elif isinstance(item, dict):
+                extract_from_dict(item)
+            elif isinstance(item, str):
+                normalized.append((item, None, None, ""))
+            else:
+                normalized.append((str(item), None, None, ""))
+    elif isinstance(data, dict):  # dict sans 'games'
+        extract_from_dict(data)
+    else:
+        logger.warning(f"Format de liste de jeux inattendu: {type(data)}")
+    return normalized
+
+
+def binary_path(path: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(config.GAMES_META_FOLDER, name + BINARY_SUFFIX)
+
+
+def write_binary(path: str, games: CompactCatalog, st: os.stat_result):
+    """Écrit la version binaire d'un catalogue JSON (écriture atomique)."""
+    target = binary_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + ".tmp"
+    with open(tmp, 'wb') as f:
+        games.write_binary(f, st.st_mtime, st.st_size)
+    os.replace(tmp, target)
+
+
+def read_catalog(path: str) -> Catalog:
+    """Lit un catalogue sans passer par le cache.
+    La version binaire projetée en mémoire est utilisée si elle correspond au JSON
+    (qui reste la référence); sinon le JSON est parsé et la version binaire régénérée."""
+    st = os.stat(path)
+    games = CompactCatalog.open_binary(binary_path(path), st.st_mtime, st.st_size)
+    if games is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        games = CompactCatalog.from_records(normalize_games(data))
+        try:
+            write_binary(path, games, st)
+        except OSError as e:
+            logger.debug(f"Catalogue binaire non écrit pour {os.path.basename(path)}: {e}")
+    return Catalog(path, st.st_mtime, st.st_size, games)
+
+
+# --- Métadonnées (sidecar) ---
+
+def game_regions(record: GameRecord) -> List[str]:
+    """Régions d'un jeu: champ 'region' du catalogue, sinon premier tag du nom ("(USA, Europe)")."""
+    raw = record[3]
+    if not raw:
+        m = FIRST_TAG_RE.search(record[0])
+        raw = m.group(1) if m else ""
+    return [r.strip() for r in raw.split(",") if r.strip()]
+
+
+def meta_path(path: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(config.GAMES_META_FOLDER, name + META_SUFFIX)
+
+
+def _read_source(path: str) -> Tuple[os.stat_result, bytes, List[GameRecord]]:
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return st, raw, normalize_games(json.loads(raw.decode('utf-8')))
+
+
+def build_metadata(path: str, source: Optional[Tuple[os.stat_result, bytes, List[GameRecord]]] = None) -> Dict[str, Any]:
+    """Calcule les métadonnées d'un catalogue (une seule lecture du fichier pour le hash et le parsing)."""
+    st, raw, games = source or _read_source(path)
+    total_size = 0
+    unknown_sizes = 0
+    regions: Dict[str, int] = {}
+    for record in games:
+        size = parse_size(record[2])
+        if size is None:
+            unknown_sizes += 1
+        else:
+            total_size += size
+        for region in game_regions(record) or ["Unknown"]:
+            regions[region] = regions.get(region, 0) + 1
+    return {
+        "version": META_FORMAT_VERSION,
+        "file": os.path.basename(path),
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "sha1": hashlib.sha1(raw).hexdigest(),
+        "count": len(games),
+        "total_size": total_size,
+        "unknown_sizes": unknown_sizes,
+        "regions": dict(sorted(regions.items(), key=lambda kv: (-kv[1], kv[0]))),
+    }
+
+
+def write_metadata(path: str, source: Optional[Tuple[os.stat_result, bytes, List[GameRecord]]] = None) -> Dict[str, Any]:
+    """Génère le sidecar d'un catalogue (écriture atomique) et le retourne."""
+    meta = build_metadata(path, source)
+    target = meta_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, target)
+    return meta
+
+
+def read_metadata(path: str) -> Optional[Dict[str, Any]]:
+    """Retourne le sidecar d'un catalogue s'il correspond encore au fichier (mtime/taille), sinon None."""
+    try:
+        st = os.stat(path)
+        with open(meta_path(path), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(meta, dict) or meta.get("version") != META_FORMAT_VERSION
+            or meta.get("mtime") != st.st_mtime or meta.get("size") != st.st_size):
+        return None
+    return meta
+
+
+def generate_metadata(games_folder: str, paths: Optional[List[str]] = None) -> int:
+    """Génère les sidecars (métadonnées et version binaire) des catalogues `paths` (tous ceux
+    de `games_folder` par défaut) et supprime ceux dont le catalogue n'existe plus.
+    Retourne le nombre de catalogues traités."""
+    if paths is None:
+        try:
+            paths = [os.path.join(games_folder, f) for f in os.listdir(games_folder) if f.lower().endswith('.json')]
+        except OSError:
+            paths = []
+    written = 0
+    for path in paths:
+        try:
+            source = _read_source(path)
+            write_metadata(path, source)
+            write_binary(path, CompactCatalog.from_records(source[2]), source[0])
+            written += 1
+        except Exception as e:
+            logger.warning(f"Métadonnées non générées pour {os.path.basename(path)}: {e}")
+    try:
+        present = {os.path.splitext(f)[0] for f in os.listdir(games_folder) if f.lower().endswith('.json')}
+        for fname in os.listdir(config.GAMES_META_FOLDER):
+            for suffix in (META_SUFFIX, BINARY_SUFFIX):
+                if fname.endswith(suffix) and fname[:-len(suffix)] not in present:
+                    os.remove(os.path.join(config.GAMES_META_FOLDER, fname))
+    except OSError:
+        pass
+    return written
+
+
+class CatalogCache:
+    """Cache LRU des catalogues parsés, clé = chemin, invalidé par mtime/taille du fichier.
+    La taille est bornée par l'empreinte mémoire des catalogues compacts (`max_bytes`,
+    CATALOG_CACHE_MAX_MB); le dernier catalogue demandé est toujours gardé, même s'il
+    dépasse seul la limite."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Catalog]" = OrderedDict()
+        self._total = 0
+        # Nombre de jeux par (chemin, mtime, taille), conservé même après éviction
+        self._counts: Dict[str, Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> Catalog:
+        st = os.stat(path)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached.mtime == st.st_mtime and cached.size == st.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        catalog = read_catalog(path)
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._total -= old.nbytes
+            self._entries[path] = catalog
+            self._total += catalog.nbytes
+            self._counts[path] = (catalog.mtime, catalog.size, len(catalog))
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._total -= evicted.nbytes
+        logger.debug(f"Catalogue chargé: {os.path.basename(path)} ({len(catalog)} jeux, "
+                     f"{catalog.nbytes // 1024} Ko, cache: {self._total // 1024} Ko)")
+        return catalog
+
+    def count(self, path: str) -> int:
+        """Nombre de jeux d'un catalogue, sans le reparser s'il n'a pas changé.
+        Ordre: mémo en mémoire, sidecar de métadonnées, sinon parsing complet (et sidecar régénéré)."""
+        st = os.stat(path)
+        with self._lock:
+            known = self._counts.get(path)
+            if known is not None and known[0] == st.st_mtime and known[1] == st.st_size:
+                return known[2]
+        meta = read_metadata(path)
+        if meta is None:
+            try:
+                meta = write_metadata(path)
+            except OSError as e:
+                logger.debug(f"Sidecar non écrit pour {os.path.basename(path)}: {e}")
+                return len(self.get(path))
+        with self._lock:
+            self._counts[path] = (meta["mtime"], meta["size"], meta["count"])
+        return meta["count"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counts.clear()
+            self._total = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"catalogs": len(self._entries), "games": sum(len(c) for c in self._entries.values()),
+                    "bytes": self._total, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+catalog_cache = CatalogCache(getattr(config, "CATALOG_CACHE_MAX_MB", 64) * 1024 * 1024)
+
+
+def get_catalog(path: str) -> Catalog:
+    return catalog_cache.get(path)
+
+
+def count_games(path: str) -> int:
+    return catalog_cache.count(path)
@@ -29,9 +29,17 @@ ROMS_FOLDER = "/roms"
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
-# File d'attente de téléchargements
-download_queue = []
-download_active = False
+# File d'attente de téléchargements : créneaux simultanés, au total et par hôte
+DOWNLOAD_MAX_CONCURRENT = int(os.getenv("DOWNLOAD_MAX_CONCURRENT", 3))
+DOWNLOAD_MAX_PER_HOST = int(os.getenv("DOWNLOAD_MAX_PER_HOST", 2))
+# Limites propres à certains hôtes, ex. "1fichier.com=1,archive.org=2" (1fichier gratuit : un seul à la fois)
+DOWNLOAD_HOST_LIMITS = os.getenv("DOWNLOAD_HOST_LIMITS", "1fichier.com=1")
+# Journal de la file de téléchargements, relu au démarrage
+DOWNLOAD_QUEUE_PATH = os.path.join(SAVE_FOLDER, "download_queue.jsonl")
+# Téléchargement segmenté (requêtes Range en parallèle) des fichiers d'au moins DOWNLOAD_SEGMENT_MIN_MB
+DOWNLOAD_SEGMENTS = int(os.getenv("DOWNLOAD_SEGMENTS", 4))
+DOWNLOAD_SEGMENT_MIN_MB = int(os.getenv("DOWNLOAD_SEGMENT_MIN_MB", 16))
+DOWNLOAD_SEGMENT_RETRIES = int(os.getenv("DOWNLOAD_SEGMENT_RETRIES", 5))
 download_progress = {}
 
 # Log directory
@@ -45,6 +53,10 @@ IMAGES_FOLDER = os.path.join(SAVE_FOLDER, "images")
 GAME_LISTS_FOLDER = os.path.join(SAVE_FOLDER, "games")
 GAMES_FOLDER = GAME_LISTS_FOLDER
 SOURCES_FILE = os.path.join(SAVE_FOLDER, "systems_list.json")
+# Métadonnées précalculées (nombre de jeux, taille totale, régions) et catalogues binaires
+GAMES_META_FOLDER = os.path.join(SAVE_FOLDER, "games_meta")
+# Budget mémoire du cache des catalogues parsés (format compact, ~100 octets par jeu)
+CATALOG_CACHE_MAX_MB = int(os.getenv("CATALOG_CACHE_MAX_MB", 64))
 JSON_EXTENSIONS = os.path.join(SAVE_FOLDER, "rom_extensions.json")
 HISTORY_PATH = os.path.join(SAVE_FOLDER, "history.json")
 DOWNLOADED_GAMES_PATH = os.path.join(SAVE_FOLDER, "downloaded_games.json")
@@ -1,11 +1,18 @@
 import json
 import os
 import logging
+import threading
 from . import config
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Plusieurs téléchargements simultanés sauvegardent l'historique
+_save_lock = threading.Lock()
+
+# Statuts d'un téléchargement pas encore terminé (anglais et français)
+ACTIVE_STATUSES = {"Downloading", "Téléchargement", "downloading", "Extracting", "Converting", "Queued"}
+
 # Chemin par défaut pour history.json
 
 def init_history():
@@ -74,18 +81,19 @@ def load_history():
 def save_history(history):
     """Sauvegarde l'historique dans history.json de manière atomique."""
     history_path = getattr(config, 'HISTORY_PATH')
+    temp_path = history_path + '.tmp'
     try:
         os.makedirs(os.path.dirname(history_path), exist_ok=True)
 
         # Écriture atomique : écrire dans un fichier temporaire puis renommer
-        temp_path = history_path + '.tmp'
-        with open(temp_path, "w", encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-            f.flush()  # Forcer l'écriture sur disque
-            os.fsync(f.fileno())  # Synchroniser avec le système de fichiers
-
-        # Renommer atomiquement (remplace l'ancien fichier)
-        os.replace(temp_path, history_path)
+        with _save_lock:
+            with open(temp_path, "w", encoding='utf-8') as f:
+                json.dump(history, f, indent=2, ensure_ascii=False)
+                f.flush()  # Forcer l'écriture sur disque
+                os.fsync(f.fileno())  # Synchroniser avec le système de fichiers
+
+            # Renommer atomiquement (remplace l'ancien fichier)
+            os.replace(temp_path, history_path)
     except Exception as e:
         logger.error(f"Erreur lors de l'écriture de {history_path} : {e}")
         # Nettoyer le fichier temporaire en cas d'erreur
@@ -122,10 +130,9 @@ def clear_history():
 
         # Conserver uniquement les entrées avec statut actif (téléchargement, extraction ou conversion en cours)
         # Supporter les deux variantes de statut (anglais et français)
-        active_statuses = {"Downloading", "Téléchargement", "downloading", "Extracting", "Converting", "Queued"}
         preserved_entries = [
             entry for entry in current_history
-            if entry.get("status") in active_statuses
+            if entry.get("status") in ACTIVE_STATUSES
         ]
 
         # Sauvegarder l'historique filtré
@@ -137,6 +144,31 @@ def clear_history():
     except Exception as e:
         logger.error(f"Erreur lors du vidage de {history_path} : {e}")
 
+def recover_interrupted_history(requeued_urls):
+    """Corrige au démarrage les entrées restées « en cours » par un arrêt du serveur :
+    « Queued » si leur tâche a été remise en file, sinon « Canceled » (en attente) ou
+    « Erreur » (interrompue). Renvoie le nombre d'entrées corrigées."""
+    history = load_history()
+    fixed = 0
+    for entry in history:
+        if entry.get("status") not in ACTIVE_STATUSES:
+            continue
+        if entry.get("url") in requeued_urls:
+            entry["status"] = "Queued"
+            entry["message"] = "Reprise après redémarrage du serveur"
+        elif entry.get("status") == "Queued":
+            entry["status"] = "Canceled"
+        else:
+            entry["status"] = "Erreur"
+            entry["message"] = "Interrompu par un redémarrage du serveur"
+        entry["speed"] = 0
+        fixed += 1
+    if fixed:
+        save_history(history)
+        config.history = history
+        logger.info(f"Historique : {fixed} téléchargements interrompus corrigés")
+    return fixed
+
 
 # ==================== GESTION DES JEUX TÉLÉCHARGÉS ====================
 
@@ -15,15 +15,18 @@ try:
 except Exception:
     pygame = None  # type: ignore
 from .config import OTA_VERSION_ENDPOINT,APP_FOLDER, UPDATE_FOLDER, OTA_UPDATE_ZIP
-from .utils import sanitize_filename, extract_zip, extract_rar, load_api_key_1fichier, load_api_key_alldebrid, normalize_platform_name, load_api_keys
-from .history import save_history
+from .utils import sanitize_filename, catalog_game_name, extract_zip, extract_rar, load_api_key_1fichier, load_api_key_alldebrid, normalize_platform_name, load_api_keys
+from .history import save_history, recover_interrupted_history
+from .scheduler import DownloadScheduler, parse_host_limits
+from .queue_journal import QueueJournal
+from .partial import PartialDownload, RangesNotSupported
+from .segmented import SegmentedDownload, DownloadCanceled, supports_ranges
 def show_toast(*args): pass
 import logging
 import datetime
 from datetime import datetime
 from .history import load_history
 
-import queue
 import time
 import os
 import json
@@ -37,37 +40,48 @@ from urllib.parse import urljoin, unquote
 
 logger = logging.getLogger(__name__)
 
-# --- File d'attente de téléchargements (worker) ---
-def download_queue_worker():
-    """Worker qui surveille la file d'attente et lance le prochain téléchargement si aucun n'est actif."""
-    import time
-    while True:
-        try:
-            if not config.download_active and config.download_queue:
-                job = config.download_queue.pop(0)
-                config.download_active = True
-                logger.info(f"[QUEUE] Lancement du téléchargement: {job.get('game_name','?')} ({job.get('url','?')})")
-                # Démarrer le téléchargement selon le provider
-                url = job['url']
-                platform = job['platform']
-                game_name = job['game_name']
-                is_zip_non_supported = job.get('is_zip_non_supported', False)
-                task_id = job.get('task_id') or f"queue_{int(time.time()*1000)}"
-                # Choix du provider (1fichier ou direct)
-                if is_1fichier_url(url):
-                    t = threading.Thread(target=lambda: asyncio.run(download_from_1fichier(url, platform, game_name, is_zip_non_supported, task_id)), daemon=True)
-                else:
-                    t = threading.Thread(target=lambda: asyncio.run(download_rom(url, platform, game_name, is_zip_non_supported, task_id)), daemon=True)
-                t.start()
-                # Le flag download_active sera remis à False à la fin du téléchargement (voir ci-dessous)
-            time.sleep(1)
-        except Exception as e:
-            logger.error(f"[QUEUE] Erreur dans le worker de file d'attente: {e}")
-            time.sleep(2)
-
-# Hook à appeler à la fin de chaque téléchargement pour libérer le slot
+# --- File d'attente de téléchargements (ordonnanceur) ---
+def run_download_job(job):
+    """Exécute une tâche de la file dans le thread que lui attribue l'ordonnanceur."""
+    url = job['url']
+    platform = job['platform']
+    game_name = job['game_name']
+    # Nom affiché sans extension: reprendre le nom du catalogue (ou le fichier de l'URL)
+    if not os.path.splitext(game_name)[1]:
+        game_name = catalog_game_name(platform, url) or game_name
+    is_zip_non_supported = job.get('is_zip_non_supported', False)
+    task_id = job.get('task_id') or f"queue_{int(time.time()*1000)}"
+    # Choix du provider (1fichier ou direct)
+    if is_1fichier_url(url):
+        return asyncio.run(download_from_1fichier(url, platform, game_name, is_zip_non_supported, task_id))
+    return asyncio.run(download_rom(url, platform, game_name, is_zip_non_supported, task_id))
+
+download_scheduler = DownloadScheduler(
+    run_download_job,
+    max_concurrent=config.DOWNLOAD_MAX_CONCURRENT,
+    max_per_host=config.DOWNLOAD_MAX_PER_HOST,
+    host_limits=parse_host_limits(config.DOWNLOAD_HOST_LIMITS),
+    journal=QueueJournal(config.DOWNLOAD_QUEUE_PATH),
+)
+
+def restore_download_queue():
+    """Remet en file les téléchargements laissés par l'arrêt précédent (les interrompus
+    reprennent leur fichier .part) et corrige l'historique resté « en cours »."""
+    try:
+        jobs = download_scheduler.restore()
+    except Exception as e:
+        logger.error(f"[QUEUE] Relecture du journal de la file impossible: {e}")
+        jobs = []
+    if jobs:
+        interrupted = sum(1 for job in jobs if job.get("interrupted"))
+        logger.info(f"[QUEUE] {len(jobs)} téléchargements remis en file ({interrupted} interrompus, à reprendre)")
+    recover_interrupted_history({job["url"] for job in jobs})
+    return jobs
+
+# Hook historique appelé à la fin de chaque téléchargement : le créneau est désormais
+# libéré par l'ordonnanceur quand run_download_job se termine
 def notify_download_finished():
-    config.download_active = False
+    pass
 
 # ================== TÉLÉCHARGEMENT 1FICHIER GRATUIT ==================
 # Fonction pour télécharger depuis 1fichier sans API key (mode gratuit)
@@ -317,23 +331,36 @@ def download_1fichier_free_mode(url, dest_dir, session, log_callback=None, progr
         # 6. Téléchargement
         _log(_("free_mode_download").format(filename))
 
-        with session.get(direct_link, stream=True, allow_redirects=True, timeout=30) as resp:
-            resp.raise_for_status()
-            total = int(resp.headers.get('content-length', 0))
+        # Reprendre un .part laissé par une tentative précédente du même lien
+        partial = PartialDownload(filepath, url)
+        offset = partial.offset()
+        range_headers = {'Range': f"bytes={offset}-"} if offset else None
+        try:
+            with session.get(direct_link, stream=True, allow_redirects=True, timeout=30, headers=range_headers) as resp:
+                resp.raise_for_status()
+                downloaded, total = partial.resume_response(resp, offset)
+                if downloaded:
+                    _log(f"Reprise à {downloaded}/{total} octets")
 
-            with open(filepath, 'wb') as f:
-                downloaded = 0
                 for chunk in resp.iter_content(chunk_size=128*1024):
                     if cancel_event and cancel_event.is_set():
+                        partial.discard()
                         return (False, None, "Annulé")
 
-                    f.write(chunk)
+                    partial.write(chunk, downloaded)
                     downloaded += len(chunk)
 
                     if total:
                         pct = downloaded / total * 100
                         _progress(filename, downloaded, total, pct)
 
+                if total and downloaded < total and not resp.headers.get('content-encoding'):
+                    raise requests.ConnectionError(f"Téléchargement interrompu à {downloaded}/{total} octets")
+            partial.complete()
+        finally:
+            # Sans effet après complete()/discard() ; sinon garde le .part pour la prochaine tentative
+            partial.close()
+
         _log(_("free_mode_completed").format(filepath))
         return (True, filepath, None)
 
@@ -691,8 +718,8 @@ def extract_update(zip_path, dest_dir, source_url):
         logger.error(f"Erreur critique lors de l'extraction du ZIP {source_url}: {str(e)}")
         return False, _("network_zip_extraction_error").format(source_url, str(e))
 
-# File d'attente pour la progression - une par tâche
-progress_queues = {}
+# Callbacks de progression - un par tâche, appelés directement par le thread de téléchargement
+progress_callbacks = {}
 # Cancellation and thread tracking per download task
 cancel_events = {}
 download_threads = {}
@@ -704,6 +731,26 @@ url_results = {}  # {url: (success, message)}
 # Événements pour synchroniser les appels doublons (attendre la fin du premier)
 url_done_events = {}  # {url: threading.Event}
 
+def _report_progress(task_id, *data):
+    """Transmet au callback de la tâche une progression (downloaded, total[, speed])
+    ou le résultat final (success, message)."""
+    callback = progress_callbacks.get(task_id)
+    if callback is None:
+        return
+    try:
+        callback(*data)
+    except Exception as e:
+        logger.error(f"Erreur mise à jour progression: {str(e)}")
+
+def _clear_completed_progress(url):
+    """Retire la progression d'une URL terminée, après l'avoir laissée affichée à 100%."""
+    def clear():
+        if config.download_progress.get(url, {}).get("status") == "Completed":
+            config.download_progress.pop(url, None)
+    timer = threading.Timer(1.5, clear)
+    timer.daemon = True
+    timer.start()
+
 def request_cancel(task_id: str) -> bool:
     """Request cancellation for a running download task by its task_id."""
     ev = cancel_events.get(task_id)
@@ -735,8 +782,7 @@ def cancel_all_downloads():
             pass
 
     # Vider la file d'attente des téléchargements
-    config.download_queue.clear()
-    config.download_active = False
+    download_scheduler.clear()
 
     # Mettre à jour l'historique pour annuler les téléchargements en statut "Queued"
     try:
@@ -772,13 +818,9 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
     # Si on attendait un doublon, on attend ici
     if done_event is not None:
         logger.debug(f"Attente de la fin du téléchargement en doublon pour {url}")
-        # Attendre de manière asynchrone l'événement (timeout de 30 minutes pour les gros fichiers)
-        start_wait = time.time()
-        while not done_event.is_set():
-            if time.time() - start_wait > 1800:  # 30 minutes timeout
-                logger.warning(f"Timeout d'attente pour le doublon de {url}")
-                break
-            await asyncio.sleep(0.1)
+        # Attendre l'événement depuis le thread de l'ordonnanceur (timeout de 30 minutes pour les gros fichiers)
+        if not done_event.wait(1800):  # 30 minutes timeout
+            logger.warning(f"Timeout d'attente pour le doublon de {url}")
         # Vérifier si on a un résultat en cache
         if url in url_results:
             logger.info(f"Résultat en cache pour {url}: {url_results[url]}")
@@ -787,13 +829,12 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
             # Fallback: retourner un message de succès (le premier téléchargement a probablement réussi)
             return (True, _("network_download_ok").format(game_name))
 
-    # Créer une queue/cancel spécifique pour cette tâche
-    if task_id not in progress_queues:
-        progress_queues[task_id] = queue.Queue()
+    # Créer un cancel spécifique pour cette tâche
     if task_id not in cancel_events:
         cancel_events[task_id] = threading.Event()
 
     def download_thread():
+        partial = None
         try:
             # IMPORTANT: Créer l'entrée dans config.history dès le début avec status "Downloading"
             # pour que l'interface web puisse afficher le téléchargement en cours
@@ -901,10 +942,14 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
 
                 # Comparer les tailles si on a obtenu la taille distante
                 if remote_size is not None and local_size != remote_size:
-                    logger.warning(f"Taille mismatch! Local: {local_size}, Remote: {remote_size} - le fichier sera re-téléchargé")
-                    # Les tailles ne correspondent pas, il faut re-télécharger
+                    logger.warning(f"Taille mismatch! Local: {local_size}, Remote: {remote_size} - "
+                                   + ("reprise du téléchargement" if local_size < remote_size else "le fichier sera re-téléchargé"))
                     try:
-                        if os.path.exists(dest_path):
+                        if local_size < remote_size:
+                            # Fichier tronqué : il devient le .part d'une reprise au lieu d'être re-téléchargé en entier
+                            PartialDownload(dest_path, url).adopt()
+                            logger.info(f"Fichier incomplet conservé pour reprise: {dest_path}.part")
+                        elif os.path.exists(dest_path):
                             os.remove(dest_path)
                             logger.info(f"Fichier incomplet supprimé: {dest_path}")
                         else:
@@ -1192,35 +1237,63 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
                         break
 
             # Initialiser la progression avec task_id
-            progress_queues[task_id].put((task_id, 0, total_size))
+            _report_progress(task_id, 0, total_size)
             logger.debug(f"Progression initiale envoyée: 0% pour {game_name}, task_id={task_id}")
 
-            downloaded = 0
-            chunk_size = 4096
-            last_update_time = time.time()
-            last_downloaded = 0
-            update_interval = 0.1  # Mettre à jour toutes les 0,1 secondes
+            # Reprise d'une tentative précédente (.part + journal des plages terminées)
+            resumable = supports_ranges(response)
+            partial = PartialDownload(dest_path, url)
+            partial.prepare(total_size if resumable else 0, response.headers.get("etag"), response.headers.get("last-modified"))
+            if partial.done and not resumable:
+                logger.info(f"Le serveur ne permet pas la reprise, téléchargement repris de zéro: {dest_path}")
+                partial.reset()
+
+            # Gros fichier sur un serveur qui accepte les plages : N connexions en parallèle
+            segments = config.DOWNLOAD_SEGMENTS if total_size >= config.DOWNLOAD_SEGMENT_MIN_MB * 1024 * 1024 else 1
+            segmented = False
             download_canceled = False
-            with open(dest_path, 'wb') as f:
+            if resumable and (segments > 1 or partial.done):
+                response.close()
+                if partial.done:
+                    logger.info(f"Reprise du téléchargement de {game_name} à {partial.done}/{total_size} octets")
+                try:
+                    SegmentedDownload(
+                        session, response.url, partial, headers=hv,
+                        segments=segments, retries=config.DOWNLOAD_SEGMENT_RETRIES,
+                        timeout=timeout_val, cancel_event=cancel_ev,
+                        progress_callback=lambda done, total, speed: _report_progress(task_id, done, total, speed),
+                    ).run()
+                    segmented = True
+                    logger.debug(f"Téléchargement par plages terminé ({segments} connexions): {dest_path}")
+                except RangesNotSupported as e:
+                    logger.info(f"Plages non respectées par le serveur ({e}), téléchargement en un seul flux")
+                    partial.reset()
+                    response = session.get(url, stream=True, timeout=timeout_val, allow_redirects=True, headers=hv)
+                    response.raise_for_status()
+                except DownloadCanceled:
+                    logger.debug(f"Annulation détectée, arrêt du téléchargement segmenté pour task_id={task_id}")
+                    result[0] = False
+                    result[1] = _("download_canceled") if _ else "Download canceled"
+                    download_canceled = True
+                    partial.discard()
+
+            if not segmented and not download_canceled:
+                downloaded = 0
+                chunk_size = 256 * 1024
+                last_update_time = time.time()
+                last_downloaded = 0
+                update_interval = 0.1  # Mettre à jour toutes les 0,1 secondes
                 for chunk in response.iter_content(chunk_size=chunk_size):
                     if cancel_ev is not None and cancel_ev.is_set():
                         logger.debug(f"Annulation détectée, arrêt du téléchargement pour task_id={task_id}")
                         result[0] = False
                         result[1] = _("download_canceled") if _ else "Download canceled"
                         download_canceled = True
-                        try:
-                            f.close()
-                        except Exception:
-                            pass
-                        try:
-                            if os.path.exists(dest_path):
-                                os.remove(dest_path)
-                        except Exception:
-                            pass
+                        partial.discard()
                         break
                     if chunk:
                         size_received = len(chunk)
-                        f.write(chunk)
+                        partial.write(chunk, downloaded)
                         downloaded += size_received
                         current_time = time.time()
                         if current_time - last_update_time >= update_interval:
@@ -1229,17 +1302,21 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
                             speed = delta / (current_time - last_update_time) / (1024 * 1024)
                             last_downloaded = downloaded
                             last_update_time = current_time
-                            progress_queues[task_id].put((task_id, downloaded, total_size, speed))
-
-            # Forcer une dernière mise à jour de progression pour les petits fichiers
-            # (au cas où aucune mise à jour n'a été envoyée pendant la boucle)
-            if downloaded > 0 and downloaded != last_downloaded:
-                current_time = time.time()
-                delta = downloaded - last_downloaded
-                elapsed = current_time - last_update_time
-                speed = delta / elapsed / (1024 * 1024) if elapsed > 0 else 0
-                progress_queues[task_id].put((task_id, downloaded, total_size, speed))
-                logger.debug(f"Mise à jour finale de progression: {downloaded}/{total_size} octets")
+                            _report_progress(task_id, downloaded, total_size, speed)
+
+                # Forcer une dernière mise à jour de progression pour les petits fichiers
+                # (au cas où aucune mise à jour n'a été envoyée pendant la boucle)
+                if downloaded > 0 and downloaded != last_downloaded:
+                    current_time = time.time()
+                    delta = downloaded - last_downloaded
+                    elapsed = current_time - last_update_time
+                    speed = delta / elapsed / (1024 * 1024) if elapsed > 0 else 0
+                    _report_progress(task_id, downloaded, total_size, speed)
+                    logger.debug(f"Mise à jour finale de progression: {downloaded}/{total_size} octets")
+
+                # Flux coupé avant la fin : garder le .part pour une reprise plutôt que livrer un fichier tronqué
+                if not download_canceled and resumable and downloaded < total_size:
+                    raise requests.ConnectionError(f"Téléchargement interrompu à {downloaded}/{total_size} octets")
 
             # Si annulé, ne pas continuer avec extraction
             if download_canceled:
@@ -1250,6 +1327,7 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
                     pass
                 return
 
+            partial.complete()
             os.chmod(dest_path, 0o644)
             logger.debug(f"Téléchargement terminé: {dest_path}")
 
@@ -1328,6 +1406,12 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
             logger.error(f"Erreur téléchargement {url}: {str(e)}")
             result[0] = False
             result[1] = _("network_download_error").format(game_name, str(e))
+            # Le .part et son journal restent sur le disque pour la prochaine tentative
+            if partial is not None:
+                try:
+                    partial.close()
+                except OSError:
+                    pass
 
         # AVANT le finally : Mettre à jour la progression à 100% si succès
         if result[0] and url in config.download_progress:
@@ -1335,129 +1419,85 @@ async def download_rom(url, platform, game_name, is_zip_non_supported=False, tas
             config.download_progress[url]["progress_percent"] = 100
             config.download_progress[url]["status"] = "Completed"
             config.download_progress[url]["downloaded_size"] = config.download_progress[url].get("total_size", 0)
-                # Plus besoin de update_web_progress
-            logger.info(f"[WEB PROGRESS] Attente 1.5s pour affichage...")
-            time.sleep(1.5)  # Laisser l'interface afficher 100% pendant 1.5 secondes
-            logger.info(f"[WEB PROGRESS] Fin de l'attente, envoi signal de fin")
 
-        # Maintenant on peut envoyer le signal de fin à la boucle
+        # Maintenant on peut envoyer le signal de fin
         logger.debug(f"Thread téléchargement terminé pour {url}, task_id={task_id}")
-        progress_queues[task_id].put((task_id, result[0], result[1]))
-        logger.debug(f"Final result sent to queue: success={result[0]}, message={result[1]}, task_id={task_id}")
+        _report_progress(task_id, result[0], result[1])
+        logger.debug(f"Final result sent: success={result[0]}, message={result[1]}, task_id={task_id}")
 
-    thread = threading.Thread(target=download_thread, daemon=True)
-    download_threads[task_id] = thread
-    thread.start()
-
-    # Boucle principale pour mettre à jour la progression
-    while thread.is_alive():
-        try:
-            task_queue = progress_queues.get(task_id)
-            if task_queue:
-                while not task_queue.empty():
-                    data = task_queue.get()
-                    #logger.debug(f"Progress queue data received: {data}")
-                    if isinstance(data[1], bool):  # Fin du téléchargement
-                        success, message = data[1], data[2]
-
-                        # Nettoyer download_progress et web_progress
-                        if url in config.download_progress:
-                            del config.download_progress[url]
-                        # Plus besoin de remove_web_progress
+    def on_progress(*data):
+        """Événements du thread : (downloaded, total[, speed]) puis (success, message) à la fin."""
+        if isinstance(data[0], bool):  # Fin du téléchargement
+            success, message = data
 
-                        if isinstance(config.history, list):
-                            for entry in config.history:
-                                if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement", "Extracting"]:
-                                    entry["status"] = "Download_OK" if success else "Erreur"
-                                    entry["progress"] = 100 if success else 0
-                                    entry["message"] = message
-                                    save_history(config.history)
-                                    # Marquer le jeu comme téléchargé si succès
-                                    if success:
-                                        logger.debug(f"[WHILE_LOOP] Marking game as downloaded: platform={platform}, game={game_name}")
-                                        from .history import mark_game_as_downloaded
-                                        file_size = entry.get("size", "N/A")
-                                        mark_game_as_downloaded(platform, game_name, file_size)
-                                    pass
-                                    logger.debug(f"Final update in history: status={entry['status']}, progress={entry['progress']}%, message={message}, task_id={task_id}")
-                                    break
-                    else:
-                        if len(data) >= 4:
-                            downloaded, total_size, speed = data[1], data[2], data[3]
-                        else:
-                            downloaded, total_size = data[1], data[2]
-                            speed = 0.0
-                        progress_percent = int(downloaded / total_size * 100) if total_size > 0 else 0
-                        progress_percent = max(0, min(100, progress_percent))
-
-                        # Mettre à jour config.download_progress pour compatibilité
-                        if url in config.download_progress:
-                            config.download_progress[url]["downloaded_size"] = downloaded
-                            config.download_progress[url]["total_size"] = total_size
-                            config.download_progress[url]["speed"] = speed
-                            config.download_progress[url]["progress_percent"] = progress_percent
-                            # Si 100%, afficher "Completed" au lieu de "Downloading"
-                            config.download_progress[url]["status"] = "Completed" if progress_percent >= 100 else "Downloading"
-
-                            # Mettre à jour le fichier web
-                # Plus besoin de update_web_progress
+            # Nettoyer download_progress (laissé affiché à 100% un instant en cas de succès)
+            if url in config.download_progress:
+                if success:
+                    _clear_completed_progress(url)
+                else:
+                    config.download_progress.pop(url, None)
 
-                        # IMPORTANT: Mettre à jour config.history PENDANT le téléchargement aussi
-                        # pour que l'interface web affiche la progression en temps réel
-                        # NOTE: On ne touche PAS au timestamp qui doit rester celui de création
-                        if isinstance(config.history, list):
-                            for entry in config.history:
-                                if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement"]:
-                                    entry["downloaded_size"] = downloaded
-                                    entry["total_size"] = total_size
-                                    entry["speed"] = speed
-                                    entry["progress"] = progress_percent
-                                    entry["status"] = "Téléchargement"
-                                    # Sauvegarder toutes les 5% pour éviter trop d'I/O
-                                    if progress_percent % 5 == 0 or progress_percent >= 99:
-                                        save_history(config.history)
-                                    break
-                                    pass
-                                    break
-            await asyncio.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Erreur mise à jour progression: {str(e)}")
+            if isinstance(config.history, list):
+                for entry in config.history:
+                    if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement", "Extracting"]:
+                        entry["status"] = "Download_OK" if success else "Erreur"
+                        entry["progress"] = 100 if success else 0
+                        entry["message"] = message
+                        save_history(config.history)
+                        # Marquer le jeu comme téléchargé si succès
+                        if success:
+                            logger.debug(f"Marking game as downloaded: platform={platform}, game={game_name}")
+                            from .history import mark_game_as_downloaded
+                            file_size = entry.get("size", "N/A")
+                            mark_game_as_downloaded(platform, game_name, file_size)
+                        logger.debug(f"Final update in history: status={entry['status']}, progress={entry['progress']}%, message={message}, task_id={task_id}")
+                        break
+            return
 
-    thread.join()
-    try:
-        download_threads.pop(task_id, None)
-    except Exception:
-        pass
-    # Drain any remaining final message to ensure history is saved
-    try:
-        task_queue = progress_queues.get(task_id)
-        if task_queue:
-            while not task_queue.empty():
-                data = task_queue.get()
-                if isinstance(data[1], bool):
-                    success, message = data[1], data[2]
-                    logger.debug(f"[DRAIN_QUEUE] Processing final message: success={success}, message={message[:100] if message else 'None'}")
-                    if isinstance(config.history, list):
-                        for entry in config.history:
-                            if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement", "Extracting"]:
-                                entry["status"] = "Download_OK" if success else "Erreur"
-                                entry["progress"] = 100 if success else 0
-                                entry["message"] = message
-                                save_history(config.history)
-                                # Marquer le jeu comme téléchargé si succès
-                                if success:
-                                    logger.debug(f"[DRAIN_QUEUE] Marking game as downloaded: platform={platform}, game={game_name}")
-                                    from .history import mark_game_as_downloaded
-                                    file_size = entry.get("size", "N/A")
-                                    mark_game_as_downloaded(platform, game_name, file_size)
-                                break
-    except Exception as e:
-        logger.error(f"[DRAIN_QUEUE] Error processing final message: {e}")
+        if len(data) >= 3:
+            downloaded, total_size, speed = data[0], data[1], data[2]
+        else:
+            downloaded, total_size = data[0], data[1]
+            speed = 0.0
+        progress_percent = int(downloaded / total_size * 100) if total_size > 0 else 0
+        progress_percent = max(0, min(100, progress_percent))
+
+        # Mettre à jour config.download_progress pour compatibilité
+        if url in config.download_progress:
+            config.download_progress[url]["downloaded_size"] = downloaded
+            config.download_progress[url]["total_size"] = total_size
+            config.download_progress[url]["speed"] = speed
+            config.download_progress[url]["progress_percent"] = progress_percent
+            # Si 100%, afficher "Completed" au lieu de "Downloading"
+            config.download_progress[url]["status"] = "Completed" if progress_percent >= 100 else "Downloading"
+
+        # IMPORTANT: Mettre à jour config.history PENDANT le téléchargement aussi
+        # pour que l'interface web affiche la progression en temps réel
+        # NOTE: On ne touche PAS au timestamp qui doit rester celui de création
+        if isinstance(config.history, list):
+            for entry in config.history:
+                if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement"]:
+                    previous = entry.get("progress", 0)
+                    entry["downloaded_size"] = downloaded
+                    entry["total_size"] = total_size
+                    entry["speed"] = speed
+                    entry["progress"] = progress_percent
+                    entry["status"] = "Téléchargement"
+                    # Sauvegarder à chaque palier de 5% pour éviter trop d'I/O
+                    if progress_percent // 5 != previous // 5 or progress_percent >= 99:
+                        save_history(config.history)
+                    break
 
+    progress_callbacks[task_id] = on_progress
+    thread = threading.Thread(target=download_thread, daemon=True)
+    download_threads[task_id] = thread
+    thread.start()
 
-    # Nettoyer la queue
-    if task_id in progress_queues:
-        del progress_queues[task_id]
+    # La progression arrive par on_progress : il n'y a plus qu'à attendre la fin du thread.
+    # Cette coroutine tourne déjà dans un thread de l'ordonnanceur (run_download_job) : attente directe
+    thread.join()
+    download_threads.pop(task_id, None)
+    progress_callbacks.pop(task_id, None)
     cancel_events.pop(task_id, None)
 
     # Sauvegarder le résultat AVANT de retirer l'URL du set (pour les doublons)
@@ -1513,13 +1553,9 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
     # Si on attendait un doublon, on attend ici
     if done_event is not None:
         logger.debug(f"Attente de la fin du téléchargement en doublon pour {url}")
-        # Attendre de manière asynchrone l'événement (timeout de 30 minutes pour les gros fichiers)
-        start_wait = time.time()
-        while not done_event.is_set():
-            if time.time() - start_wait > 1800:  # 30 minutes timeout
-                logger.warning(f"Timeout d'attente pour le doublon de {url}")
-                break
-            await asyncio.sleep(0.1)
+        # Attendre l'événement depuis le thread de l'ordonnanceur (timeout de 30 minutes pour les gros fichiers)
+        if not done_event.wait(1800):  # 30 minutes timeout
+            logger.warning(f"Timeout d'attente pour le doublon de {url}")
         # Vérifier si on a un résultat en cache
         if url in url_results:
             logger.info(f"Résultat en cache pour {url}: {url_results[url]}")
@@ -1531,10 +1567,7 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
         # Ajouter l'URL au set en cours
         urls_in_progress.add(url)
 
-    # Créer une queue spécifique pour cette tâche
-    logger.debug(f"Création queue pour task_id={task_id}")
-    if task_id not in progress_queues:
-        progress_queues[task_id] = queue.Queue()
+    # Créer un cancel spécifique pour cette tâche
     if task_id not in cancel_events:
         cancel_events[task_id] = threading.Event()
 
@@ -1562,6 +1595,7 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
         logger.debug(f"Thread téléchargement 1fichier démarré pour {url}, task_id={task_id}")
         # Assurer l'accès à provider_used dans cette closure (lecture/écriture)
         nonlocal provider_used
+        partial = None
         try:
             cancel_ev = cancel_events.get(task_id)
             link = url.split('&af=')[0]
@@ -1730,10 +1764,14 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
 
                     # Comparer les tailles si on a obtenu la taille distante
                     if remote_size is not None and local_size != remote_size:
-                        logger.warning(f"Taille mismatch! Local: {local_size}, Remote: {remote_size} - le fichier sera re-téléchargé")
-                        # Les tailles ne correspondent pas, il faut re-télécharger
+                        logger.warning(f"Taille mismatch! Local: {local_size}, Remote: {remote_size} - "
+                                       + ("reprise du téléchargement" if local_size < remote_size else "le fichier sera re-téléchargé"))
                         try:
-                            if os.path.exists(dest_path):
+                            if local_size < remote_size:
+                                # Fichier tronqué : il devient le .part d'une reprise au lieu d'être re-téléchargé en entier
+                                PartialDownload(dest_path, url).adopt()
+                                logger.info(f"Fichier incomplet conservé pour reprise: {dest_path}.part")
+                            elif os.path.exists(dest_path):
                                 os.remove(dest_path)
                                 logger.info(f"Fichier incomplet supprimé: {dest_path}")
                             else:
@@ -2027,7 +2065,7 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
                                             pass
                                             save_history(config.history)
                                             break
-                                progress_queues[task_id].put((task_id, downloaded, total))
+                                _report_progress(task_id, downloaded, total)
 
                         def wait_cb(remaining, total_wait):
                             if isinstance(config.history, list):
@@ -2130,10 +2168,14 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
 
                     # Comparer les tailles si on a obtenu la taille distante
                     if remote_size is not None and local_size != remote_size:
-                        logger.warning(f"Taille mismatch! Local: {local_size}, Remote: {remote_size} - le fichier sera re-téléchargé")
-                        # Les tailles ne correspondent pas, il faut re-télécharger
+                        logger.warning(f"Taille mismatch! Local: {local_size}, Remote: {remote_size} - "
+                                       + ("reprise du téléchargement" if local_size < remote_size else "le fichier sera re-téléchargé"))
                         try:
-                            if os.path.exists(dest_path):
+                            if local_size < remote_size:
+                                # Fichier tronqué : il devient le .part d'une reprise au lieu d'être re-téléchargé en entier
+                                PartialDownload(dest_path, url).adopt()
+                                logger.info(f"Fichier incomplet conservé pour reprise: {dest_path}.part")
+                            elif os.path.exists(dest_path):
                                 os.remove(dest_path)
                                 logger.info(f"Fichier incomplet supprimé: {dest_path}")
                             else:
@@ -2204,14 +2246,25 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
             retries = 10
             retry_delay = 10
             logger.debug(f"Initialisation progression avec taille inconnue pour task_id={task_id}")
-            progress_queues[task_id].put((task_id, 0, 0))  # Taille initiale inconnue
+            _report_progress(task_id, 0, 0)  # Taille initiale inconnue
+            partial = PartialDownload(dest_path, url)
             for attempt in range(retries):
                 logger.debug(f"Début tentative {attempt + 1} pour télécharger {final_url}")
                 try:
-                    with requests.get(final_url, stream=True, headers={'User-Agent': 'Mozilla/5.0'}, timeout=30) as response:
+                    request_headers = {'User-Agent': 'Mozilla/5.0'}
+                    offset = partial.offset()
+                    if offset:
+                        # Reprendre après les octets déjà écrits (tentative précédente ou redémarrage)
+                        request_headers['Range'] = f"bytes={offset}-"
+                    with requests.get(final_url, stream=True, headers=request_headers, timeout=30) as response:
                         logger.debug(f"Réponse GET reçue, code: {response.status_code}")
                         response.raise_for_status()
-                        total_size = int(response.headers.get('content-length', 0))
+                        try:
+                            downloaded, total_size = partial.resume_response(response, offset)
+                        except RangesNotSupported as e:
+                            raise requests.ConnectionError(f"Reprise impossible ({e}), nouvelle tentative depuis le début")
+                        if downloaded:
+                            logger.info(f"Reprise du téléchargement 1fichier à {downloaded}/{total_size} octets")
                         logger.debug(f"Taille totale: {total_size} octets")
                         if isinstance(config.history, list):
                             for entry in config.history:
@@ -2226,60 +2279,57 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
                                         entry["total_size"] = total_size
                                         pass
                                         break
-                            progress_queues[task_id].put((task_id, 0, total_size))  # Mettre à jour la taille totale
+                            _report_progress(task_id, downloaded, total_size)  # Mettre à jour la taille totale
 
-                        downloaded = 0
                         chunk_size = 8192
                         last_update_time = time.time()
-                        last_downloaded = 0
+                        last_downloaded = downloaded
                         update_interval = 0.1  # Mettre à jour toutes les 0,1 secondes
                         download_canceled = False
-                        logger.debug(f"Ouverture fichier: {dest_path}")
-                        with open(dest_path, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=chunk_size):
-                                if cancel_ev is not None and cancel_ev.is_set():
-                                    logger.debug(f"Annulation détectée, arrêt du téléchargement 1fichier pour task_id={task_id}")
-                                    result[0] = False
-                                    result[1] = _("download_canceled") if _ else "Download canceled"
-                                    download_canceled = True
-                                    try:
-                                        f.close()
-                                    except Exception:
-                                        pass
-                                    try:
-                                        if os.path.exists(dest_path):
-                                            os.remove(dest_path)
-                                    except Exception:
-                                        pass
-                                    break
-                                if chunk:
-                                    f.write(chunk)
-                                    downloaded += len(chunk)
-                                    current_time = time.time()
-                                    if current_time - last_update_time >= update_interval:
-                                        with lock:
-                                            if isinstance(config.history, list):
-                                                for entry in config.history:
-                                                    if "url" in entry and entry["url"] == url and entry["status"] == "Downloading":
-                                                        progress_percent = int(downloaded / total_size * 100) if total_size > 0 else 0
-                                                        progress_percent = max(0, min(100, progress_percent))
-                                                        entry["progress"] = progress_percent
-                                                        entry["status"] = "Téléchargement"
-                                                        entry["downloaded_size"] = downloaded
-                                                        entry["total_size"] = total_size
-                                                        pass
-                                                        break
-                                        # Calcul de la vitesse en Mo/s
-                                        delta = downloaded - last_downloaded
-                                        speed = (delta / (current_time - last_update_time) / (1024 * 1024)) if (current_time - last_update_time) > 0 else 0.0
-                                        last_downloaded = downloaded
-                                        last_update_time = current_time
-                                        progress_queues[task_id].put((task_id, downloaded, total_size, speed))
+                        logger.debug(f"Écriture dans: {partial.part_path}")
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            if cancel_ev is not None and cancel_ev.is_set():
+                                logger.debug(f"Annulation détectée, arrêt du téléchargement 1fichier pour task_id={task_id}")
+                                result[0] = False
+                                result[1] = _("download_canceled") if _ else "Download canceled"
+                                download_canceled = True
+                                partial.discard()
+                                break
+                            if chunk:
+                                partial.write(chunk, downloaded)
+                                downloaded += len(chunk)
+                                current_time = time.time()
+                                if current_time - last_update_time >= update_interval:
+                                    with lock:
+                                        if isinstance(config.history, list):
+                                            for entry in config.history:
+                                                if "url" in entry and entry["url"] == url and entry["status"] == "Downloading":
+                                                    progress_percent = int(downloaded / total_size * 100) if total_size > 0 else 0
+                                                    progress_percent = max(0, min(100, progress_percent))
+                                                    entry["progress"] = progress_percent
+                                                    entry["status"] = "Téléchargement"
+                                                    entry["downloaded_size"] = downloaded
+                                                    entry["total_size"] = total_size
+                                                    pass
+                                                    break
+                                    # Calcul de la vitesse en Mo/s
+                                    delta = downloaded - last_downloaded
+                                    speed = (delta / (current_time - last_update_time) / (1024 * 1024)) if (current_time - last_update_time) > 0 else 0.0
+                                    last_downloaded = downloaded
+                                    last_update_time = current_time
+                                    _report_progress(task_id, downloaded, total_size, speed)
+
+                        # Flux coupé avant la fin : nouvelle tentative à partir des octets reçus
+                        if (not download_canceled and total_size and downloaded < total_size
+                                and not response.headers.get('content-encoding')):
+                            raise requests.ConnectionError(f"Téléchargement interrompu à {downloaded}/{total_size} octets")
 
                     # Si annulé, ne pas continuer avec extraction
                     if download_canceled:
                         return
 
+                    partial.complete()
+
                     # Déterminer si extraction est nécessaire
                     force_extract = is_zip_non_supported
                     if not force_extract:
@@ -2361,104 +2411,70 @@ async def download_from_1fichier(url, platform, game_name, is_zip_non_supported=
             result[1] = _("network_api_error").format(str(e))
 
         finally:
+            # Après un échec, le .part et son journal restent sur le disque pour la prochaine tentative
+            if partial is not None:
+                try:
+                    partial.close()
+                except OSError:
+                    pass
             logger.debug(f"Thread téléchargement 1fichier terminé pour {url}, task_id={task_id}")
-            progress_queues[task_id].put((task_id, result[0], result[1]))
-            logger.debug(f"Résultat final envoyé à la queue: success={result[0]}, message={result[1]}, task_id={task_id}")
+            _report_progress(task_id, result[0], result[1])
+            logger.debug(f"Résultat final envoyé: success={result[0]}, message={result[1]}, task_id={task_id}")
             # Nettoyer l'URL du set en cours de téléchargement
             with urls_lock:
                 urls_in_progress.discard(url)
                 logger.debug(f"URL supprimée du set des téléchargements en cours (finally): {url} (URLs restantes: {len(urls_in_progress)})")
 
+    def on_progress(*data):
+        """Événements du thread : (downloaded, total[, speed]) puis (success, message) à la fin."""
+        if isinstance(data[0], bool):  # Fin du téléchargement
+            success, message = data
+            if isinstance(config.history, list):
+                for entry in config.history:
+                    if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement", "Extracting"]:
+                        entry["status"] = "Download_OK" if success else "Erreur"
+                        entry["progress"] = 100 if success else 0
+                        entry["message"] = message
+                        save_history(config.history)
+                        # Marquer le jeu comme téléchargé si succès
+                        if success:
+                            logger.debug(f"[1F] Marking game as downloaded: platform={platform}, game={game_name}")
+                            from .history import mark_game_as_downloaded
+                            file_size = entry.get("size", "N/A")
+                            mark_game_as_downloaded(platform, game_name, file_size)
+                        logger.debug(f"Mise à jour finale historique: status={entry['status']}, progress={entry['progress']}%, message={message}, task_id={task_id}")
+                        break
+            return
+
+        if len(data) >= 3:
+            downloaded, total_size, speed = data[0], data[1], data[2]
+        else:
+            downloaded, total_size = data[0], data[1]
+            speed = 0.0
+        progress_percent = int(downloaded / total_size * 100) if total_size > 0 else 0
+        progress_percent = max(0, min(100, progress_percent))
+
+        if isinstance(config.history, list):
+            for entry in config.history:
+                if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement"]:
+                    entry["progress"] = progress_percent
+                    entry["status"] = "Téléchargement"
+                    entry["downloaded_size"] = downloaded
+                    entry["total_size"] = total_size
+                    entry["speed"] = speed  # Ajout de la vitesse
+                    break
+
+    progress_callbacks[task_id] = on_progress
     logger.debug(f"Démarrage thread pour {url}, task_id={task_id}")
     thread = threading.Thread(target=download_thread, daemon=True)
     download_threads[task_id] = thread
     thread.start()
 
-    # Boucle principale pour mettre à jour la progression
-    logger.debug(f"Début boucle de progression pour task_id={task_id}")
-    while thread.is_alive():
-        try:
-            task_queue = progress_queues.get(task_id)
-            if task_queue:
-                while not task_queue.empty():
-                    data = task_queue.get()
-                    #logger.debug(f"Données queue progression reçues: {data}")
-                    if isinstance(data[1], bool):  # Fin du téléchargement
-                        success, message = data[1], data[2]
-                        if isinstance(config.history, list):
-                            for entry in config.history:
-                                if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement", "Extracting"]:
-                                    entry["status"] = "Download_OK" if success else "Erreur"
-                                    entry["progress"] = 100 if success else 0
-                                    entry["message"] = message
-                                    save_history(config.history)
-                                    # Marquer le jeu comme téléchargé si succès
-                                    if success:
-                                        logger.debug(f"[1F_WHILE_LOOP] Marking game as downloaded: platform={platform}, game={game_name}")
-                                        from .history import mark_game_as_downloaded
-                                        file_size = entry.get("size", "N/A")
-                                        mark_game_as_downloaded(platform, game_name, file_size)
-                                    pass
-                                    logger.debug(f"Mise à jour finale historique: status={entry['status']}, progress={entry['progress']}%, message={message}, task_id={task_id}")
-                                    break
-                    else:
-                        if len(data) >= 4:
-                            downloaded, total_size, speed = data[1], data[2], data[3]
-                        else:
-                            downloaded, total_size = data[1], data[2]
-                            speed = 0.0
-                        progress_percent = int(downloaded / total_size * 100) if total_size > 0 else 0
-                        progress_percent = max(0, min(100, progress_percent))
-
-                        if isinstance(config.history, list):
-                            for entry in config.history:
-                                if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement"]:
-                                    entry["progress"] = progress_percent
-                                    entry["status"] = "Téléchargement"
-                                    entry["downloaded_size"] = downloaded
-                                    entry["total_size"] = total_size
-                                    entry["speed"] = speed  # Ajout de la vitesse
-                                    pass
-                                    break
-            await asyncio.sleep(0.1)
-        except Exception as e:
-            logger.error(f"Erreur mise à jour progression: {str(e)}")
-
-    logger.debug(f"Fin boucle de progression, attente fin thread pour task_id={task_id}")
+    # La progression arrive par on_progress : il n'y a plus qu'à attendre la fin du thread.
+    # Cette coroutine tourne déjà dans un thread de l'ordonnanceur (run_download_job) : attente directe
     thread.join()
-    try:
-        download_threads.pop(task_id, None)
-    except Exception:
-        pass
-    logger.debug(f"Thread terminé, nettoyage queue pour task_id={task_id}")
-    # Drain any remaining final message to ensure history is saved
-    try:
-        task_queue = progress_queues.get(task_id)
-        if task_queue:
-            while not task_queue.empty():
-                data = task_queue.get()
-                if isinstance(data[1], bool):
-                    success, message = data[1], data[2]
-                    logger.debug(f"[1F_DRAIN_QUEUE] Processing final message: success={success}, message={message[:100] if message else 'None'}")
-                    if isinstance(config.history, list):
-                        for entry in config.history:
-                            if "url" in entry and entry["url"] == url and entry["status"] in ["Downloading", "Téléchargement", "Extracting"]:
-                                entry["status"] = "Download_OK" if success else "Erreur"
-                                entry["progress"] = 100 if success else 0
-                                entry["message"] = message
-                                save_history(config.history)
-                                # Marquer le jeu comme téléchargé si succès
-                                if success:
-                                    logger.debug(f"[1F_DRAIN_QUEUE] Marking game as downloaded: platform={platform}, game={game_name}")
-                                    from .history import mark_game_as_downloaded
-                                    file_size = entry.get("size", "N/A")
-                                    mark_game_as_downloaded(platform, game_name, file_size)
-                                break
-    except Exception as e:
-        logger.error(f"[1F_DRAIN_QUEUE] Error processing final message: {e}")
-    # Nettoyer la queue
-    if task_id in progress_queues:
-        del progress_queues[task_id]
+    download_threads.pop(task_id, None)
+    progress_callbacks.pop(task_id, None)
     cancel_events.pop(task_id, None)
     logger.debug(f"Fin download_from_1fichier, résultat: success={result[0]}, message={result[1]}")
 
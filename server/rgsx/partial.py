@@ -0,0 +1,263 @@
+"""Téléchargements partiels reprenables.
+
+Un téléchargement en cours s'écrit dans `<destination>.part`, accompagné d'un
+journal `<destination>.part.json` qui liste les plages d'octets déjà écrites
+(ainsi que l'URL, la taille, l'ETag et le Last-Modified de la réponse). Après
+un échec, une annulation du conteneur ou un redémarrage, une nouvelle tentative
+relit le journal et ne redemande que les plages manquantes par requêtes Range ;
+si le fichier distant a changé (taille ou validateurs différents), on repart de
+zéro. Le journal n'est réécrit qu'après un fsync du fichier .part : une plage
+journalisée est donc toujours réellement sur le disque.
+
+Le fichier .part n'est renommé vers sa destination qu'une fois complet.
+"""
+import os
+import re
+import json
+import time
+import threading
+import logging
+from typing import List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+
+
+class RangesNotSupported(Exception):
+    pass
+
+
+def preallocate(fd: int, size: int):
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+def resumed_from(response: requests.Response, offset: int) -> Tuple[int, int]:
+    """(position de départ, taille totale) de la réponse à une requête « Range: bytes=offset- ».
+
+    Une réponse 200 repart du début ; une 206 qui ne commence pas à `offset`
+    lève RangesNotSupported."""
+    if response.status_code == 206:
+        match = re.match(r"bytes (\d+)-\d+/(\d+)", response.headers.get("content-range", ""))
+        if not match or int(match.group(1)) != offset:
+            raise RangesNotSupported(f"Content-Range inattendu: {response.headers.get('content-range')!r}")
+        return offset, int(match.group(2))
+    return 0, int(response.headers.get("content-length", 0) or 0)
+
+
+def merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    """Fusionne des plages [début, fin) qui se chevauchent ou se touchent."""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class PartialDownload:
+    def __init__(self, dest_path: str, url: str, flush_interval: float = 2.0):
+        self.dest_path = dest_path
+        self.part_path = dest_path + ".part"
+        self.journal_path = self.part_path + ".json"
+        self.url = url
+        self.flush_interval = flush_interval
+        self.size = 0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.ranges: List[List[int]] = []
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.load()
+
+    # --- Journal ---
+
+    def load(self):
+        """Relit le journal d'une tentative précédente pour la même URL."""
+        self.ranges = []
+        if not os.path.exists(self.part_path) or not os.path.exists(self.journal_path):
+            return
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != JOURNAL_VERSION or data.get("url") != self.url:
+                return
+            part_size = os.path.getsize(self.part_path)
+            self.size = int(data.get("size") or 0)
+            self.etag = data.get("etag")
+            self.last_modified = data.get("last_modified")
+            # Ne garder que ce que le fichier .part contient réellement
+            self.ranges = [[start, min(end, part_size)] for start, end in merge_ranges(data.get("ranges", []))
+                           if start < min(end, part_size)]
+        except Exception as e:
+            logger.warning(f"Journal de reprise illisible, téléchargement repris de zéro: {self.journal_path} ({e})")
+            self.ranges = []
+
+    def flush(self, force: bool = False):
+        """fsync du .part puis réécriture atomique du journal (au plus toutes les flush_interval s)."""
+        if not force and time.monotonic() - self._last_flush < self.flush_interval:
+            return
+        if not self._flush_lock.acquire(blocking=force):
+            return  # Un autre segment est déjà en train de journaliser
+        try:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                # Copie prise AVANT le fsync : tout ce qu'elle décrit est déjà écrit
+                payload = {"version": JOURNAL_VERSION, "url": self.url, "size": self.size, "etag": self.etag,
+                           "last_modified": self.last_modified, "ranges": [list(r) for r in self.ranges]}
+                fd = self._fd
+            if fd is not None:
+                os.fsync(fd)
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self.journal_path)
+        except OSError as e:
+            logger.debug(f"Impossible d'écrire le journal de reprise {self.journal_path}: {e}")
+        finally:
+            self._flush_lock.release()
+
+    # --- État ---
+
+    @property
+    def done(self) -> int:
+        with self._lock:
+            return sum(end - start for start, end in self.ranges)
+
+    def offset(self) -> int:
+        """Fin de la plage continue depuis le début du fichier (reprise en un seul flux)."""
+        with self._lock:
+            return self.ranges[0][1] if self.ranges and self.ranges[0][0] == 0 else 0
+
+    def missing(self) -> List[Tuple[int, int]]:
+        """Plages restant à télécharger, (début, fin incluse)."""
+        gaps, pos = [], 0
+        with self._lock:
+            for start, end in self.ranges:
+                if start > pos:
+                    gaps.append((pos, start - 1))
+                pos = max(pos, end)
+        if pos < self.size:
+            gaps.append((pos, self.size - 1))
+        return gaps
+
+    def prepare(self, size: int, etag: Optional[str] = None, last_modified: Optional[str] = None) -> int:
+        """Associe le téléchargement à la réponse du serveur et ouvre le .part.
+
+        Les plages journalisées sont conservées si la taille et les validateurs
+        correspondent, sinon on repart de zéro. Renvoie le nombre d'octets déjà présents."""
+        # Une taille journalisée nulle est inconnue (fichier adopté, Content-Length absent)
+        changed = ((self.size and size != self.size)
+                   or (etag and self.etag and etag != self.etag)
+                   or (last_modified and self.last_modified and last_modified != self.last_modified))
+        if self.ranges and changed:
+            logger.info(f"Fichier distant modifié depuis la tentative précédente, reprise impossible: {self.dest_path}")
+            self.ranges = []
+        self.size, self.etag, self.last_modified = size, etag, last_modified
+        if self._fd is None:
+            self._fd = os.open(self.part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if not self.ranges:
+            os.ftruncate(self._fd, 0)
+            if size:
+                preallocate(self._fd, size)
+        self.flush(force=True)
+        return self.done
+
+    def resume_response(self, response: requests.Response, offset: int) -> Tuple[int, int]:
+        """Prépare le .part pour la réponse à une requête « Range: bytes=offset- » (sans Range
+        si offset vaut 0) et renvoie (position où écrire le corps, taille totale).
+
+        Lève RangesNotSupported, après avoir oublié les plages terminées, si la
+        réponse partielle ne peut pas prolonger le .part."""
+        try:
+            start, total = resumed_from(response, offset)
+            self.prepare(total, response.headers.get("etag"), response.headers.get("last-modified"))
+            if start and self.offset() < start:
+                raise RangesNotSupported("fichier distant modifié depuis la tentative précédente")
+        except RangesNotSupported:
+            self.reset()
+            raise
+        if not start and self.done:
+            # Réponse complète (200) : le serveur ignore la plage demandée
+            self.reset()
+        return start, total
+
+    def adopt(self) -> int:
+        """Reprend un fichier de destination incomplet laissé par une version sans .part :
+        ses octets deviennent la première plage terminée."""
+        local_size = os.path.getsize(self.dest_path)
+        os.replace(self.dest_path, self.part_path)
+        self.ranges = [[0, local_size]] if local_size else []
+        self.size = 0
+        self.flush(force=True)
+        return local_size
+
+    def reset(self):
+        """Oublie les plages terminées (le serveur ne permet pas de reprendre)."""
+        with self._lock:
+            self.ranges = []
+        if self._fd is not None:
+            os.ftruncate(self._fd, 0)
+            if self.size:
+                preallocate(self._fd, self.size)
+        self.flush(force=True)
+
+    # --- Écriture ---
+
+    def write(self, data: bytes, pos: int):
+        os.pwrite(self._fd, data, pos)
+        with self._lock:
+            ranges = self.ranges
+            # Cas courant : prolongement de la plage qui se termine à `pos`
+            for r in ranges:
+                if r[1] == pos:
+                    r[1] += len(data)
+                    break
+            else:
+                ranges.append([pos, pos + len(data)])
+            self.ranges = merge_ranges(ranges)
+        self.flush()
+
+    def close(self):
+        """Ferme le .part en gardant le journal pour une reprise ultérieure."""
+        if self._fd is None:
+            return
+        self.flush(force=True)
+        os.close(self._fd)
+        self._fd = None
+
+    def complete(self):
+        """Renomme le .part complet vers sa destination et supprime le journal."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        os.replace(self.part_path, self.dest_path)
+        self._remove(self.journal_path)
+
+    def discard(self):
+        """Supprime le .part et son journal (téléchargement annulé)."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._remove(self.part_path)
+        self._remove(self.journal_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug(f"Impossible de supprimer {path}: {e}")
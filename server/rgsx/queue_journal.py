@@ -0,0 +1,136 @@
+"""Journal persistant de la file de téléchargements.
+
+Chaque événement de l'ordonnanceur est ajouté, une ligne JSON par événement,
+à SAVE_FOLDER/download_queue.jsonl : soumission (avec la tâche complète),
+démarrage, fin et annulation. Rien n'est réécrit à chaque événement : un ajout
+en fin de fichier suivi d'un fsync suffit, et une ligne tronquée par un arrêt
+brutal est simplement ignorée à la relecture.
+
+Au démarrage, replay() rend les tâches qui n'ont ni fin ni annulation : celles
+qui attendaient encore, et celles qui tournaient quand le serveur s'est arrêté,
+marquées « interrupted » (elles reprennent grâce aux fichiers .part). Le
+journal est alors compacté pour ne garder que ces tâches, et l'est de nouveau
+dès qu'il accumule trop d'événements de tâches terminées.
+"""
+import os
+import json
+import time
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Champs recalculés par l'ordonnanceur, inutiles dans le journal
+_DERIVED_FIELDS = ("seq", "host", "started_at")
+
+
+class QueueJournal:
+    def __init__(self, path: str, compact_every: int = 500):
+        self.path = path
+        self.compact_every = compact_every
+        # task_id -> tâche, dans l'ordre de soumission ; "interrupted" si démarrée
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lines = 0
+        self._file = None
+        # Après close(), les événements tardifs (fin d'une tâche après l'arrêt) sont ignorés
+        self._closed = False
+        self._lock = threading.Lock()
+
+    # --- Relecture ---
+
+    def replay(self) -> List[Dict[str, Any]]:
+        """Tâches non terminées du journal, dans l'ordre de soumission. Compacte le journal."""
+        jobs: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for number, line in enumerate(f, start=1):
+                    try:
+                        record = json.loads(line)
+                        event, task_id = record["event"], record["task_id"]
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"Ligne {number} illisible ignorée dans {self.path}")
+                        continue
+                    self._apply(jobs, event, task_id, record.get("job"))
+        with self._lock:
+            self._jobs = jobs
+            self._closed = False
+            self._rewrite()
+        return [dict(job) for job in jobs.values()]
+
+    @staticmethod
+    def _apply(jobs: Dict[str, Dict[str, Any]], event: str, task_id: str, job: Optional[Dict[str, Any]]):
+        if event == "submit" and job is not None:
+            jobs[task_id] = dict(job, interrupted=False)
+        elif event == "start" and task_id in jobs:
+            jobs[task_id]["interrupted"] = True
+        elif event in ("done", "cancel"):
+            jobs.pop(task_id, None)
+
+    # --- Écriture ---
+
+    def submit(self, job: Dict[str, Any]):
+        record = {k: v for k, v in job.items() if k not in _DERIVED_FIELDS and k != "interrupted"}
+        self._append("submit", job["task_id"], job=record)
+
+    def start(self, task_id: str):
+        self._append("start", task_id)
+
+    def done(self, task_id: str):
+        self._append("done", task_id)
+
+    def cancel(self, task_id: str):
+        self._append("cancel", task_id)
+
+    def _append(self, event: str, task_id: str, job: Optional[Dict[str, Any]] = None):
+        record = {"event": event, "task_id": task_id, "at": time.time()}
+        if job is not None:
+            record["job"] = job
+        with self._lock:
+            if self._closed:
+                return
+            self._apply(self._jobs, event, task_id, job)
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._lines += 1
+            except OSError as e:
+                logger.error(f"Impossible d'écrire dans le journal de la file {self.path}: {e}")
+                return
+            if self._lines >= self.compact_every and self._lines > 4 * len(self._jobs):
+                self._rewrite()
+
+    def _rewrite(self):
+        """Réécrit atomiquement le journal avec les seules tâches en cours (appelé sous le verrou)."""
+        lines = []
+        for task_id, job in self._jobs.items():
+            record = {k: v for k, v in job.items() if k != "interrupted"}
+            lines.append({"event": "submit", "task_id": task_id, "at": time.time(), "job": record})
+            if job.get("interrupted"):
+                lines.append({"event": "start", "task_id": task_id, "at": time.time()})
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for line in lines:
+                    f.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(tmp_path, self.path)
+            self._lines = len(lines)
+        except OSError as e:
+            logger.error(f"Impossible de compacter le journal de la file {self.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,222 @@
+"""Ordonnanceur de la file de téléchargements.
+
+Remplace la boucle de scrutation de l'ancien download_queue_worker : submit()
+réveille le répartiteur par une variable de condition et une tâche démarre dès
+qu'un créneau est libre, globalement (max_concurrent) et pour son hôte
+(max_per_host, ou la limite propre à l'hôte, ex. 1fichier en mode gratuit).
+
+Ordre de démarrage : priorité décroissante, puis équité entre plateformes (la
+plateforme qui a le moins de téléchargements en cours passe d'abord, un lot
+d'une nuit ne monopolise donc pas les créneaux), puis ordre d'arrivée. Une
+tâche dont l'hôte est saturé ne bloque pas celles qui la suivent.
+
+Avec un QueueJournal, chaque soumission, démarrage, fin et annulation est
+journalisé sur disque, et restore() remet en file au démarrage les tâches
+laissées par l'arrêt précédent.
+"""
+import time
+import threading
+import logging
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from .queue_journal import QueueJournal
+
+logger = logging.getLogger(__name__)
+
+
+def parse_host_limits(value: str) -> Dict[str, int]:
+    """"1fichier.com=1,archive.org=2" -> {"1fichier.com": 1, "archive.org": 2}"""
+    limits = {}
+    for part in (value or "").split(","):
+        host, sep, limit = part.strip().partition("=")
+        if sep and host.strip():
+            try:
+                limits[host.strip().lower()] = max(1, int(limit))
+            except ValueError:
+                logger.warning(f"Limite d'hôte invalide ignorée : {part}")
+    return limits
+
+
+def job_host(url: str) -> str:
+    try:
+        return (urlparse(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class DownloadScheduler:
+    def __init__(self, runner: Callable[[Dict[str, Any]], Any], max_concurrent: int = 3, max_per_host: int = 2,
+                 host_limits: Optional[Dict[str, int]] = None, journal: Optional[QueueJournal] = None):
+        self.runner = runner
+        self.journal = journal
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_host = max(1, max_per_host)
+        self.host_limits = host_limits or {}
+        self._cond = threading.Condition()
+        self._pending: List[Dict[str, Any]] = []
+        self._running: Dict[str, Dict[str, Any]] = {}
+        self._per_host: Dict[str, int] = {}
+        self._per_group: Dict[str, int] = {}
+        self._seq = count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    # --- Limites ---
+
+    def host_limit(self, host: str) -> int:
+        """Limite propre à l'hôte ou à un domaine parent, sinon max_per_host."""
+        while host:
+            if host in self.host_limits:
+                return self.host_limits[host]
+            host = host.partition(".")[2]
+        return self.max_per_host
+
+    # --- File ---
+
+    def submit(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajoute une tâche (dict avec url, platform, game_name, task_id...) et réveille le répartiteur."""
+        job.setdefault("priority", 0)
+        job.setdefault("queued_at", time.time())
+        if self.journal is not None:
+            self.journal.submit(job)
+        return self._enqueue(job)
+
+    def _enqueue(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        job["host"] = job_host(job.get("url", ""))
+        with self._cond:
+            job["seq"] = next(self._seq)
+            self._pending.append(job)
+            self._cond.notify_all()
+        return job
+
+    def restore(self) -> List[Dict[str, Any]]:
+        """Remet en file les tâches du journal non terminées au dernier arrêt. Celles qui
+        tournaient alors (« interrupted ») passent devant les autres à priorité égale."""
+        if self.journal is None:
+            return []
+        jobs = self.journal.replay()
+        jobs.sort(key=lambda job: not job.get("interrupted"))
+        for job in jobs:
+            self._enqueue(job)
+        return jobs
+
+    def cancel(self, task_id: str) -> bool:
+        """Retire une tâche en attente ; False si elle n'est pas (ou plus) en attente."""
+        with self._cond:
+            for i, job in enumerate(self._pending):
+                if job.get("task_id") == task_id:
+                    del self._pending[i]
+                    break
+            else:
+                return False
+        if self.journal is not None:
+            self.journal.cancel(task_id)
+        return True
+
+    def clear(self) -> List[Dict[str, Any]]:
+        """Vide la file d'attente et renvoie les tâches retirées."""
+        with self._cond:
+            removed, self._pending = self._pending, []
+        if self.journal is not None:
+            for job in removed:
+                self.journal.cancel(job["task_id"])
+        return removed
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Tâches en attente, dans l'ordre où elles démarreraient sans nouvelle soumission."""
+        with self._cond:
+            return sorted(self._pending, key=self._order_key)
+
+    def running(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return list(self._running.values())
+
+    def is_active(self) -> bool:
+        with self._cond:
+            return bool(self._running or self._pending)
+
+    # --- Répartition ---
+
+    def _order_key(self, job: Dict[str, Any]):
+        return -job["priority"], self._per_group.get(job.get("platform", ""), 0), job["seq"]
+
+    def _next_job(self) -> Optional[Dict[str, Any]]:
+        """Prochaine tâche démarrable (appelé sous le verrou)."""
+        if len(self._running) >= self.max_concurrent:
+            return None
+        best = None
+        for job in self._pending:
+            host = job["host"]
+            if self._per_host.get(host, 0) >= self.host_limit(host):
+                continue
+            if best is None or self._order_key(job) < self._order_key(best):
+                best = job
+        return best
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._dispatch, name="download-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._thread = None
+            self._cond.notify_all()
+        if self.journal is not None:
+            self.journal.close()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    # Réveillé par submit() ou par la fin d'une tâche
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                self._pending.remove(job)
+                task_id = job["task_id"]
+                self._running[task_id] = job
+                self._per_host[job["host"]] = self._per_host.get(job["host"], 0) + 1
+                group = job.get("platform", "")
+                self._per_group[group] = self._per_group.get(group, 0) + 1
+                job["started_at"] = time.time()
+            if self.journal is not None:
+                self.journal.start(task_id)
+            logger.info(f"[QUEUE] Lancement du téléchargement: {job.get('game_name', '?')} ({job.get('url', '?')}), "
+                        f"{len(self._running)}/{self.max_concurrent} créneaux")
+            threading.Thread(target=self._run, args=(job,), name=f"download-{task_id}", daemon=True).start()
+
+    def _run(self, job: Dict[str, Any]):
+        try:
+            self.runner(job)
+        except Exception as e:
+            logger.error(f"[QUEUE] Échec du téléchargement {job.get('game_name', '?')}: {e}")
+        finally:
+            if self.journal is not None:
+                self.journal.done(job["task_id"])
+            with self._cond:
+                self._running.pop(job["task_id"], None)
+                host, group = job["host"], job.get("platform", "")
+                self._per_host[host] -= 1
+                if not self._per_host[host]:
+                    del self._per_host[host]
+                self._per_group[group] -= 1
+                if not self._per_group[group]:
+                    del self._per_group[group]
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"running": len(self._running), "pending": len(self._pending),
+                    "max_concurrent": self.max_concurrent, "max_per_host": self.max_per_host,
+                    "hosts": dict(self._per_host)}
@@ -0,0 +1,165 @@
+"""Téléchargement segmenté par requêtes Range.
+
+Des hôtes comme myrient ou archive.org brident le débit par connexion : un
+fichier volumineux est donc découpé en N plages d'octets téléchargées en
+parallèle, chacune écrite à sa position dans le fichier .part préalloué d'un
+PartialDownload. Une plage interrompue est reprise là où elle s'est arrêtée,
+avec quelques nouvelles tentatives ; seules les plages absentes du journal de
+reprise sont demandées, ce qui sert aussi à reprendre un téléchargement
+interrompu (avec un seul segment). Si le serveur ne respecte pas les plages
+(réponse 200 au lieu de 206), RangesNotSupported est levée et l'appelant
+repasse au téléchargement en un seul flux.
+"""
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+from .partial import PartialDownload, RangesNotSupported
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadCanceled(Exception):
+    pass
+
+
+def supports_ranges(response: requests.Response) -> bool:
+    """Vrai si la réponse annonce les plages d'octets sur un corps non encodé de taille connue."""
+    return (response.headers.get("accept-ranges", "").lower() == "bytes"
+            and not response.headers.get("content-encoding")
+            and int(response.headers.get("content-length", 0) or 0) > 0)
+
+
+def split_ranges(gaps: List[Tuple[int, int]], segments: int, min_segment: int = 1024 * 1024) -> List[Tuple[int, int]]:
+    """Découpe les plages manquantes (début, fin incluse) en environ `segments` morceaux,
+    répartis au prorata de leur taille et d'au moins `min_segment` octets."""
+    total = sum(end - start + 1 for start, end in gaps)
+    ranges = []
+    for start, end in gaps:
+        length = end - start + 1
+        count = max(1, min(round(segments * length / total), length // max(min_segment, 1)))
+        step = -(-length // count)
+        ranges.extend((pos, min(pos + step, end + 1) - 1) for pos in range(start, end + 1, step))
+    return ranges
+
+
+class SegmentedDownload:
+    def __init__(self, session: requests.Session, url: str, partial: PartialDownload, headers: Optional[dict] = None,
+                 segments: int = 4, retries: int = 5, timeout=30, chunk_size: int = 256 * 1024,
+                 cancel_event: Optional[threading.Event] = None,
+                 progress_callback: Optional[Callable[[int, int, float], None]] = None):
+        self.session = session
+        self.url = url
+        self.partial = partial
+        self.size = partial.size
+        self.headers = dict(headers or {})
+        # Les plages portent sur le corps brut : pas de compression
+        self.headers["Accept-Encoding"] = "identity"
+        self.segments = segments
+        self.retries = retries
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.cancel_event = cancel_event or threading.Event()
+        self.progress_callback = progress_callback
+        self.downloaded = partial.done
+        self._lock = threading.Lock()
+        self._last_report = 0.0
+        self._last_downloaded = 0
+
+    def run(self):
+        """Télécharge les plages manquantes du .part préparé. Lève RangesNotSupported,
+        DownloadCanceled ou l'erreur de la dernière tentative d'une plage."""
+        ranges = split_ranges(self.partial.missing(), self.segments)
+        failed = threading.Event()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(len(ranges), self.segments)),
+                                    thread_name_prefix="segment") as pool:
+                futures = [pool.submit(self._fetch_range, start, end, failed) for start, end in ranges]
+            errors = [e for e in (future.exception() for future in futures) if e is not None]
+            if errors:
+                for error in errors:
+                    if isinstance(error, (RangesNotSupported, DownloadCanceled)):
+                        raise error
+                raise errors[0]
+        finally:
+            self.partial.flush(force=True)
+        self._report(force=True)
+
+    def _fetch_range(self, start: int, end: int, failed: threading.Event):
+        try:
+            self._fetch(start, end, failed)
+        except Exception:
+            # Arrêter les autres plages dès le premier échec définitif, sans attendre
+            # que les plages soumises avant celle-ci se terminent
+            failed.set()
+            raise
+
+    def _fetch(self, start: int, end: int, failed: threading.Event):
+        pos = start
+        attempt = 0
+        while pos <= end:
+            if self.cancel_event.is_set():
+                raise DownloadCanceled()
+            if failed.is_set():
+                return
+            headers = dict(self.headers, Range=f"bytes={pos}-{end}")
+            try:
+                with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise RangesNotSupported(f"HTTP {response.status_code} pour bytes={pos}-{end}")
+                    content_range = response.headers.get("content-range", "")
+                    if not content_range.startswith(f"bytes {pos}-"):
+                        raise RangesNotSupported(f"Content-Range inattendu: {content_range!r}")
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if self.cancel_event.is_set():
+                            raise DownloadCanceled()
+                        if failed.is_set():
+                            return
+                        if not chunk:
+                            continue
+                        chunk = chunk[:end + 1 - pos]
+                        self.partial.write(chunk, pos)
+                        pos += len(chunk)
+                        self._advance(len(chunk))
+                        if pos > end:
+                            break
+                if pos <= end:
+                    raise requests.ConnectionError(f"Plage {start}-{end} interrompue à {pos}")
+            except (RangesNotSupported, DownloadCanceled):
+                raise
+            except (requests.RequestException, OSError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                delay = min(2 ** attempt, 30)
+                logger.debug(f"Plage {start}-{end} : tentative {attempt}/{self.retries} dans {delay}s ({e})")
+                # Attente interrompue par une annulation ou l'échec d'une autre plage
+                deadline = time.monotonic() + delay
+                while not failed.is_set() and not self.cancel_event.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cancel_event.wait(min(0.5, remaining))
+
+    def _advance(self, n: int):
+        with self._lock:
+            self.downloaded += n
+        self._report()
+
+    def _report(self, force: bool = False):
+        if self.progress_callback is None:
+            return
+        with self._lock:
+            now = time.time()
+            elapsed = now - self._last_report
+            if not force and elapsed < 0.1:
+                return
+            speed = (self.downloaded - self._last_downloaded) / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+            self._last_report = now
+            self._last_downloaded = self.downloaded
+            downloaded = self.downloaded
+        self.progress_callback(downloaded, self.size, speed)
@@ -28,9 +28,11 @@ import random
 from . import config
 from .history import save_history
 from .language import _
+from .catalog import GameTuples, get_catalog, count_games, generate_metadata
 from datetime import datetime
 import sys
 import tempfile
+import urllib.parse
 
 
 logger = logging.getLogger(__name__)
@@ -720,6 +722,20 @@ def check_extension_before_download(url, platform, game_name):
         logger.error(f"Erreur vérification extension {url}: {str(e)}")
         return None
 
+def catalog_game_name(platform, url):
+    """Nom du jeu tel qu'il figure dans le catalogue de la plateforme pour cette URL, sinon le nom de fichier de l'URL."""
+    try:
+        game_file = _find_games_file(platform)
+        if game_file:
+            games = get_catalog(game_file).games
+            index = games.find_url(url)
+            if index is not None and os.path.splitext(games.name(index))[1]:
+                return games.name(index)
+    except Exception as e:
+        logger.debug(f"Recherche de {url} dans le catalogue {platform} impossible: {e}")
+    name = urllib.parse.unquote(url.split("?", 1)[0].rsplit("/", 1)[-1])
+    return name if os.path.splitext(name)[1] else None
+
 # Fonction pour vérifier si l'extension est supportée pour une plateforme donnée
 def is_extension_supported(filename, platform_key, extensions_data):
     """Vérifie si l'extension du fichier est supportée pour la plateforme donnée.
@@ -889,82 +905,56 @@ def load_sources():
             config.platform_dict_by_name = {}
         config.games_count = {}
         for platform_name in config.platforms:
-            games = load_games(platform_name)
-            config.games_count[platform_name] = len(games)
+            game_file = _find_games_file(platform_name)
+            try:
+                config.games_count[platform_name] = count_games(game_file) if game_file else 0
+            except Exception as e:
+                logger.error(f"Erreur comptage des jeux pour {platform_name}: {e}")
+                config.games_count[platform_name] = 0
         return sources
     except Exception as e:
         logger.error(f"Erreur fusion systèmes + détection jeux: {e}")
         return []
 
+def _find_games_file(platform_id):
+    """Retourne le fichier JSON de jeux d'une plateforme (nom exact, normalisé ou dossier), ou None."""
+    # Retrouver l'objet plateforme pour accéder éventuellement à 'folder'
+    platform_dict = None
+    for pd in config.platform_dicts:
+        if pd.get("platform_name") == platform_id or pd.get("platform") == platform_id:
+            platform_dict = pd
+            break
+
+    candidates = []
+    # 1. Nom exact
+    candidates.append(os.path.join(config.GAMES_FOLDER, f"{platform_id}.json"))
+    # 2. Nom normalisé
+    norm = normalize_platform_name(platform_id)
+    if norm and norm != platform_id:
+        candidates.append(os.path.join(config.GAMES_FOLDER, f"{norm}.json"))
+    # 3. Folder déclaré
+    if platform_dict:
+        folder_name = platform_dict.get("folder")
+        if folder_name:
+            candidates.append(os.path.join(config.GAMES_FOLDER, f"{folder_name}.json"))
+
+    for c in candidates:
+        if os.path.exists(c):
+            return c
+    logger.warning(f"Aucun fichier de jeux trouvé pour {platform_id} (candidats: {candidates})")
+    return None
+
 def load_games(platform_id):
+    """Retourne la séquence (name, url, size) des jeux d'une plateforme.
+    Les catalogues parsés sont partagés via le cache LRU de catalog.py (invalidé par mtime)
+    et stockés en colonnes; les tuples sont reconstruits à l'accès."""
     try:
-        # Retrouver l'objet plateforme pour accéder éventuellement à 'folder'
-        platform_dict = None
-        for pd in config.platform_dicts:
-            if pd.get("platform_name") == platform_id or pd.get("platform") == platform_id:
-                platform_dict = pd
-                break
-
-        candidates = []
-        # 1. Nom exact
-        candidates.append(os.path.join(config.GAMES_FOLDER, f"{platform_id}.json"))
-        # 2. Nom normalisé
-        norm = normalize_platform_name(platform_id)
-        if norm and norm != platform_id:
-            candidates.append(os.path.join(config.GAMES_FOLDER, f"{norm}.json"))
-        # 3. Folder déclaré
-        if platform_dict:
-            folder_name = platform_dict.get("folder")
-            if folder_name:
-                candidates.append(os.path.join(config.GAMES_FOLDER, f"{folder_name}.json"))
-
-        game_file = None
-        for c in candidates:
-            if os.path.exists(c):
-                game_file = c
-                break
+        game_file = _find_games_file(platform_id)
         if not game_file:
-            logger.warning(f"Aucun fichier de jeux trouvé pour {platform_id} (candidats: {candidates})")
             return []
-
-        with open(game_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        # Si dict avec clé 'games'
-        if isinstance(data, dict) and 'games' in data:
-            data = data['games']
-
-        normalized = []  # (name, url, size)
-
-        def extract_from_dict(d):
-            name = d.get('game_name') or d.get('name') or d.get('title') or d.get('game')
-            url = d.get('url') or d.get('download') or d.get('link') or d.get('href')
-            size = d.get('size') or d.get('filesize') or d.get('length')
-            if name:
-                normalized.append((str(name), url if isinstance(url, str) and url.strip() else None, str(size) if size else None))
-
-        if isinstance(data, list):
-            for item in data:
-                if isinstance(item, (list, tuple)):
-                    if len(item) == 0:
-                        continue
-                    name = str(item[0])
-                    url = item[1] if len(item) > 1 and isinstance(item[1], str) and item[1].strip() else None
-                    size = item[2] if len(item) > 2 and isinstance(item[2], str) and item[2].strip() else None
-                    normalized.append((name, url, size))
-                elif isinstance(item, dict):
-                    extract_from_dict(item)
-                elif isinstance(item, str):
-                    normalized.append((item, None, None))
-                #else:
-                    normalized.append((str(item), None, None))
-        elif isinstance(data, dict):  # dict sans 'games'
-            extract_from_dict(data)
-        #else:
-            logger.warning(f"Format de fichier jeux inattendu pour {platform_id}: {type(data)}")
-
-        logger.debug(f"{os.path.basename(game_file)}: {len(normalized)} jeux")
-        return normalized
+        games = GameTuples(get_catalog(game_file).games)
+        logger.debug(f"{os.path.basename(game_file)}: {len(games)} jeux")
+        return games
     except Exception as e:
         logger.error(f"Erreur lors du chargement des jeux pour {platform_id}: {e}")
         return []
@@ -1147,6 +1137,8 @@ def extract_data(zip_path, dest_dir, url):
     """Extrait le contenu de ZIP de DATA dans le dossier config.SAVE_FOLDER sans progression a l'ecran"""
     logger.debug(f"Extraction de {zip_path} dans {dest_dir}")
     try:
+        games_folder = os.path.abspath(config.GAMES_FOLDER)
+        extracted_catalogs = []
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
             zip_ref.testzip()  # Vérifier l'intégrité de l'archive
             for info in zip_ref.infolist():
@@ -1156,7 +1148,13 @@ def extract_data(zip_path, dest_dir, url):
                 os.makedirs(os.path.dirname(file_path), exist_ok=True)
                 with zip_ref.open(info) as source, open(file_path, 'wb') as dest:
                     shutil.copyfileobj(source, dest)
+                if file_path.lower().endswith('.json') and os.path.dirname(os.path.abspath(file_path)) == games_folder:
+                    extracted_catalogs.append(file_path)
         logger.info(f"Extraction terminée de {zip_path}")
+        # Sidecars de métadonnées: load_sources lit les comptes sans reparser chaque catalogue
+        if extracted_catalogs:
+            written = generate_metadata(config.GAMES_FOLDER, extracted_catalogs)
+            logger.info(f"Métadonnées générées pour {written}/{len(extracted_catalogs)} catalogues")
         return True, "Extraction terminée avec succès"
     except zipfile.BadZipFile as e:
         logger.error(f"Erreur: Archive ZIP corrompue: {str(e)}")
@@ -0,0 +1,448 @@
+"""ROM streaming for /api/rom: byte ranges, read-ahead and stream limits.
+
+Browser emulators read large CHD/ISO images with Range requests, so a ROM is
+answered with 206 Partial Content for a single byte range, 416 when the range
+lies beyond the file, and the whole file when there is no usable Range or the
+If-Range validator is stale. Several ranges in one request are answered with
+the whole file, which HTTP allows and which avoids multipart bodies that
+emulators do not read anyway.
+
+The body is read in chunks in a worker thread, the next chunk being read while
+the current one is sent, with posix_fadvise read-ahead so the disk stays ahead
+of the socket. Servers that advertise the ASGI "http.response.zerocopysend" or
+"http.response.pathsend" extensions are handed the file instead (the server
+then sends it with os.sendfile). Uvicorn advertises neither, so under uvicorn
+the chunked path is the one that runs.
+
+RomStreamer bounds the number of bodies streamed at once; a request waiting
+longer than `queue_timeout` for a slot gets 503 with Retry-After.
+
+With `unzip`, a .zip holding a single file is answered with that file
+decompressed, so emulators on weak devices do not download and inflate the
+whole archive. Stored entries are served from the archive bytes like any file.
+Compressed entries are inflated in fixed-size chunks kept in a small LRU, and
+the open decompressors are kept between requests, so a range request resumes
+from the nearest decompressor behind it instead of from the start of the entry.
+"""
+import os
+import struct
+import asyncio
+import logging
+import zipfile
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from lrucache import ByteLRU
+
+logger = logging.getLogger("retro-api")
+
+ZEROCOPY = "http.response.zerocopysend"
+PATHSEND = "http.response.pathsend"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(value: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single-range `bytes=` header, None when the
+    whole file should be sent (no, malformed or multiple ranges)."""
+    if not value:
+        return None
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if start >= size:
+                raise RangeNotSatisfiable()
+            if end < start:
+                return None
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def file_etag(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def if_range_matches(if_range: Optional[str], etag: str, mtime: float) -> bool:
+    """Whether a Range may be honoured given the If-Range validator (RFC 9110 13.1.5)."""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(("W/", '"')):
+        # Strong comparison: a weak validator never matches
+        return if_range == etag
+    try:
+        return int(parsedate_to_datetime(if_range).timestamp()) == int(mtime)
+    except (TypeError, ValueError):
+        return False
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    size: int
+    crc: int
+    # Offset of the data in the archive for a stored entry, None when compressed
+    data_offset: Optional[int]
+
+
+def single_zip_entry(path: str) -> Optional[ZipEntry]:
+    """The only file of the archive at `path`, None when there are several,
+    it is encrypted or the archive cannot be read."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            infos = [i for i in zf.infolist() if not i.is_dir() and not i.filename.startswith("__MACOSX/")]
+            if len(infos) != 1 or infos[0].flag_bits & 0x1:
+                return None
+            info = infos[0]
+            data_offset = None
+            if info.compress_type == zipfile.ZIP_STORED:
+                with open(path, "rb") as f:
+                    f.seek(info.header_offset)
+                    header = f.read(zipfile.sizeFileHeader)
+                name_length, extra_length = struct.unpack("<HH", header[26:30])
+                data_offset = info.header_offset + zipfile.sizeFileHeader + name_length + extra_length
+            return ZipEntry(info.filename, info.file_size, info.CRC, data_offset)
+    except (OSError, zipfile.BadZipFile, NotImplementedError, struct.error):
+        return None
+
+
+class _EntryCursor:
+    """An open decompressor of a zip entry, positioned on a chunk boundary."""
+
+    def __init__(self, path: str, name: str):
+        self.zip = zipfile.ZipFile(path)
+        try:
+            self.file = self.zip.open(name)
+        except Exception:
+            self.zip.close()
+            raise
+        self.pos = 0
+
+    def close(self):
+        self.file.close()
+        self.zip.close()
+
+
+class RomStreamer:
+    def __init__(self, max_streams: int = 8, chunk_size: int = 1024 * 1024,
+                 read_ahead: int = 8 * 1024 * 1024, queue_timeout: float = 10.0, zero_copy: bool = True,
+                 zip_chunk_size: int = 256 * 1024, zip_cache_bytes: int = 32 * 1024 * 1024, zip_cursors: int = 4):
+        self.max_streams = max_streams
+        self.chunk_size = chunk_size
+        self.read_ahead = read_ahead
+        self.queue_timeout = queue_timeout
+        self.zero_copy = zero_copy
+        self.zip_chunk_size = zip_chunk_size
+        self.zip_cursors = zip_cursors
+        self.chunks = ByteLRU(zip_cache_bytes)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._entries: "OrderedDict[Tuple[str, int, int], Optional[ZipEntry]]" = OrderedDict()
+        self._cursors: List[Tuple[Tuple, _EntryCursor]] = []
+        self._lock = threading.Lock()
+
+    def response(self, path: str, st: Optional[os.stat_result] = None, media_type: Optional[str] = None,
+                 unzip: bool = False) -> Response:
+        """Response for the ROM at `path`; with `unzip`, the file inside a
+        single-file .zip (other archives are sent as they are). Blocking."""
+        st = st or os.stat(path)
+        if unzip and path.lower().endswith(".zip"):
+            entry = self.zip_entry(path, st)
+            if entry is not None:
+                return ZipEntryResponse(self, path, st, entry)
+        return RomStreamResponse(self, path, st, media_type)
+
+    def zip_entry(self, path: str, st: os.stat_result) -> Optional[ZipEntry]:
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        entry = single_zip_entry(path)
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > 1024:
+                self._entries.popitem(last=False)
+        return entry
+
+    def entry_chunk(self, path: str, st: os.stat_result, name: str, index: int) -> bytes:
+        """Chunk `index` of the decompressed entry `name` (blocking)."""
+        key = (path, st.st_mtime_ns, st.st_size, name)
+        chunk = self.chunks.get(key + (index,))
+        if chunk is not None:
+            return chunk
+        target = index * self.zip_chunk_size
+        cursor = self._take_cursor(key, target) or _EntryCursor(path, name)
+        try:
+            while True:
+                current = cursor.pos // self.zip_chunk_size
+                chunk = cursor.file.read(self.zip_chunk_size)
+                if not chunk:
+                    raise EOFError(f"{name} ends before chunk {index}")
+                cursor.pos += len(chunk)
+                # Chunks inflated on the way are as good as any for later requests
+                self.chunks.put(key + (current,), chunk)
+                if current == index:
+                    break
+        except BaseException:
+            cursor.close()
+            raise
+        self._give_back(key, cursor)
+        return chunk
+
+    def _take_cursor(self, key: Tuple, target: int) -> Optional[_EntryCursor]:
+        with self._lock:
+            best = None
+            for i, (cursor_key, cursor) in enumerate(self._cursors):
+                if cursor_key == key and cursor.pos <= target and (best is None or cursor.pos > self._cursors[best][1].pos):
+                    best = i
+            if best is None:
+                return None
+            return self._cursors.pop(best)[1]
+
+    def _give_back(self, key: Tuple, cursor: _EntryCursor):
+        with self._lock:
+            self._cursors.append((key, cursor))
+            evicted = self._cursors.pop(0)[1] if len(self._cursors) > self.zip_cursors else None
+        if evicted is not None:
+            evicted.close()
+
+    async def acquire(self) -> bool:
+        # Created lazily so it binds to the server's event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_streams)
+        if not self._slots.locked():
+            await self._slots.acquire()
+            self.active += 1
+            return True
+        # Not wait_for(): a timeout firing right after the acquire would leak the slot
+        self.waiting += 1
+        waiter = asyncio.ensure_future(self._slots.acquire())
+        acquired = False
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+            acquired = waiter.done() and not waiter.cancelled()
+        finally:
+            self.waiting -= 1
+            if not acquired:
+                if waiter.done() and not waiter.cancelled():
+                    # Acquired while this request was being cancelled
+                    self._slots.release()
+                else:
+                    waiter.cancel()
+        if not acquired:
+            self.rejected += 1
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "rejected": self.rejected,
+                "max_streams": self.max_streams, "chunk_size": self.chunk_size, "read_ahead": self.read_ahead,
+                "zip_chunks": self.chunks.stats()}
+
+
+class RomStreamResponse(Response):
+    def __init__(self, streamer: RomStreamer, path: str, st: os.stat_result, media_type: Optional[str] = None):
+        self.streamer = streamer
+        self.path = path
+        self.stat_result = st
+        self.size = st.st_size
+        # Where the body starts in the file (a stored zip entry starts past its local header)
+        self.data_offset = 0
+        self.media_type = media_type or guess_type(path)[0] or "application/octet-stream"
+        self.status_code = 200
+        self.background = None
+        self.etag = file_etag(st)
+        self.init_headers({
+            "accept-ranges": "bytes",
+            "etag": self.etag,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+        })
+
+    async def __call__(self, scope, receive, send):
+        request_headers = Headers(scope=scope)
+        size = self.size
+        if none_match(request_headers.get("if-none-match"), self.etag):
+            await self._send_empty(send, 304)
+            return
+
+        byte_range = None
+        if if_range_matches(request_headers.get("if-range"), self.etag, self.stat_result.st_mtime):
+            try:
+                byte_range = parse_range(request_headers.get("range"), size)
+            except RangeNotSatisfiable:
+                await self._send_empty(send, 416, {"content-range": f"bytes */{size}"})
+                return
+        if byte_range is None:
+            start, end, status = 0, size - 1, 200
+        else:
+            (start, end), status = byte_range, 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        length = end - start + 1
+        self.headers["content-length"] = str(length)
+        self.headers["content-type"] = self.media_type
+
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        streamer = self.streamer
+        if not await streamer.acquire():
+            await self._send_empty(send, 503, {"retry-after": "1"})
+            return
+        try:
+            await self.send_body(scope, receive, send, status, start, length)
+        finally:
+            streamer.release()
+
+    async def send_body(self, scope, receive, send, status: int, start: int, length: int):
+        streamer = self.streamer
+        fd = await asyncio.to_thread(os.open, self.path, os.O_RDONLY)
+        try:
+            await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+            extensions = scope.get("extensions") or {}
+            offset = self.data_offset + start
+            if streamer.zero_copy and ZEROCOPY in extensions:
+                with os.fdopen(fd, "rb", closefd=False) as f:
+                    await send({"type": ZEROCOPY, "file": f, "offset": offset, "count": length})
+            elif streamer.zero_copy and PATHSEND in extensions and length == self.stat_result.st_size:
+                await send({"type": PATHSEND, "path": self.path})
+            else:
+                advise(fd, offset, length, "POSIX_FADV_SEQUENTIAL")
+                advised = offset
+                chunk_size = streamer.chunk_size
+                end = offset + length
+
+                def read(pos: int) -> bytes:
+                    nonlocal advised
+                    pos += self.data_offset
+                    if streamer.read_ahead and pos + streamer.read_ahead // 2 > advised:
+                        ahead = min(end, pos + streamer.read_ahead)
+                        advise(fd, max(advised, pos), ahead - max(advised, pos), "POSIX_FADV_WILLNEED")
+                        advised = ahead
+                    return os.pread(fd, min(chunk_size, end - pos), pos)
+
+                await self.pump(read, start, length, receive, send)
+        finally:
+            os.close(fd)
+
+    async def pump(self, read: Callable[[int], bytes], start: int, length: int, receive, send):
+        """Sends `length` bytes from `start`, read(pos) returning the next piece
+        in a worker thread while the previous one is being sent."""
+        end = start + length
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        pos = start
+        pending = asyncio.ensure_future(asyncio.to_thread(read, pos))
+        try:
+            while pos < end:
+                chunk = await pending
+                if not chunk:
+                    raise OSError(f"{self.path} shrank while being streamed")
+                chunk = chunk[:end - pos]
+                pos += len(chunk)
+                if pos < end:
+                    pending = asyncio.ensure_future(asyncio.to_thread(read, pos))
+                if disconnected.done():
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": pos < end})
+        finally:
+            disconnected.cancel()
+            if not pending.done():
+                # The read in flight must finish before its file gets closed
+                await asyncio.wait([pending])
+
+    async def _send_empty(self, send, status: int, headers: Optional[dict] = None):
+        raw = [(b"etag", self.etag.encode()), (b"accept-ranges", b"bytes")]
+        for key, value in (headers or {}).items():
+            raw.append((key.encode(), value.encode()))
+        if status != 304:
+            raw.append((b"content-length", b"0"))
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+        await send({"type": "http.response.body", "body": b""})
+
+
+class ZipEntryResponse(RomStreamResponse):
+    """The single ROM of a zip archive, decompressed. A stored entry is served
+    straight from the archive bytes; a compressed one through the chunk cache."""
+
+    def __init__(self, streamer: RomStreamer, path: str, st: os.stat_result, entry: "ZipEntry"):
+        super().__init__(streamer, path, st, guess_type(entry.name)[0] or "application/octet-stream")
+        self.entry = entry
+        self.size = entry.size
+        if entry.data_offset is not None:
+            self.data_offset = entry.data_offset
+        # Another representation of the same URL needs its own validator
+        self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}-{entry.crc:08x}"'
+        self.headers["etag"] = self.etag
+        self.headers["content-disposition"] = f"inline; filename*=UTF-8''{quote(os.path.basename(entry.name))}"
+
+    async def send_body(self, scope, receive, send, status: int, start: int, length: int):
+        if self.entry.data_offset is not None:
+            await super().send_body(scope, receive, send, status, start, length)
+            return
+        streamer = self.streamer
+        chunk_size = streamer.zip_chunk_size
+
+        def read(pos: int) -> bytes:
+            index, skip = divmod(pos, chunk_size)
+            return streamer.entry_chunk(self.path, self.stat_result, self.entry.name, index)[skip:]
+
+        await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+        await self.pump(read, start, length, receive, send)
+
+
+def advise(fd: int, offset: int, length: int, advice: str):
+    if length > 0 and hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, getattr(os, advice))
+        except OSError:
+            pass
+
+
+async def wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
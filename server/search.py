@@ -0,0 +1,228 @@
+"""In-memory full-text search over game names.
+
+Names are normalised (case, accents, punctuation) and split into title words
+and tag words; region tags such as "(USA)", "(U)" or "(Europe, Australia)" are
+mapped to canonical region terms so "mario usa" finds "Super Mario (U) [!]".
+Each query word matches exact terms, then prefixes (through a sorted
+vocabulary), then similar spellings (through a trigram index of the vocabulary).
+
+Indexes are grouped (one group per platform/system) so a single group can be
+rebuilt when its source changes without touching the others.
+"""
+import re
+import heapq
+import bisect
+import threading
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+REGION_ALIASES = {
+    "usa": "usa", "us": "usa", "u": "usa", "america": "usa",
+    "europe": "europe", "eur": "europe", "eu": "europe", "e": "europe",
+    "japan": "japan", "jpn": "japan", "jp": "japan", "j": "japan",
+    "world": "world", "w": "world",
+    "france": "france", "germany": "germany", "ger": "germany", "spain": "spain",
+    "italy": "italy", "uk": "uk", "korea": "korea", "kor": "korea", "asia": "asia",
+    "brazil": "brazil", "australia": "australia", "china": "china", "canada": "canada",
+}
+
+TAG_RE = re.compile(r"[(\[]([^)\]]*)[)\]]")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+MAX_PREFIX_EXPANSIONS = 64
+MAX_FUZZY_TERMS = 8
+MIN_FUZZY_SIMILARITY = 0.25
+
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.6
+
+
+def fold(text: str) -> str:
+    """Lowercases and strips accents."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def split_name(name: str) -> Tuple[str, List[str]]:
+    """Splits "Title (USA) [!]" into ("Title", ["USA", "!"])."""
+    tags = [t.strip() for t in TAG_RE.findall(name)]
+    return TAG_RE.sub(" ", name).strip(), tags
+
+
+def name_terms(name: str) -> Tuple[List[str], Set[str]]:
+    """Returns (title words in order, all terms including normalised region tags)."""
+    title, tags = split_name(fold(name))
+    words = WORD_RE.findall(title)
+    terms = set(words)
+    for tag in tags:
+        for part in tag.split(","):
+            part = part.strip()
+            region = REGION_ALIASES.get(part)
+            if region:
+                terms.add(region)
+            else:
+                terms.update(WORD_RE.findall(part))
+    return words, terms
+
+
+def query_terms(query: str) -> List[str]:
+    words = WORD_RE.findall(fold(query))
+    # Two letter region codes are common in queries ("zelda eu"); single letters are too ambiguous
+    return [REGION_ALIASES.get(w, w) if len(w) > 1 else w for w in words]
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Immutable index over (name, payload) documents."""
+
+    def __init__(self, docs: Iterable[Tuple[str, Any]]):
+        self.payloads: List[Any] = []
+        self.titles: List[str] = []
+        self.lengths = array("H")
+        postings: Dict[str, array] = {}
+        for doc_id, (name, payload) in enumerate(docs):
+            words, terms = name_terms(name or "")
+            self.payloads.append(payload)
+            self.titles.append(" ".join(words))
+            self.lengths.append(min(len(words), 0xFFFF))
+            for term in terms:
+                plist = postings.get(term)
+                if plist is None:
+                    plist = postings[term] = array("I")
+                plist.append(doc_id)
+        self.postings = postings
+        self.vocab: List[str] = sorted(postings)
+        # Built with the index rather than on first use to keep fuzzy queries fast
+        self.trigrams: Dict[str, array] = {}
+        for term_id, term in enumerate(self.vocab):
+            for tri in trigrams(term):
+                tlist = self.trigrams.get(tri)
+                if tlist is None:
+                    tlist = self.trigrams[tri] = array("I")
+                tlist.append(term_id)
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def expand(self, token: str) -> Dict[str, float]:
+        """Vocabulary terms matching `token`, with a match quality in (0, 1]."""
+        terms: Dict[str, float] = {}
+        if token in self.postings:
+            terms[token] = EXACT
+        i = bisect.bisect_left(self.vocab, token)
+        while i < len(self.vocab) and len(terms) < MAX_PREFIX_EXPANSIONS and self.vocab[i].startswith(token):
+            terms.setdefault(self.vocab[i], PREFIX)
+            i += 1
+        if terms or len(token) < 3:
+            return terms
+
+        wanted = trigrams(token)
+        shared: Dict[int, int] = {}
+        for tri in wanted:
+            for term_id in self.trigrams.get(tri, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+        scored = []
+        for term_id, count in shared.items():
+            term = self.vocab[term_id]
+            similarity = count / (len(wanted) + len(trigrams(term)) - count)
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                scored.append((similarity, term))
+        for similarity, term in heapq.nlargest(MAX_FUZZY_TERMS, scored):
+            terms[term] = FUZZY * similarity
+        return terms
+
+    def match(self, tokens: Sequence[str], require_all: bool = True) -> List[Tuple[float, int]]:
+        """Scores documents matching every token, or any token if `require_all` is False."""
+        per_token: List[Dict[int, float]] = []
+        for token in tokens:
+            docs: Dict[int, float] = {}
+            for term, quality in self.expand(token).items():
+                for doc_id in self.postings[term]:
+                    if docs.get(doc_id, 0.0) < quality:
+                        docs[doc_id] = quality
+            per_token.append(docs)
+        if not per_token:
+            return []
+
+        if require_all:
+            ordered = sorted(per_token, key=len)
+            candidates = set(ordered[0])
+            for docs in ordered[1:]:
+                candidates.intersection_update(docs)
+                if not candidates:
+                    break
+        else:
+            candidates = set().union(*per_token)
+
+        phrase = " ".join(tokens)
+        results = []
+        for doc_id in candidates:
+            score = sum(docs.get(doc_id, 0.0) for docs in per_token)
+            title = self.titles[doc_id]
+            if title.startswith(phrase):
+                score += 0.5
+            # Prefer short titles: "Tetris" over "Tetris Plus 2 Special Edition"
+            score += 0.5 / (1 + self.lengths[doc_id])
+            results.append((score, doc_id))
+        return results
+
+
+class GroupedSearchIndex:
+    """Set of SearchIndex instances keyed by group (platform or system)."""
+
+    def __init__(self):
+        self._groups: Dict[str, SearchIndex] = {}
+        self._lock = threading.Lock()
+
+    def replace_group(self, group: str, docs: Iterable[Tuple[str, Any]]):
+        index = SearchIndex(docs)
+        with self._lock:
+            self._groups[group] = index
+
+    def remove_group(self, group: str):
+        with self._lock:
+            self._groups.pop(group, None)
+
+    def groups(self) -> List[str]:
+        with self._lock:
+            return list(self._groups)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(i) for i in self._groups.values())
+
+    def search(self, query: str, limit: int = 20,
+               groups: Optional[Set[str]] = None) -> Tuple[List[Tuple[float, str, Any]], int]:
+        """Returns (best `limit` hits as (score, group, payload), total number of matches).
+
+        Documents must match every query word; only when nothing does anywhere
+        are documents matching some of the words returned.
+        """
+        tokens = query_terms(query)
+        if not tokens:
+            return [], 0
+        with self._lock:
+            selected = [(g, i) for g, i in self._groups.items() if groups is None or g in groups]
+        hits, total = self._search(selected, tokens, limit, require_all=True)
+        if total == 0 and len(tokens) > 1:
+            hits, total = self._search(selected, tokens, limit, require_all=False)
+        return hits, total
+
+    @staticmethod
+    def _search(selected, tokens, limit, require_all):
+        total = 0
+        best: List[Tuple[float, str, int, Any]] = []
+        for group, index in selected:
+            for score, doc_id in index.match(tokens, require_all):
+                total += 1
+                item = (score, group, -doc_id, index.payloads[doc_id])
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                elif item[:3] > best[0][:3]:
+                    heapq.heapreplace(best, item)
+        best.sort(key=lambda x: x[:3], reverse=True)
+        return [(round(score, 4), group, payload) for score, group, _, payload in best], total
@@ -0,0 +1,255 @@
+"""Server-side browsing of the RGSX store catalogs.
+
+Parsed catalogs come from the shared RGSX catalog cache (rgsx/catalog.py);
+paging, sorting and filtering (name substring, region, size range) are done
+here so the client only receives the page it displays.
+"""
+import os
+import re
+import time
+import bisect
+import threading
+import logging
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from search import GroupedSearchIndex
+from rgsx import catalog as rgsx_catalog
+from rgsx.catalog import CompactCatalog, parse_size
+
+logger = logging.getLogger("retro-api")
+
+TAG_RE = re.compile(r"\(([^)]*)\)")
+
+SORTS = ("name", "size")
+
+
+def name_tags(name: str) -> List[str]:
+    """Parenthesised tags of a No-Intro/Redump style name, e.g. ["USA", "Rev 1"]."""
+    return [t.strip() for t in TAG_RE.findall(name or "")]
+
+
+class TextColumn:
+    """Lowercase text per game joined into one string; substring filters scan it with str.find."""
+
+    def __init__(self, values):
+        starts = array("I")
+        parts = []
+        pos = 0
+        for value in values:
+            value = value.lower().replace("\n", " ")
+            starts.append(pos)
+            parts.append(value)
+            pos += len(value) + 1
+        self.text = "\n".join(parts)
+        self.starts = starts
+
+    def matches(self, needle: str) -> Set[int]:
+        needle = needle.lower().replace("\n", " ")
+        found: Set[int] = set()
+        text, starts = self.text, self.starts
+        pos = text.find(needle)
+        while pos >= 0:
+            i = bisect.bisect_right(starts, pos) - 1
+            found.add(i)
+            # Continue after this game's text
+            pos = text.find(needle, starts[i + 1]) if i + 1 < len(starts) else -1
+        return found
+
+
+class StoreCatalog:
+    """Lookup columns over one platform's compact catalog, built lazily."""
+
+    def __init__(self, games: CompactCatalog, version: Tuple[float, int] = (0.0, 0)):
+        self.games = games
+        # (mtime, size) of the catalog file the games were read from
+        self.version = version
+        self._names: Optional[TextColumn] = None
+        self._regions: Optional[TextColumn] = None
+        self._orders: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def as_dict(game) -> Dict[str, Any]:
+        name, url, size, region = game
+        return {"name": name, "url": url, "size": size or "Unknown", "region": region}
+
+    @property
+    def names(self) -> TextColumn:
+        if self._names is None:
+            self._names = TextColumn(self.games.iter_names())
+        return self._names
+
+    @property
+    def regions(self) -> TextColumn:
+        """Region text per game: the catalog's region field plus the name tags."""
+        if self._regions is None:
+            games = self.games
+            self._regions = TextColumn(" ".join([games.region(i)] + name_tags(name))
+                                       for i, name in enumerate(games.iter_names()))
+        return self._regions
+
+    def order(self, key: str, reverse: bool = False) -> List[int]:
+        """Game indices in `key` order (descending with `reverse`), computed once per catalog."""
+        if reverse:
+            cache_key = "-" + key
+            with self._lock:
+                order = self._orders.get(cache_key)
+            if order is None:
+                order = self.order(key)[::-1]
+                if key == "size":
+                    # Unknown sizes (-1) stay last in descending order too
+                    sizes = self.games.sizes
+                    unknown = sum(1 for size in sizes if size < 0)
+                    order = order[unknown:] + order[:unknown]
+                with self._lock:
+                    self._orders[cache_key] = order
+            return order
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None:
+                if key == "name":
+                    names = [n.lower() for n in self.games.iter_names()]
+                    order = sorted(range(len(names)), key=names.__getitem__)
+                else:
+                    sizes = self.games.sizes
+                    # Unknown sizes (-1) sort last
+                    order = sorted(range(len(sizes)), key=lambda i: (sizes[i] < 0, sizes[i]))
+                self._orders[key] = order
+            return order
+
+    def query(self, offset: int = 0, limit: Optional[int] = None, q: Optional[str] = None,
+              region: Optional[str] = None, min_size: Optional[int] = None, max_size: Optional[int] = None,
+              sort: Optional[str] = None, lazy: bool = False) -> Dict[str, Any]:
+        """Returns one page of games. Raises ValueError for an unknown sort.
+
+        With `lazy`, "games" is an iterator building each game dict on demand
+        (for streamed responses) instead of a list.
+        """
+        reverse = bool(sort) and sort.startswith("-")
+        key = sort[1:] if reverse else sort
+        if key and key not in SORTS:
+            raise ValueError(f"Unknown sort '{sort}' (expected one of: {', '.join(SORTS)}, optionally prefixed with '-')")
+
+        if key:
+            indices = self.order(key, reverse)
+        else:
+            indices = range(len(self.games))[::-1] if reverse else range(len(self.games))
+
+        allowed: Optional[Set[int]] = None
+        if q:
+            allowed = self.names.matches(q)
+        if region:
+            found = self.regions.matches(region)
+            allowed = found if allowed is None else allowed & found
+        filters = []
+        if allowed is not None:
+            filters.append(allowed.__contains__)
+        if min_size is not None or max_size is not None:
+            sizes = self.games.sizes
+            lo = min_size if min_size is not None else 0
+            hi = max_size if max_size is not None else float("inf")
+            filters.append(lambda i: sizes[i] >= 0 and lo <= sizes[i] <= hi)
+        if filters:
+            indices = [i for i in indices if all(f(i) for f in filters)]
+
+        total = len(indices)
+        start = max(0, offset)
+        end = total if limit is None else min(total, start + max(0, limit))
+        games = (self.as_dict(self.games[i]) for i in indices[start:end])
+        return {
+            "games": games if lazy else list(games),
+            "total": total,
+            "offset": start,
+            "limit": limit,
+        }
+
+
+def get_catalog(json_path: str) -> StoreCatalog:
+    """Store view of a catalog, rebuilt only when the shared cache reloads the file."""
+    catalog = rgsx_catalog.get_catalog(json_path)
+    store_catalog = catalog.derived.get("store")
+    if store_catalog is None:
+        store_catalog = catalog.derived["store"] = StoreCatalog(catalog.games, (catalog.mtime, catalog.size))
+    return store_catalog
+
+
+class StoreSearch:
+    """Search index over every platform catalog in GAMES_FOLDER.
+
+    refresh() only re-indexes catalogs whose file changed since the last build,
+    so it is cheap to call after every games.zip update.
+    """
+
+    def __init__(self, games_folder: str):
+        self.games_folder = games_folder
+        self.index = GroupedSearchIndex()
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        self._folder_mtime: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self.ready = False
+        self.indexing = False
+
+    def refresh(self):
+        with self._refresh_lock:
+            self.indexing = True
+            started = time.monotonic()
+            try:
+                try:
+                    self._folder_mtime = os.stat(self.games_folder).st_mtime
+                    names = [f for f in os.listdir(self.games_folder) if f.lower().endswith(".json")]
+                except OSError:
+                    names = []
+                present = set()
+                updated = 0
+                for fname in names:
+                    platform = os.path.splitext(fname)[0]
+                    path = os.path.join(self.games_folder, fname)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    present.add(platform)
+                    version = (st.st_mtime, st.st_size)
+                    if self._versions.get(platform) == version:
+                        continue
+                    try:
+                        # Read outside the LRU so indexing every platform does not evict browsed catalogs
+                        games = rgsx_catalog.read_catalog(path).games
+                    except Exception as e:
+                        logger.error(f"Store search: cannot index {fname}: {e}")
+                        continue
+                    # Payloads reference the compact catalog instead of holding per-game tuples
+                    self.index.replace_group(platform, ((name, (games, i)) for i, name in enumerate(games.iter_names())))
+                    self._versions[platform] = version
+                    updated += 1
+                for platform in list(self._versions):
+                    if platform not in present:
+                        self.index.remove_group(platform)
+                        del self._versions[platform]
+                self.ready = True
+                logger.info(f"Store search: {len(self.index)} games in {len(present)} platforms "
+                            f"({updated} re-indexed) in {time.monotonic() - started:.2f}s")
+            finally:
+                self.indexing = False
+
+    def start_refresh(self):
+        threading.Thread(target=self.refresh, name="store-search-index", daemon=True).start()
+
+    def is_stale(self) -> bool:
+        """Platforms added or removed since the last build change the folder mtime."""
+        try:
+            return os.stat(self.games_folder).st_mtime != self._folder_mtime
+        except OSError:
+            return False
+
+    def search(self, q: str, limit: int = 20, platform: Optional[str] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        hits, total = self.index.search(q, limit=limit, groups={platform} if platform else None)
+        results = [dict(StoreCatalog.as_dict(games[i]), platform=group, score=score) for score, group, (games, i) in hits]
+        return {
+            "results": results,
+            "total": total,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+            "indexing": self.indexing or not self.ready,
+        }
@@ -0,0 +1,296 @@
+"""Keeps the library index current while ROMs are added or removed.
+
+On local filesystems directory changes are delivered by inotify (through
+ctypes, no extra dependency). Network and FUSE mounts do not report remote
+changes through inotify, so on those, or when inotify is unavailable, the
+watcher falls back to periodically re-checking directory mtimes.
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+import logging
+from typing import Dict, Optional, Set
+
+from library import LibraryIndex, DirEntry
+
+logger = logging.getLogger("retro-api")
+
+# Filesystems on which inotify does not see changes made by other hosts
+NETWORK_FS_TYPES = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "virtiofs", "fuse", "fakeowner",
+    "grpcfuse", "osxfs", "afpfs", "davfs", "sshfs",
+}
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Returns the filesystem type of the mount containing `path` (Linux only)."""
+    try:
+        with open("/proc/mounts", "r") as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1].replace("\\040", " ")
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+            best, fstype = mount_point, fields[2]
+    return fstype
+
+
+def is_network_fs(path: str) -> bool:
+    fstype = filesystem_type(path)
+    if fstype is None:
+        return False
+    return fstype in NETWORK_FS_TYPES or fstype.startswith("fuse.")
+
+
+class Inotify:
+    """Minimal inotify binding: one non-blocking descriptor, many directory watches."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float):
+        """Yields (wd, mask, name) for pending events, waiting at most `timeout` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LibraryWatcher:
+    """Feeds directory changes into a LibraryIndex.
+
+    mode is "inotify", "poll" or "auto" (inotify unless BASE_PATH is on a
+    network/FUSE mount). Bursts of events, e.g. while a large ROM is being
+    copied, are coalesced for `debounce` seconds before the directory is
+    re-listed.
+    """
+
+    def __init__(self, library: LibraryIndex, mode: str = "auto", poll_interval: float = 30.0,
+                 debounce: float = 1.0):
+        self.library = library
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.backend: Optional[str] = None
+        self._inotify: Optional[Inotify] = None
+        self._wd_to_path: Dict[int, str] = {}
+        self._path_to_wd: Dict[str, int] = {}
+        self._unwatched: Set[str] = set()
+        self._pending: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._saved_revalidate_interval = library.revalidate_interval
+
+    def start(self):
+        backend = self.mode
+        if backend == "auto":
+            backend = "poll" if (not sys.platform.startswith("linux") or is_network_fs(self.library.base_path)) else "inotify"
+        if backend == "inotify":
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"Library watcher: inotify unavailable ({e}), falling back to polling")
+                backend = "poll"
+        self.backend = backend
+
+        self.library.add_listener(self._on_library_change)
+        if self._inotify is not None:
+            for path in self.library.paths():
+                self._watch(path)
+        # Changes are now pushed, so reads no longer need to stat directories
+        self.library.revalidate_interval = float("inf")
+
+        target = self._run_inotify if self._inotify is not None else self._run_poll
+        self._thread = threading.Thread(target=target, name="library-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Library watcher: started ({backend}) on {self.library.base_path}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self.library.revalidate_interval = self._saved_revalidate_interval
+
+    # --- Watch bookkeeping ---
+
+    def _watch(self, path: str) -> bool:
+        with self._lock:
+            if self._inotify is None or path in self._path_to_wd:
+                return False
+            try:
+                wd = self._inotify.add_watch(path)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logger.warning("Library watcher: inotify watch limit reached, polling remaining folders "
+                                   "(raise fs.inotify.max_user_watches)")
+                elif e.errno != errno.ENOENT:
+                    logger.warning(f"Library watcher: cannot watch {path}: {e}")
+                self._unwatched.add(path)
+                return False
+            self._wd_to_path[wd] = path
+            self._path_to_wd[path] = wd
+            self._unwatched.discard(path)
+            return True
+
+    def _unwatch(self, path: str):
+        with self._lock:
+            self._unwatched.discard(path)
+            wd = self._path_to_wd.pop(path, None)
+            if wd is None:
+                return
+            self._wd_to_path.pop(wd, None)
+            if self._inotify is not None:
+                self._inotify.rm_watch(wd)
+
+    def _on_library_change(self, path: str, entry: Optional[DirEntry]):
+        if entry is None:
+            self._unwatch(path)
+        elif self._watch(path) and self._thread is not None:
+            # Entries created between the listing and the new watch would be missed otherwise
+            with self._lock:
+                self._pending[path] = time.monotonic()
+
+    # --- Loops ---
+
+    def _flush(self, now: float):
+        with self._lock:
+            ready = [p for p, t in self._pending.items() if now - t >= self.debounce]
+            for path in ready:
+                del self._pending[path]
+        for path in ready:
+            self.library.invalidate(path)
+        if ready:
+            self.library.save()
+
+    def _run_inotify(self):
+        last_poll = time.monotonic()
+        while not self._stop.is_set():
+            with self._lock:
+                timeout = self.debounce if self._pending else min(self.poll_interval, 1.0)
+            try:
+                events = list(self._inotify.read(timeout))
+            except (OSError, ValueError) as e:
+                if self._stop.is_set():
+                    return
+                logger.error(f"Library watcher: inotify read failed ({e}), falling back to polling")
+                self._fall_back_to_polling()
+                return
+            try:
+                last_poll = self._handle_events(events, last_poll)
+            except Exception as e:
+                logger.error(f"Library watcher: failed to apply changes: {e}")
+
+    def _handle_events(self, events, last_poll: float) -> float:
+        now = time.monotonic()
+        overflow = False
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            with self._lock:
+                path = self._wd_to_path.get(wd)
+                if mask & IN_IGNORED and path is not None:
+                    self._wd_to_path.pop(wd, None)
+                    self._path_to_wd.pop(path, None)
+                if path is None or mask & IN_IGNORED:
+                    continue
+                self._pending[path] = now
+                if mask & IN_ISDIR and name:
+                    child = os.path.join(path, name)
+                    if self.library.is_rom_path(child):
+                        self._pending[child] = now
+        if overflow:
+            # One rescan covers every overflow reported in this batch
+            logger.warning("Library watcher: inotify queue overflow, rescanning library")
+            self.library.refresh()
+        self._flush(now)
+
+        # Folders that could not get a watch are polled
+        if self._unwatched and now - last_poll >= self.poll_interval:
+            last_poll = now
+            with self._lock:
+                unwatched = list(self._unwatched)
+            for path in unwatched:
+                self.library.invalidate(path)
+        return last_poll
+
+    def _fall_back_to_polling(self):
+        with self._lock:
+            inotify, self._inotify = self._inotify, None
+            self._wd_to_path.clear()
+            self._path_to_wd.clear()
+            self._unwatched.clear()
+        if inotify is not None:
+            try:
+                inotify.close()
+            except OSError:
+                pass
+        self.backend = "poll"
+        self._run_poll()
+
+    def _run_poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.library.invalidate(self.library.base_path)
+                for path in self.library.paths():
+                    self.library.invalidate(path)
+                self.library.save()
+            except Exception as e:
+                logger.error(f"Library watcher: poll failed: {e}")